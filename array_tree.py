@@ -0,0 +1,520 @@
+"""Red-black tree stored as a structure of arrays.
+
+`ArrayTree` has the same operations as `Tree`, but there is no object per
+node. A node is an index into parallel columns: the keys and the left, right
+and parent indices are `array("q")` columns, the colors a `bytearray`, and
+only the values are kept in a list. Index 0 is the sentinel (NIL). The slots
+of deleted nodes are put on a free list and reused by later inserts.
+
+A node takes about 43 bytes instead of the 120 of a `TreeNode` object and its
+key object, and the columns can be written out as they are, e.g. with
+`array.tofile`, without visiting the nodes.
+"""
+
+from array import array
+from typing import Any, Iterator, Optional
+
+from tree import Color
+
+NIL = 0
+RED = Color.RED
+BLACK = Color.BLACK
+
+
+class ArrayNode:
+    """A view of one node of an `ArrayTree`, as returned by the lookups.
+
+    The view refers to the slot of the node, so it must not be used after the
+    node is deleted.
+
+    Attributes:
+        tree (ArrayTree): The tree of the node.
+        index (int): The slot of the node in the columns of the tree.
+    """
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree: "ArrayTree", index: int) -> None:
+        self.tree: "ArrayTree" = tree
+        self.index: int = index
+
+    @property
+    def key(self) -> int:
+        return self.tree.keys[self.index]
+
+    @property
+    def data(self):
+        return self.tree.values[self.index]
+
+    @data.setter
+    def data(self, value):
+        self.tree.values[self.index] = value
+
+    @property
+    def color(self) -> int:
+        return self.tree.colors[self.index]
+
+    def __eq__(self, other) -> bool:
+        return (
+            isinstance(other, ArrayNode)
+            and self.tree is other.tree
+            and self.index == other.index
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self.tree), self.index))
+
+
+class ArrayTree:
+    """A red-black tree whose nodes live in parallel arrays.
+
+    Attributes:
+        keys (array): The key of every slot.
+        left (array): The index of the left child of every slot.
+        right (array): The index of the right child of every slot.
+        parent (array): The index of the parent of every slot, NIL for the root.
+        colors (bytearray): The color of every slot.
+        values (list): The value of every slot.
+        free (list[int]): The slots of deleted nodes, reused by `insert`.
+        root (int): The index of the root, or NIL.
+        flip_count (int): The number of color flips, counted like `Tree`.
+    """
+
+    def __init__(self) -> None:
+        self.keys = array("q", [0])
+        self.left = array("q", [NIL])
+        self.right = array("q", [NIL])
+        self.parent = array("q", [NIL])
+        self.colors = bytearray([BLACK])
+        self.values: list = [None]
+        self.free: list[int] = []
+        self.root: int = NIL
+        self.count: int = 0
+        self.flip_count: int = 0
+        # colors of the slots recolored by the ongoing insert/delete, as they
+        # were before the operation started
+        self._original_colors: dict[int, int] = {}
+
+    def _allocate(self, key: int, value, parent: int) -> int:
+        """Returns a slot for a new red node, reusing a free one if possible."""
+        if self.free:
+            index = self.free.pop()
+            self.keys[index] = key
+            self.left[index] = NIL
+            self.right[index] = NIL
+            self.parent[index] = parent
+            self.colors[index] = RED
+            self.values[index] = value
+        else:
+            index = len(self.keys)
+            try:
+                self.keys.append(key)
+                self.left.append(NIL)
+                self.right.append(NIL)
+                self.parent.append(parent)
+                self.colors.append(RED)
+            except BufferError:
+                # a column exported by `columns` cannot grow; the columns that
+                # did grow are not exported, so they can shrink back
+                for column in (self.keys, self.left, self.right, self.parent):
+                    del column[index:]
+                raise
+            self.values.append(value)
+        return index
+
+    def _flip_color(self, index: int, color: int) -> None:
+        """Recolors a slot and remembers its original color, like
+        `Tree._flip_color`."""
+        if index == NIL or self.colors[index] == color:
+            return
+        if index not in self._original_colors:
+            self._original_colors[index] = self.colors[index]
+        self.colors[index] = color
+
+    def _commit_color_flips(self) -> int:
+        """Adds the slots whose color changed in the current operation to the
+        flip count."""
+        ans = 0
+        colors = self.colors
+        for index, color in self._original_colors.items():
+            if colors[index] != color:
+                ans += 1
+        self._original_colors.clear()
+        self.flip_count += ans
+        return ans
+
+    def _left_rotate(self, x: int):
+        left, right, parent = self.left, self.right, self.parent
+        y = right[x]
+        if y == NIL:
+            return
+        beta = left[y]
+        right[x] = beta
+        if beta != NIL:
+            parent[beta] = x
+
+        x_parent = parent[x]
+        if x_parent == NIL:
+            self.root = y
+        elif left[x_parent] == x:
+            left[x_parent] = y
+        else:
+            right[x_parent] = y
+
+        parent[y] = x_parent
+        parent[x] = y
+        left[y] = x
+
+    def _right_rotate(self, y: int):
+        left, right, parent = self.left, self.right, self.parent
+        x = left[y]
+        if x == NIL:
+            return
+        beta = right[x]
+        left[y] = beta
+        if beta != NIL:
+            parent[beta] = y
+
+        y_parent = parent[y]
+        if y_parent == NIL:
+            self.root = x
+        elif left[y_parent] == y:
+            left[y_parent] = x
+        else:
+            right[y_parent] = x
+
+        parent[x] = y_parent
+        parent[y] = x
+        right[x] = y
+
+    def insert(self, key: int, value) -> ArrayNode:
+        """Inserts a new node with the given key and value into the tree.
+
+        Args:
+            key (int): The key of the new node.
+            value: The value of the new node.
+
+        Returns:
+            ArrayNode: The new node, or the node that already has the key.
+        """
+        keys, left, right = self.keys, self.left, self.right
+        parent = NIL
+        current = self.root
+        while current != NIL:
+            parent = current
+            current_key = keys[current]
+            if current_key > key:
+                current = left[current]
+            elif current_key < key:
+                current = right[current]
+            else:
+                return ArrayNode(self, current)
+
+        node = self._allocate(key, value, parent)
+        if parent == NIL:
+            self.root = node
+        elif keys[parent] < key:
+            right[parent] = node
+        else:
+            left[parent] = node
+        self.count += 1
+
+        self._insert_fixup(node)
+        # the new node did not exist before the insert, so its color is not a flip
+        self._original_colors.pop(node, None)
+        self._commit_color_flips()
+        return ArrayNode(self, node)
+
+    def _insert_fixup(self, node: int) -> None:
+        left, right, parent, colors = self.left, self.right, self.parent, self.colors
+        while colors[parent[node]] == RED:
+            node_parent = parent[node]
+            grandparent = parent[node_parent]
+            if node_parent == left[grandparent]:
+                uncle = right[grandparent]
+                if colors[uncle] == RED:
+                    self._flip_color(node_parent, BLACK)
+                    self._flip_color(uncle, BLACK)
+                    self._flip_color(grandparent, RED)
+                    node = grandparent
+                else:
+                    if node == right[node_parent]:
+                        node = node_parent
+                        self._left_rotate(node)
+                    self._flip_color(parent[node], BLACK)
+                    self._flip_color(parent[parent[node]], RED)
+                    self._right_rotate(parent[parent[node]])
+            else:
+                uncle = left[grandparent]
+                if colors[uncle] == RED:
+                    self._flip_color(node_parent, BLACK)
+                    self._flip_color(uncle, BLACK)
+                    self._flip_color(grandparent, RED)
+                    node = grandparent
+                else:
+                    if node == left[node_parent]:
+                        node = node_parent
+                        self._right_rotate(node)
+                    self._flip_color(parent[node], BLACK)
+                    self._flip_color(parent[parent[node]], RED)
+                    self._left_rotate(parent[parent[node]])
+
+        self._flip_color(self.root, BLACK)
+
+    def _transplant(self, u: int, v: int) -> None:
+        """Replaces the subtree rooted at u with the subtree rooted at v."""
+        u_parent = self.parent[u]
+        if u_parent == NIL:
+            self.root = v
+        elif u == self.left[u_parent]:
+            self.left[u_parent] = v
+        else:
+            self.right[u_parent] = v
+        self.parent[v] = u_parent
+
+    def _minimum(self, index: int) -> int:
+        left = self.left
+        while left[index] != NIL:
+            index = left[index]
+        return index
+
+    def _find(self, key: int) -> int:
+        keys, left, right = self.keys, self.left, self.right
+        index = self.root
+        while index != NIL:
+            index_key = keys[index]
+            if index_key == key:
+                return index
+            index = right[index] if index_key < key else left[index]
+        return NIL
+
+    def delete(self, key):
+        """Deletes the node with the given key from the tree. Its slot is put
+        on the free list.
+
+        Args:
+            key: The key of the node to be deleted.
+        """
+        left, right, parent, colors = self.left, self.right, self.parent, self.colors
+        z = self._find(key)
+        assert z != NIL
+
+        y = z
+        y_original_color = colors[y]
+        if left[z] == NIL:
+            x = right[z]
+            self._transplant(z, x)
+        elif right[z] == NIL:
+            x = left[z]
+            self._transplant(z, x)
+        else:
+            y = self._minimum(right[z])
+            y_original_color = colors[y]
+            x = right[y]
+            if y != right[z]:
+                self._transplant(y, x)
+                right[y] = right[z]
+                parent[right[y]] = y
+            else:
+                parent[x] = y
+            self._transplant(z, y)
+            left[y] = left[z]
+            parent[left[y]] = y
+            self._flip_color(y, colors[z])
+
+        if y_original_color == BLACK:
+            self._delete_fixup(x)
+        self._commit_color_flips()
+
+        self.values[z] = None
+        self.free.append(z)
+        self.count -= 1
+
+    def _delete_fixup(self, node: int):
+        left, right, parent, colors = self.left, self.right, self.parent, self.colors
+        while node != self.root and colors[node] == BLACK:
+            node_parent = parent[node]
+            if node == left[node_parent]:
+                w = right[node_parent]  # sibling
+                if colors[w] == RED:
+                    self._flip_color(w, BLACK)
+                    self._flip_color(node_parent, RED)
+                    self._left_rotate(node_parent)
+                    w = right[node_parent]
+
+                if colors[left[w]] == BLACK and colors[right[w]] == BLACK:
+                    self._flip_color(w, RED)
+                    node = node_parent
+                else:
+                    if colors[right[w]] == BLACK:
+                        self._flip_color(left[w], BLACK)
+                        self._flip_color(w, RED)
+                        self._right_rotate(w)
+                        w = right[node_parent]
+                    self._flip_color(w, colors[node_parent])
+                    self._flip_color(node_parent, BLACK)
+                    self._flip_color(right[w], BLACK)
+                    self._left_rotate(node_parent)
+                    node = self.root
+            else:
+                w = left[node_parent]
+                if colors[w] == RED:
+                    self._flip_color(w, BLACK)
+                    self._flip_color(node_parent, RED)
+                    self._right_rotate(node_parent)
+                    w = left[node_parent]
+
+                if colors[right[w]] == BLACK and colors[left[w]] == BLACK:
+                    self._flip_color(w, RED)
+                    node = node_parent
+                else:
+                    if colors[left[w]] == BLACK:
+                        self._flip_color(right[w], BLACK)
+                        self._flip_color(w, RED)
+                        self._left_rotate(w)
+                        w = left[node_parent]
+                    self._flip_color(w, colors[node_parent])
+                    self._flip_color(node_parent, BLACK)
+                    self._flip_color(left[w], BLACK)
+                    self._right_rotate(node_parent)
+                    node = self.root
+
+        self._flip_color(node, BLACK)
+
+    def search(self, key: int) -> Optional[ArrayNode]:
+        """Returns the node with the given key, or None if not found."""
+        index = self._find(key)
+        return ArrayNode(self, index) if index != NIL else None
+
+    def find_closest(self, key: int) -> list[ArrayNode]:
+        """Finds the closest nodes to the given key, like `Tree.find_closest`.
+
+        Returns:
+            list[ArrayNode]: The node with the key, or the closest node below
+                and/or above it.
+        """
+        keys, left, right = self.keys, self.left, self.right
+        lesser = greater = NIL
+        index = self.root
+        while index != NIL:
+            index_key = keys[index]
+            if index_key == key:
+                return [ArrayNode(self, index)]
+            if index_key < key:
+                lesser = index
+                index = right[index]
+            else:
+                greater = index
+                index = left[index]
+
+        if lesser == NIL and greater == NIL:
+            return []
+        elif lesser == NIL:
+            return [ArrayNode(self, greater)]
+        elif greater == NIL:
+            return [ArrayNode(self, lesser)]
+        elif key - keys[lesser] < keys[greater] - key:
+            return [ArrayNode(self, lesser)]
+        elif key - keys[lesser] > keys[greater] - key:
+            return [ArrayNode(self, greater)]
+        else:
+            return [ArrayNode(self, lesser), ArrayNode(self, greater)]
+
+    def irange(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[ArrayNode]:
+        """Yields the nodes whose keys are in the range [start, end] in
+        increasing order of key."""
+        keys, left, right = self.keys, self.left, self.right
+        stack: list[int] = []
+        index = self.root
+        while True:
+            while index != NIL:
+                if start is not None and keys[index] < start:
+                    index = right[index]
+                else:
+                    stack.append(index)
+                    index = left[index]
+            if not stack:
+                return
+            index = stack.pop()
+            if end is not None and keys[index] > end:
+                return
+            yield ArrayNode(self, index)
+            index = right[index]
+
+    def range_search(self, start: int, end: int) -> list[ArrayNode]:
+        """Returns a list of nodes whose keys are in the range [start, end]."""
+        return list(self.irange(start, end))
+
+    def __iter__(self) -> Iterator[ArrayNode]:
+        return self.irange()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def columns(self) -> dict[str, memoryview]:
+        """Returns read-only views of the columns, including free slots, e.g.
+        to write the whole tree out without copying it.
+
+        The views are of the live columns, not copies. While any of them is
+        alive, its column cannot grow: an insert that needs a new slot raises
+        `BufferError` and leaves the tree unchanged. Release the views (with
+        `release()` or a `with` block) once the columns are written.
+        """
+        return {
+            "keys": memoryview(self.keys).toreadonly(),
+            "left": memoryview(self.left).toreadonly(),
+            "right": memoryview(self.right).toreadonly(),
+            "parent": memoryview(self.parent).toreadonly(),
+            "colors": memoryview(self.colors).toreadonly(),
+        }
+
+    def validate(self) -> int:
+        """Checks the binary search tree and red-black tree properties and the
+        parent indices, and returns the black height of the tree.
+
+        Raises:
+            ValueError: If a property does not hold.
+        """
+        keys, left, right, parent, colors = (
+            self.keys,
+            self.left,
+            self.right,
+            self.parent,
+            self.colors,
+        )
+        if self.root != NIL and (
+            colors[self.root] != BLACK or parent[self.root] != NIL
+        ):
+            raise ValueError("The root must be black and have no parent")
+
+        count = 0
+        black_height = None
+        # (index, lower bound, upper bound, black nodes above)
+        stack: list[tuple[int, Any, Any, int]] = [(self.root, None, None, 0)]
+        while stack:
+            index, low, high, blacks = stack.pop()
+            if index == NIL:
+                if black_height is None:
+                    black_height = blacks
+                elif blacks != black_height:
+                    raise ValueError("The black heights differ")
+                continue
+            count += 1
+            key = keys[index]
+            if (low is not None and key <= low) or (high is not None and key >= high):
+                raise ValueError(f"Node {key} is out of order")
+            children = (left[index], right[index])
+            if colors[index] == RED and RED in (colors[child] for child in children):
+                raise ValueError(f"Red node {key} has a red child")
+            for child in children:
+                if child != NIL and parent[child] != index:
+                    raise ValueError(f"Node {keys[child]} has a wrong parent")
+            blacks += colors[index] == BLACK
+            stack.append((left[index], low, key, blacks))
+            stack.append((right[index], key, high, blacks))
+
+        if count != self.count:
+            raise ValueError(f"The tree has {count} nodes, expected {self.count}")
+        return black_height or 0
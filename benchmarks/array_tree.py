@@ -0,0 +1,73 @@
+"""Compares ArrayTree to Tree: memory per node and operations per second.
+
+Usage:
+    python3 -m benchmarks.array_tree [number_of_keys]
+"""
+
+import random
+import sys
+import time
+import tracemalloc
+
+from array_tree import ArrayTree
+from tree import Tree
+
+
+def bytes_per_node(tree_class, n: int) -> float:
+    """Returns the traced bytes per node of a tree of `n` keys. The keys are
+    created while the tree is built, as when they are parsed from input."""
+    rng = random.Random(1)
+    tracemalloc.start()
+    tree = tree_class()
+    for _ in range(n):
+        tree.insert(rng.randrange(1 << 40), None)
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return size / len(tree)
+
+
+def run(tree_class, keys: list[int], queries: list[int]) -> dict[str, float]:
+    results = {}
+
+    start = time.perf_counter()
+    tree = tree_class()
+    for key in keys:
+        tree.insert(key, None)
+    results["insert"] = len(keys) / (time.perf_counter() - start)
+    results["bytes per node"] = bytes_per_node(tree_class, len(keys))
+
+    start = time.perf_counter()
+    for key in queries:
+        tree.search(key)
+    results["search"] = len(queries) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for key in queries:
+        tree.find_closest(key)
+    results["find_closest"] = len(queries) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    found = 0
+    for key in queries[:10_000]:
+        found += len(tree.range_search(key, key + 100))
+    results["range_search (nodes)"] = found / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for key in keys[: len(keys) // 2]:
+        tree.delete(key)
+    results["delete"] = len(keys) // 2 / (time.perf_counter() - start)
+    results["flip count"] = tree.flip_count
+    return results
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    rng = random.Random(0)
+    keys = rng.sample(range(10 * n), n)
+    queries = [rng.randrange(10 * n) for _ in range(n)]
+
+    tree = run(Tree, keys, queries)
+    array_tree = run(ArrayTree, keys, queries)
+    print(f"{'':>22} {'Tree':>12} {'ArrayTree':>12}")
+    for name in tree:
+        print(f"{name:>22} {tree[name]:>12,.0f} {array_tree[name]:>12,.0f}")
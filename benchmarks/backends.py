@@ -0,0 +1,82 @@
+"""Benchmark matrix of the ordered index backends: the red-black Tree and the
+BTree with several fanouts, on catalogs of several sizes.
+
+For every size and backend, the operations per second of random inserts,
+searches, find_closest, range searches of about 100 keys (items per second)
+and deletes are reported, together with the height of the tree.
+
+Usage:
+    python3 -m benchmarks.backends [sizes,...] [fanouts,...]
+"""
+
+import random
+import sys
+import time
+
+from btree import BTree
+from tree import Tree
+
+
+def run(make_tree, keys: list[int], queries: list[int]) -> dict[str, float]:
+    results = {}
+
+    start = time.perf_counter()
+    tree = make_tree()
+    for key in keys:
+        tree.insert(key, None)
+    results["insert"] = len(keys) / (time.perf_counter() - start)
+    results["height"] = tree.height()
+
+    start = time.perf_counter()
+    for key in queries:
+        tree.search(key)
+    results["search"] = len(queries) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for key in queries:
+        tree.find_closest(key)
+    results["find_closest"] = len(queries) / (time.perf_counter() - start)
+
+    # the keys are spread over 10 times their number, so a range of 1000
+    # holds about 100 keys
+    start = time.perf_counter()
+    found = 0
+    for key in queries[:10_000]:
+        found += len(tree.range_search(key, key + 1000))
+    results["range_search (items)"] = found / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for key in keys[: len(keys) // 2]:
+        tree.delete(key)
+    results["delete"] = len(keys) // 2 / (time.perf_counter() - start)
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sizes = [int(size) for size in sys.argv[1].split(",")]
+    else:
+        sizes = [10_000, 100_000, 1_000_000]
+    if len(sys.argv) > 2:
+        fanouts = [int(fanout) for fanout in sys.argv[2].split(",")]
+    else:
+        fanouts = [16, 64, 256]
+
+    backends = {"Tree": Tree}
+    for fanout in fanouts:
+        backends[f"BTree({fanout})"] = lambda fanout=fanout: BTree(fanout)
+
+    for n in sizes:
+        rng = random.Random(0)
+        keys = rng.sample(range(10 * n), n)
+        queries = [rng.randrange(10 * n) for _ in range(min(n, 200_000))]
+
+        columns = {name: run(make, keys, queries) for name, make in backends.items()}
+        print(f"{n:,} keys")
+        print(f"{'':>22}" + "".join(f"{name:>12}" for name in columns))
+        for operation in columns["Tree"]:
+            print(
+                f"{operation:>22}"
+                + "".join(f"{column[operation]:>12,.0f}" for column in columns.values())
+            )
+        print()
@@ -0,0 +1,36 @@
+"""Compares search_many and find_closest_many to one lookup per key.
+
+Usage:
+    python3 -m benchmarks.batch [number_of_books] [keys_per_batch,...]
+"""
+
+import random
+import sys
+import time
+
+from tree import Tree
+
+
+def timed(function, *args) -> float:
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    sizes = sys.argv[2] if len(sys.argv) > 2 else "1000,10000,100000,1000000"
+    rng = random.Random(0)
+    tree = Tree.from_sorted((key, None) for key in range(0, 2 * n, 2))
+
+    for size in map(int, sizes.split(",")):
+        keys = [rng.randrange(2 * n) for _ in range(size)]
+        loop_search = timed(lambda: [tree.search(key) for key in keys])
+        many_search = timed(tree.search_many, keys)
+        loop_closest = timed(lambda: [tree.find_closest(key) for key in keys])
+        many_closest = timed(tree.find_closest_many, keys)
+        print(
+            f"{size:>8} keys: search {size / loop_search:>10,.0f} -> "
+            f"{size / many_search:>10,.0f} keys/sec, find_closest "
+            f"{size / loop_closest:>10,.0f} -> {size / many_closest:>10,.0f} keys/sec"
+        )
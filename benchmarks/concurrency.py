@@ -0,0 +1,204 @@
+"""Stress test of ConcurrentTree and of the library commands with concurrent
+readers and writers.
+
+Every writer thread inserts and deletes keys of its own residue class, so the
+final set of keys is known. Readers search, find the closest keys and scan
+ranges at the same time and check that every result is sorted. Afterwards the
+red-black tree invariants and the final keys are validated.
+
+The same is then done through the commands of `gatorLibrary` in the
+concurrency mode. The writers also borrow, return and reserve a shared set of
+books, and the readers print books, ranges, pages and title searches.
+Afterwards the patron index and the title and author indexes must be the same
+as when they are rebuilt from the books.
+
+Usage:
+    python3 -m benchmarks.concurrency [readers] [writers] [operations]
+"""
+
+import random
+import sys
+import threading
+import time
+
+from concurrent_tree import ConcurrentTree
+import gatorLibrary
+
+# books shared by all the writers of the library stress test, which are never
+# deleted; the books of the writers have greater IDs
+SHARED_BOOKS = 2_000
+
+
+def writer(tree: ConcurrentTree, index: int, writers: int, operations: int, keys: set):
+    rng = random.Random(index)
+    for _ in range(operations):
+        key = rng.randrange(10_000) * writers + index
+        if key in keys:
+            tree.delete(key)
+            keys.discard(key)
+        else:
+            tree.insert(key, None)
+            keys.add(key)
+
+
+def reader(tree: ConcurrentTree, index: int, stop: threading.Event, counts: list):
+    rng = random.Random(-index - 1)
+    done = 0
+    while not stop.is_set():
+        key = rng.randrange(10_000 * 8)
+        tree.search(key)
+        for node in tree.find_closest(key):
+            assert node.key is not None
+        found = [node.key for node in tree.range_search(key, key + 500)]
+        assert found == sorted(found), "range_search is out of order"
+        done += 3
+    counts[index] = done
+
+
+def stress(readers: int, writers: int, operations: int):
+    tree = ConcurrentTree()
+    stop = threading.Event()
+    counts = [0] * readers
+    keys = [set() for _ in range(writers)]
+
+    reader_threads = [
+        threading.Thread(target=reader, args=(tree, i, stop, counts))
+        for i in range(readers)
+    ]
+    writer_threads = [
+        threading.Thread(target=writer, args=(tree, i, writers, operations, keys[i]))
+        for i in range(writers)
+    ]
+
+    start = time.perf_counter()
+    for thread in reader_threads + writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    black_height = tree.validate()
+    expected = sorted(set().union(*keys))
+    assert [node.key for node in tree] == expected, "the keys do not match"
+
+    print(
+        f"{readers} readers, {writers} writers: {writers * operations} writes and "
+        f"{sum(counts)} reads in {elapsed:.2f}s"
+    )
+    print(f"valid red-black tree of {len(tree)} keys, black height {black_height}")
+
+
+def library_writer(index: int, writers: int, operations: int):
+    rng = random.Random(index)
+    own: set[int] = set()
+    for _ in range(operations):
+        patron = rng.randrange(100)
+        book = rng.randrange(SHARED_BOOKS)
+        operation = rng.randrange(6)
+        if operation == 0:
+            gatorLibrary.BorrowBook(patron, book, rng.randrange(1, 6))
+        elif operation == 1:
+            gatorLibrary.ReturnBook(patron, book)
+        elif operation == 2:
+            gatorLibrary.CancelReservation(patron, book)
+        elif operation == 3:
+            gatorLibrary.UpdateReservationPriority(patron, book, rng.randrange(1, 6))
+        else:
+            key = SHARED_BOOKS + rng.randrange(1_000) * writers + index
+            if key in own:
+                gatorLibrary.DeleteBook(key)
+                own.discard(key)
+            else:
+                gatorLibrary.InsertBook(key, f"Book {key}", f"Author {key % 7}", "Yes")
+                own.add(key)
+
+
+def library_reader(index: int, stop: threading.Event, counts: list):
+    rng = random.Random(-index - 1)
+    done = 0
+    while not stop.is_set():
+        book = rng.randrange(SHARED_BOOKS * 2)
+        gatorLibrary.PrintBook(book)
+        gatorLibrary.FindClosestBook(book)
+        gatorLibrary.PrintBooks(book, book + 20)
+        gatorLibrary.PrintBooksPage(rng.randrange(1, 100), 25)
+        gatorLibrary.SearchTitle(f"book {book}")
+        gatorLibrary.PrintPatron(rng.randrange(100))
+        done += 6
+    counts[index] = done
+
+
+def stress_library(readers: int, writers: int, operations: int):
+    gatorLibrary.enable_concurrency()
+    gatorLibrary.reset()
+    gatorLibrary.output = gatorLibrary.NullOutput()
+    for book in range(SHARED_BOOKS):
+        gatorLibrary.InsertBook(book, f"Book {book}", f"Author {book % 7}", "Yes")
+    stop = threading.Event()
+    counts = [0] * readers
+
+    reader_threads = [
+        threading.Thread(target=library_reader, args=(i, stop, counts))
+        for i in range(readers)
+    ]
+    writer_threads = [
+        threading.Thread(target=library_writer, args=(i, writers, operations))
+        for i in range(writers)
+    ]
+
+    start = time.perf_counter()
+    for thread in reader_threads + writer_threads:
+        thread.start()
+    for thread in writer_threads:
+        thread.join()
+    stop.set()
+    for thread in reader_threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    tree = gatorLibrary.tree
+    black_height = tree.validate()
+    for node in tree:
+        data = node.data
+        assert data.is_available == (data.borrowed_by is None), "torn borrow"
+
+    patrons = {
+        patronID: (patron.borrowed.copy(), patron.reserved.copy())
+        for patronID, patron in gatorLibrary.patrons.items()
+    }
+    gatorLibrary.rebuild_patrons()
+    rebuilt = {
+        patronID: (patron.borrowed, patron.reserved)
+        for patronID, patron in gatorLibrary.patrons.items()
+    }
+    assert patrons == rebuilt, "the patron index does not match the books"
+
+    indexes = [
+        (index.postings.copy(), index.terms.copy())
+        for index in (gatorLibrary.title_index, gatorLibrary.author_index)
+    ]
+    gatorLibrary.rebuild_text_index()
+    rebuilt = [
+        (index.postings, index.terms)
+        for index in (gatorLibrary.title_index, gatorLibrary.author_index)
+    ]
+    assert indexes == rebuilt, "the text indexes do not match the books"
+
+    print(
+        f"library, {readers} readers, {writers} writers: {writers * operations} "
+        f"writes and {sum(counts)} reads in {elapsed:.2f}s"
+    )
+    print(f"valid library of {len(tree)} books, black height {black_height}")
+
+
+if __name__ == "__main__":
+    readers = int(sys.argv[1]) if len(sys.argv) > 1 else 8
+    writers = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+    operations = int(sys.argv[3]) if len(sys.argv) > 3 else 2_000
+    # switch threads often, so that races show up
+    sys.setswitchinterval(1e-5)
+    stress(readers, writers, operations)
+    stress_library(readers, writers, operations)
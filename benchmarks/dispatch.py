@@ -0,0 +1,71 @@
+"""Compares the command dispatcher of gatorLibrary.py with exec() per line.
+
+Usage:
+    python3 -m benchmarks.dispatch [number_of_commands]
+"""
+
+import contextlib
+import os
+import sys
+import time
+
+import gatorLibrary
+
+
+def generate_commands(n: int) -> list[str]:
+    """Returns a command stream of `n` BorrowBook/ReturnBook lines over a
+    catalog of 1000 books."""
+    lines = [
+        f'InsertBook({i}, "Book {i}", "Author {i % 50}", "Yes")\n'
+        for i in range(1000)
+    ]
+    for i in range(n // 2):
+        book_id = i % 1000
+        lines.append(f"BorrowBook({i % 997}, {book_id}, {i % 5})\n")
+        lines.append(f"ReturnBook({i % 997}, {book_id})\n")
+    return lines
+
+
+def run_exec(lines: list[str]):
+    namespace = vars(gatorLibrary)
+    for line in lines:
+        exec(line, namespace)
+    gatorLibrary.output.flush()
+
+
+def run_dispatch(lines: list[str]):
+    gatorLibrary.run(lines)
+
+
+def parse_exec(lines: list[str]):
+    for line in lines:
+        compile(line, "<string>", "exec")
+
+
+def parse_dispatch(lines: list[str]):
+    for line in lines:
+        gatorLibrary.parse_command(line)
+
+
+def measure(function, lines: list[str]) -> float:
+    """Returns the commands per second of `function` over `lines`."""
+    gatorLibrary.reset()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        function(lines)
+        elapsed = time.perf_counter() - start
+    return len(lines) / elapsed
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    lines = generate_commands(n)
+
+    print(f"{len(lines)} commands")
+    for name, function in [
+        ("parse only, exec", parse_exec),
+        ("parse only, dispatcher", parse_dispatch),
+        ("end to end, exec", run_exec),
+        ("end to end, dispatcher", run_dispatch),
+    ]:
+        print(f"{name:<24} {measure(function, lines):>12,.0f} commands/sec")
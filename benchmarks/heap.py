@@ -0,0 +1,47 @@
+"""Measures the push, pop and remove throughput of the reservation heap.
+
+Usage:
+    python3 -m benchmarks.heap [number_of_items]
+"""
+
+import random
+import sys
+import time
+
+from heap import Heap
+
+
+def measure(n: int) -> tuple[float, float, float]:
+    """Returns the pushes, pops and removes per second of `n` items."""
+    rng = random.Random(0)
+    items = [(rng.randint(1, 5), i, i) for i in range(n)]
+    rng.shuffle(items)
+    heap = Heap()
+
+    start = time.perf_counter()
+    for item in items:
+        heap.push(item)
+    push_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    while heap:
+        heap.pop()
+    pop_time = time.perf_counter() - start
+
+    for item in items:
+        heap.push(item)
+    start = time.perf_counter()
+    for item in items:
+        heap.remove(item[2])
+    remove_time = time.perf_counter() - start
+
+    return n / push_time, n / pop_time, n / remove_time
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    pushes, pops, removes = measure(n)
+    print(
+        f"{n} items: {pushes:,.0f} pushes/sec, {pops:,.0f} pops/sec, "
+        f"{removes:,.0f} removes/sec"
+    )
@@ -0,0 +1,35 @@
+"""Measures the memory used per book with tracemalloc.
+
+Usage:
+    python3 -m benchmarks.memory [number_of_books]
+"""
+
+import random
+import sys
+import tracemalloc
+
+from gatorLibrary import NodeData
+from tree import Tree
+
+
+def bytes_per_book(n: int) -> float:
+    """Returns the traced bytes per book of a tree of `n` books."""
+    keys = list(range(n))
+    random.Random(0).shuffle(keys)
+    titles = [f"Book {i}" for i in range(100)]
+    authors = [f"Author {i}" for i in range(100)]
+
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    tree = Tree()
+    for key in keys:
+        tree.insert(key, NodeData(key, titles[key % 100], authors[key % 100], True))
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    return (after - before) / n
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    print(f"{n} books: {bytes_per_book(n):,.1f} bytes per book")
@@ -0,0 +1,61 @@
+"""Measures the memory each version of a PersistentTree adds with tracemalloc.
+
+A tree of `n` books is built first, then `versions` inserts and deletes are
+made while all the versions are kept. Each version copies only the path to
+the changed node, so it should add O(log n) nodes instead of a copy of the
+whole tree.
+
+Usage:
+    python3 -m benchmarks.persistent [number_of_books] [versions]
+"""
+
+import random
+import sys
+import tracemalloc
+
+from persistent_tree import PersistentNode, PersistentTree
+
+
+def measure(n: int, versions: int):
+    rng = random.Random(0)
+    keys = list(range(0, 2 * n, 2))
+    rng.shuffle(keys)
+
+    tracemalloc.start()
+    tree = PersistentTree()
+    for key in keys:
+        tree.insert(key, None)
+    # the versions made while building are not measured
+    del tree.versions[:-1]
+    base = tracemalloc.get_traced_memory()[0]
+
+    live = set(keys)
+    for i in range(versions):
+        if i % 2:
+            key = rng.choice(keys)
+            if key in live:
+                tree.delete(key)
+                live.discard(key)
+                continue
+        key = rng.randrange(2 * n) | 1
+        tree.insert(key, None)
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    tree.current.validate()
+    node_size = sys.getsizeof(PersistentNode(0, None, 0, None, None))
+    # inserting a key that is already there does not create a version
+    versions = len(tree.versions) - 1
+    per_version = (after - base) / versions
+    print(f"{n} books: {base / n:,.1f} bytes per book")
+    print(
+        f"{versions} versions: {per_version:,.1f} bytes per version "
+        f"(~{per_version / node_size:.1f} nodes), "
+        f"a full copy would be {base:,} bytes"
+    )
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    versions = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    measure(n, versions)
@@ -0,0 +1,74 @@
+"""Throughput of the library server with many concurrent clients.
+
+For every number of clients a fresh server is started on a free localhost
+port. Every client sends its own commands over one connection: it inserts
+books with its own IDs, borrows and returns them and looks them up. The
+commands per second of all the clients together are reported.
+
+Usage:
+    python3 -m benchmarks.server [clients,...] [commands_per_client]
+"""
+
+import asyncio
+import random
+import subprocess
+import sys
+import time
+
+from client import send_commands
+
+
+def client_commands(index: int, count: int) -> list[str]:
+    rng = random.Random(index)
+    base = index * 1_000_000
+    lines = []
+    books = 0
+    while len(lines) < count:
+        choice = rng.random()
+        if books == 0 or choice < 0.3:
+            lines.append(f'InsertBook({base + books}, "Book", "Author", "Yes")')
+            books += 1
+            continue
+        book_id = base + rng.randrange(books)
+        if choice < 0.5:
+            lines.append(f"BorrowBook({index}, {book_id}, {rng.randrange(10)})")
+        elif choice < 0.6:
+            lines.append(f"ReturnBook({index}, {book_id})")
+        elif choice < 0.9:
+            lines.append(f"PrintBook({book_id})")
+        else:
+            lines.append(f"FindClosestBook({book_id})")
+    return lines
+
+
+async def load(port: int, clients: int, count: int) -> float:
+    workloads = [client_commands(i, count) for i in range(clients)]
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *(send_commands(lines, port=port) for lines in workloads)
+    )
+    elapsed = time.perf_counter() - start
+    for responses in results:
+        assert len(responses) == count, "a response is missing"
+    return clients * count / elapsed
+
+
+def run(clients: int, count: int) -> float:
+    server = subprocess.Popen(
+        [sys.executable, "server.py", "--port", "0"],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        port = int(server.stdout.readline().rsplit(":", 1)[1])
+        return asyncio.run(load(port, clients, count))
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    sizes = sys.argv[1] if len(sys.argv) > 1 else "1,4,16,64"
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    for clients in map(int, sizes.split(",")):
+        print(f"{clients:>4} clients: {run(clients, count):>10,.0f} commands/sec")
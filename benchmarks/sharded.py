@@ -0,0 +1,80 @@
+"""Scaling of the sharded library with the number of worker processes.
+
+A catalog of books is loaded with `BulkInsertBooks`, then a stream of commands
+on single books (lookups, borrows, returns and inserts) is run with
+1, 2, 4, ... shards up to the number of CPUs. The commands per second are
+reported for every number of shards.
+
+Usage:
+    python3 -m benchmarks.sharded [number_of_books] [number_of_commands] [shards,...]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+import gatorLibrary
+from sharded import ShardedLibrary
+
+
+def commands(books: int, count: int) -> list[str]:
+    rng = random.Random(0)
+    lines = []
+    next_id = books
+    for _ in range(count):
+        choice = rng.random()
+        book_id = rng.randrange(books)
+        if choice < 0.4:
+            lines.append(f"PrintBook({book_id})")
+        elif choice < 0.6:
+            lines.append(f"BorrowBook({rng.randrange(1000)}, {book_id}, 1)")
+        elif choice < 0.8:
+            lines.append(f"ReturnBook(1, {book_id})")
+        else:
+            lines.append(f'InsertBook({next_id}, "Book", "Author", "Yes")')
+            next_id += 1
+    return lines
+
+
+def measure(shards: int, catalog: str, books: int, lines: list[str]) -> float:
+    library = ShardedLibrary(shards, max_book_id=books)
+    library.output = gatorLibrary.NullOutput()
+    try:
+        library.BulkInsertBooks(catalog)
+        start = time.perf_counter()
+        library.run(lines)
+        return len(lines) / (time.perf_counter() - start)
+    finally:
+        library.close()
+
+
+if __name__ == "__main__":
+    books = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200_000
+    lines = commands(books, count)
+
+    if len(sys.argv) > 3:
+        counts = [int(shards) for shards in sys.argv[3].split(",")]
+    else:
+        cpus = os.cpu_count() or 1
+        counts = [1]
+        while counts[-1] * 2 <= cpus:
+            counts.append(counts[-1] * 2)
+        if counts[-1] != cpus:
+            counts.append(cpus)
+
+    with tempfile.NamedTemporaryFile("w", suffix=".txt") as catalog:
+        for book_id in range(books):
+            catalog.write(f'InsertBook({book_id}, "Book", "Author", "Yes")\n')
+        catalog.flush()
+
+        baseline = None
+        for shards in counts:
+            rate = measure(shards, catalog.name, books, lines)
+            baseline = baseline or rate
+            print(
+                f"{shards:>3} shards: {rate:>10,.0f} commands/sec "
+                f"({rate / baseline:.2f}x)"
+            )
@@ -0,0 +1,222 @@
+"""Benchmark suite for the gatorLibrary command pipeline.
+
+Generates a synthetic command stream for every catalog size, runs it through
+`parse_command` and the command functions, and reports per command the
+throughput, the p50/p99 latency and the peak memory allocated while the command
+runs. The results are saved as JSON so that runs can be compared.
+
+Usage:
+    python3 -m benchmarks.suite [--sizes 1000,10000,100000]
+        [--mix InsertBook=30,DeleteBook=10,...] [--output results.json]
+        [--compare old_results.json]
+"""
+
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import time
+import tracemalloc
+
+import gatorLibrary
+
+DEFAULT_MIX = {
+    "InsertBook": 30,
+    "DeleteBook": 10,
+    "BorrowBook": 25,
+    "ReturnBook": 20,
+    "FindClosestBook": 10,
+    "PrintBooks": 5,
+}
+
+
+def insert_command(book: int) -> str:
+    return f'InsertBook({book}, "Book {book}", "Author {book % 97}", "Yes")'
+
+
+def generate_commands(size: int, mix: dict[str, int], seed: int = 0) -> list[str]:
+    """Returns a valid command stream for a catalog of `size` books.
+
+    The stream starts with `size` InsertBook commands in random order, followed
+    by `size` commands drawn from `mix`, the relative weight of each command.
+    """
+    rng = random.Random(seed)
+    key_space = 4 * size
+    books = rng.sample(range(1, key_space + 1), size)
+    lines = [insert_command(book) for book in books]
+
+    present = set(books)
+    present_list = list(books)
+    borrowed: dict[int, int] = {}
+    next_patron = 1
+
+    def pick_book() -> int:
+        # lazily drops deleted books from the list used for random choice
+        while True:
+            i = rng.randrange(len(present_list))
+            book = present_list[i]
+            if book in present:
+                return book
+            present_list[i] = present_list[-1]
+            present_list.pop()
+
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while len(lines) < 2 * size:
+        name = rng.choices(names, weights)[0]
+        if name == "InsertBook":
+            book = rng.randint(1, key_space)
+            if book in present:
+                continue
+            present.add(book)
+            present_list.append(book)
+            lines.append(insert_command(book))
+        elif name == "DeleteBook":
+            if len(present) < 2:
+                continue
+            book = pick_book()
+            present.discard(book)
+            borrowed.pop(book, None)
+            lines.append(f"DeleteBook({book})")
+        elif name == "BorrowBook":
+            book = pick_book()
+            # a new patron every time, so nobody reserves a book twice
+            patron = next_patron
+            next_patron += 1
+            borrowed.setdefault(book, patron)
+            lines.append(f"BorrowBook({patron}, {book}, {rng.randint(1, 5)})")
+        elif name == "ReturnBook":
+            if not borrowed:
+                continue
+            book = next(iter(borrowed))
+            lines.append(f"ReturnBook({borrowed.pop(book)}, {book})")
+        elif name == "FindClosestBook":
+            lines.append(f"FindClosestBook({rng.randint(0, key_space)})")
+        elif name == "PrintBooks":
+            start = rng.randint(0, key_space)
+            lines.append(f"PrintBooks({start}, {start + 40})")
+        else:
+            raise ValueError(f"Unknown command in mix: {name}")
+    return lines
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(p / 100 * len(values)))]
+
+
+def run_stream(lines: list[str]) -> dict[str, dict]:
+    """Runs the command stream twice, once to time every command and once with
+    tracemalloc to measure its peak allocation, and returns the statistics of
+    every command name."""
+    latencies: dict[str, list[float]] = {}
+    peaks: dict[str, list[int]] = {}
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        gatorLibrary.reset()
+        for line in lines:
+            start = time.perf_counter()
+            function, args = gatorLibrary.parse_command(line)
+            function(*args)
+            elapsed = time.perf_counter() - start
+            latencies.setdefault(function.__name__, []).append(elapsed)
+        gatorLibrary.output.flush()
+
+        gatorLibrary.reset()
+        tracemalloc.start()
+        for line in lines:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+            function, args = gatorLibrary.parse_command(line)
+            function(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+            peaks.setdefault(function.__name__, []).append(peak - before)
+        tracemalloc.stop()
+        gatorLibrary.output.flush()
+
+    results = {}
+    for name, values in latencies.items():
+        results[name] = {
+            "count": len(values),
+            "ops_per_sec": len(values) / sum(values),
+            "p50_us": percentile(values, 50) * 1e6,
+            "p99_us": percentile(values, 99) * 1e6,
+            "peak_bytes_mean": statistics.fmean(peaks[name]),
+            "peak_bytes_max": max(peaks[name]),
+        }
+    return results
+
+
+def print_results(size: int, results: dict[str, dict], old: dict[str, dict] | None):
+    print(f"\n{size} books")
+    header = (
+        f"{'command':<16} {'ops/sec':>12} {'p50 us':>9} {'p99 us':>9} {'peak B':>9}"
+    )
+    if old is not None:
+        header += f" {'vs old':>8}"
+    print(header)
+    for name, stats in sorted(results.items()):
+        row = (
+            f"{name:<16} {stats['ops_per_sec']:>12,.0f} {stats['p50_us']:>9.1f} "
+            f"{stats['p99_us']:>9.1f} {stats['peak_bytes_mean']:>9,.0f}"
+        )
+        if old is not None and name in old:
+            row += f" {stats['ops_per_sec'] / old[name]['ops_per_sec']:>7.2f}x"
+        print(row)
+
+
+def parse_mix(text: str) -> dict[str, int]:
+    mix = {}
+    for item in text.split(","):
+        name, weight = item.split("=")
+        mix[name.strip()] = int(weight)
+    return mix
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="1000,10000,100000")
+    parser.add_argument(
+        "--mix", default=",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items())
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="JSON file for the results")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    options = parser.parse_args()
+
+    mix = parse_mix(options.mix)
+    old_runs = {}
+    if options.compare:
+        with open(options.compare) as f:
+            old_runs = json.load(f)["runs"]
+
+    runs = {}
+    for size in map(int, options.sizes.split(",")):
+        results = run_stream(generate_commands(size, mix, options.seed))
+        runs[str(size)] = results
+        old = old_runs.get(str(size)) if options.compare else None
+        print_results(size, results, old)
+
+    output = options.output or os.path.join(
+        "benchmarks",
+        "results",
+        datetime.datetime.now().strftime("%Y%m%d-%H%M%S") + ".json",
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(
+            {
+                "timestamp": datetime.datetime.now().isoformat(),
+                "python": platform.python_version(),
+                "mix": mix,
+                "seed": options.seed,
+                "runs": runs,
+            },
+            f,
+            indent=2,
+        )
+    print(f"\nResults saved to {output}")
@@ -0,0 +1,50 @@
+"""Compares FindBooksByAuthor through the author index to a scan of the tree.
+
+Every catalog has one author with 10 books, and the other books are spread
+over many authors. The index lookup should take the same time for every
+catalog size, while the scan grows with it.
+
+Usage:
+    python3 -m benchmarks.text_index [number_of_books,...]
+"""
+
+import sys
+import time
+
+from text_index import TextIndex
+from tree import Tree
+
+
+def measure(n: int):
+    items = []
+    index = TextIndex()
+    for book_id in range(n):
+        if book_id % (n // 10) == 0:
+            author = "Rare Author"
+        else:
+            author = f"Author {book_id % 5000}"
+        items.append((book_id, author))
+        index.add(book_id, author)
+    tree = Tree.from_sorted(items)
+
+    repeat = 1000
+    start = time.perf_counter()
+    for _ in range(repeat):
+        found = [tree.search(book_id) for book_id in index.search("rare author")]
+    indexed = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    scanned = [node for node in tree if "rare" in node.data.casefold().split()]
+    scan = time.perf_counter() - start
+
+    assert len(found) == len(scanned) == 10
+    print(
+        f"{n:>8} books: index {indexed * 1e6:>8,.1f} us, "
+        f"scan {scan * 1e6:>12,.1f} us per query"
+    )
+
+
+if __name__ == "__main__":
+    sizes = sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000"
+    for n in map(int, sizes.split(",")):
+        measure(n)
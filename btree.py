@@ -0,0 +1,596 @@
+"""B+ tree with the same lookups as the red-black `Tree`.
+
+Every node holds up to `fanout` keys (a leaf) or children (an internal node)
+in plain Python lists, and is searched with `bisect`, so a lookup follows
+about log_fanout(n) child pointers instead of the 2 log2(n) of a red-black
+tree, and the comparisons run in C inside `bisect`. The items are kept in the
+leaves only, and the leaves are linked in both directions, so range searches
+and walks to the neighbors of a key move along the leaves without going back
+up the tree.
+
+An internal node also keeps the number of items under each of its children,
+which gives `rank`, `select` and `count_range` in O(log n) like the subtree
+sizes of `Tree`.
+
+The separator keys of an internal node only bound its children: the keys in
+`children[i]` are less than `keys[i]`, and the keys in `children[i + 1]` are
+greater than or equal to it. A separator can be a key that was deleted since.
+"""
+
+from bisect import bisect_left, bisect_right
+from itertools import islice
+from typing import Any, Iterable, Iterator, Optional
+
+from tree import Color, Tree, TreeNode
+
+
+class BTreeItem:
+    """A key and its value, as returned by the lookups.
+
+    Attributes:
+        key (int): The key.
+        data: The value of the key.
+    """
+
+    __slots__ = ("key", "data")
+
+    def __init__(self, key: int, data) -> None:
+        self.key: int = key
+        self.data = data
+
+
+class _Leaf:
+    __slots__ = ("keys", "items", "prev", "next")
+
+    def __init__(self, keys: list[int], items: list[BTreeItem]) -> None:
+        self.keys: list[int] = keys
+        self.items: list[BTreeItem] = items
+        self.prev: Optional[_Leaf] = None
+        self.next: Optional[_Leaf] = None
+
+
+class _Internal:
+    __slots__ = ("keys", "children", "counts")
+
+    def __init__(self, keys: list[int], children: list, counts: list[int]) -> None:
+        self.keys: list[int] = keys
+        self.children: list = children
+        # number of items under each child
+        self.counts: list[int] = counts
+
+
+class BTree:
+    """An ordered map of int keys implemented as a B+ tree.
+
+    Attributes:
+        fanout (int): The most keys of a leaf and children of an internal
+            node. The class attribute is the default for new trees.
+        flip_count (int): Always 0, a B-tree has no colors. Kept so that the
+            tree can be used wherever a `Tree` is.
+    """
+
+    fanout: int = 64
+
+    def __init__(self, fanout: Optional[int] = None) -> None:
+        fanout = fanout if fanout is not None else type(self).fanout
+        if fanout < 4:
+            raise ValueError(f"The fanout must be at least 4: {fanout}")
+        self.fanout: int = fanout
+        # fewest keys of a leaf, or children of an internal node, but the root
+        self.minimum: int = fanout // 2
+        self.root: _Leaf | _Internal = _Leaf([], [])
+        self.size: int = 0
+        self.flip_count: int = 0
+
+    @classmethod
+    def from_sorted(
+        cls,
+        items: Iterable[tuple[int, Any]],
+        sort: bool = False,
+        fanout: Optional[int] = None,
+    ) -> "BTree":
+        """Builds a B-tree from (key, value) pairs sorted by key in O(n) time.
+
+        The items are spread evenly over as few leaves as possible, and every
+        level above is built the same way, so all nodes are nearly full.
+
+        Args:
+            items (Iterable[tuple[int, Any]]): The (key, value) pairs in
+                increasing order of key.
+            sort (bool): Sorts the items first. O(n log n) time complexity.
+            fanout (int | None): The fanout of the tree, or None for the
+                default.
+
+        Returns:
+            BTree: The new tree.
+
+        Raises:
+            ValueError: If the keys are not strictly increasing.
+        """
+        items = sorted(items, key=lambda item: item[0]) if sort else list(items)
+        for i in range(1, len(items)):
+            if items[i - 1][0] >= items[i][0]:
+                raise ValueError(
+                    f"Keys must be strictly increasing: {items[i - 1][0]}, {items[i][0]}"
+                )
+
+        tree = cls(fanout)
+        if not items:
+            return tree
+
+        level: list = []
+        counts: list[int] = []
+        # smallest key under every node of the level
+        firsts: list[int] = []
+        for lo, hi in tree._spread(len(items)):
+            leaf = _Leaf(
+                [key for key, _ in items[lo:hi]],
+                [BTreeItem(key, value) for key, value in items[lo:hi]],
+            )
+            if level:
+                level[-1].next = leaf
+                leaf.prev = level[-1]
+            level.append(leaf)
+            counts.append(hi - lo)
+            firsts.append(leaf.keys[0])
+
+        while len(level) > 1:
+            parents: list = []
+            parent_counts: list[int] = []
+            parent_firsts: list[int] = []
+            for lo, hi in tree._spread(len(level)):
+                parents.append(
+                    _Internal(firsts[lo + 1 : hi], level[lo:hi], counts[lo:hi])
+                )
+                parent_counts.append(sum(counts[lo:hi]))
+                parent_firsts.append(firsts[lo])
+            level, counts, firsts = parents, parent_counts, parent_firsts
+
+        tree.root = level[0]
+        tree.size = len(items)
+        return tree
+
+    def _spread(self, n: int) -> Iterator[tuple[int, int]]:
+        """Splits n entries into as few nodes as possible, with sizes that
+        differ by at most one, and yields the (lo, hi) slice of each."""
+        nodes = -(-n // self.fanout)
+        size, extra = divmod(n, nodes)
+        lo = 0
+        for i in range(nodes):
+            hi = lo + size + (1 if i < extra else 0)
+            yield lo, hi
+            lo = hi
+
+    @classmethod
+    def from_layout(cls, items: Iterable[tuple[int, Any, int, int]]) -> "BTree":
+        """Builds a B-tree from the (key, value, color, depth) of the nodes of
+        a red-black tree in increasing order of key, as written to snapshots.
+        The colors and depths are ignored."""
+        return cls.from_sorted((key, value) for key, value, _, _ in items)
+
+    def layout(self) -> Iterator[tuple[TreeNode, int]]:
+        """Yields the nodes, with their depths, of the red-black tree that
+        `Tree.from_sorted` builds from the items, in increasing order of key.
+
+        The nodes are new `TreeNode` objects holding the values of the items,
+        so snapshots written from a B-tree can be read into either tree.
+        """
+        n = self.size
+        max_depth = n.bit_length() - 1
+        full = n == (1 << (max_depth + 1)) - 1
+        items = iter(self)
+        # the recursion of `Tree.from_sorted` over the positions of the items
+        stack: list[tuple[int, int, int]] = []
+        lo, hi, depth = 0, n - 1, 0
+        while True:
+            while lo <= hi:
+                mid = (lo + hi) // 2
+                stack.append((mid, hi, depth))
+                hi = mid - 1
+                depth += 1
+            if not stack:
+                return
+            mid, hi, depth = stack.pop()
+            item = next(items)
+            color = Color.RED if depth == max_depth and not full else Color.BLACK
+            yield TreeNode(item.key, item.data, color), depth
+            lo = mid + 1
+            depth += 1
+
+    def _find_leaf(self, key: int, path: Optional[list] = None) -> _Leaf:
+        """Returns the leaf where the key is or would be, and appends the
+        (internal node, child index) pairs on the way to the path."""
+        node = self.root
+        while type(node) is _Internal:
+            i = bisect_right(node.keys, key)
+            if path is not None:
+                path.append((node, i))
+            node = node.children[i]
+        return node
+
+    def search(self, key: int) -> Optional[BTreeItem]:
+        """Returns the item with the key, or None if there is none.
+        O(log n) time complexity."""
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return leaf.items[i]
+        return None
+
+    def insert(self, key: int, value) -> BTreeItem:
+        """Inserts the key with its value, splitting the nodes that overflow
+        on the way back up. O(log n) time complexity.
+
+        Args:
+            key (int): The key.
+            value: The value of the key.
+
+        Returns:
+            BTreeItem: The new item, or the item already in the tree with the
+                key, whose value is left unchanged.
+        """
+        path: list[tuple[_Internal, int]] = []
+        leaf = self._find_leaf(key, path)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return leaf.items[i]
+
+        item = BTreeItem(key, value)
+        leaf.keys.insert(i, key)
+        leaf.items.insert(i, item)
+        self.size += 1
+        for parent, index in path:
+            parent.counts[index] += 1
+        if len(leaf.keys) > self.fanout:
+            self._split(leaf, path)
+        return item
+
+    def _split(self, node: _Leaf | _Internal, path: list[tuple[_Internal, int]]):
+        """Splits an overflowing node in two halves, and its parents as long as
+        they overflow too."""
+        while True:
+            if type(node) is _Leaf:
+                mid = len(node.keys) // 2
+                right = _Leaf(node.keys[mid:], node.items[mid:])
+                del node.keys[mid:], node.items[mid:]
+                right.prev, right.next = node, node.next
+                if node.next is not None:
+                    node.next.prev = right
+                node.next = right
+                separator = right.keys[0]
+                left_count, right_count = len(node.keys), len(right.keys)
+            else:
+                mid = len(node.children) // 2
+                separator = node.keys[mid - 1]
+                right = _Internal(
+                    node.keys[mid:], node.children[mid:], node.counts[mid:]
+                )
+                del node.keys[mid - 1 :], node.children[mid:], node.counts[mid:]
+                left_count, right_count = sum(node.counts), sum(right.counts)
+
+            if not path:
+                self.root = _Internal(
+                    [separator], [node, right], [left_count, right_count]
+                )
+                return
+            parent, index = path.pop()
+            parent.keys.insert(index, separator)
+            parent.children.insert(index + 1, right)
+            parent.counts[index] = left_count
+            parent.counts.insert(index + 1, right_count)
+            if len(parent.children) <= self.fanout:
+                return
+            node = parent
+
+    def delete(self, key: int):
+        """Deletes the item with the key. A node left with too few entries
+        borrows one from a sibling, or is merged with it. O(log n) time
+        complexity.
+
+        Raises:
+            KeyError: If there is no item with the key.
+        """
+        path: list[tuple[_Internal, int]] = []
+        leaf = self._find_leaf(key, path)
+        i = bisect_left(leaf.keys, key)
+        if i == len(leaf.keys) or leaf.keys[i] != key:
+            raise KeyError(key)
+
+        del leaf.keys[i], leaf.items[i]
+        self.size -= 1
+        for parent, index in path:
+            parent.counts[index] -= 1
+
+        # a leaf is short of keys, or an internal node of children
+        short = len(leaf.keys) < self.minimum
+        while path and short:
+            parent, index = path.pop()
+            self._rebalance(parent, index)
+            short = len(parent.children) < self.minimum
+        while type(self.root) is _Internal and len(self.root.children) == 1:
+            self.root = self.root.children[0]
+
+    def _rebalance(self, parent: _Internal, index: int):
+        """Refills the child of the parent at the index, which has one entry
+        too few, from its left or right sibling."""
+        child = parent.children[index]
+        left = parent.children[index - 1] if index > 0 else None
+        right = (
+            parent.children[index + 1] if index + 1 < len(parent.children) else None
+        )
+
+        if type(child) is _Leaf:
+            if left is not None and len(left.keys) > self.minimum:
+                child.keys.insert(0, left.keys.pop())
+                child.items.insert(0, left.items.pop())
+                parent.keys[index - 1] = child.keys[0]
+                parent.counts[index - 1] -= 1
+                parent.counts[index] += 1
+            elif right is not None and len(right.keys) > self.minimum:
+                child.keys.append(right.keys.pop(0))
+                child.items.append(right.items.pop(0))
+                parent.keys[index] = right.keys[0]
+                parent.counts[index + 1] -= 1
+                parent.counts[index] += 1
+            else:
+                if left is None:
+                    # merge the right sibling into the child instead
+                    left, child, index = child, right, index + 1
+                left.keys += child.keys
+                left.items += child.items
+                left.next = child.next
+                if child.next is not None:
+                    child.next.prev = left
+                self._remove_child(parent, index)
+            return
+
+        if left is not None and len(left.children) > self.minimum:
+            moved = left.counts.pop()
+            child.children.insert(0, left.children.pop())
+            child.counts.insert(0, moved)
+            child.keys.insert(0, parent.keys[index - 1])
+            parent.keys[index - 1] = left.keys.pop()
+            parent.counts[index - 1] -= moved
+            parent.counts[index] += moved
+        elif right is not None and len(right.children) > self.minimum:
+            moved = right.counts.pop(0)
+            child.children.append(right.children.pop(0))
+            child.counts.append(moved)
+            child.keys.append(parent.keys[index])
+            parent.keys[index] = right.keys.pop(0)
+            parent.counts[index + 1] -= moved
+            parent.counts[index] += moved
+        else:
+            if left is None:
+                left, child, index = child, right, index + 1
+            left.keys.append(parent.keys[index - 1])
+            left.keys += child.keys
+            left.children += child.children
+            left.counts += child.counts
+            self._remove_child(parent, index)
+
+    def _remove_child(self, parent: _Internal, index: int):
+        """Removes the child at the index after it was merged into its left
+        sibling."""
+        parent.counts[index - 1] += parent.counts[index]
+        del parent.keys[index - 1], parent.children[index], parent.counts[index]
+
+    def _forward(self, leaf: Optional[_Leaf], i: int) -> Iterator[BTreeItem]:
+        """Yields the items from position i of the leaf onwards."""
+        while leaf is not None:
+            yield from islice(leaf.items, i, None)
+            leaf, i = leaf.next, 0
+
+    def _backward(self, leaf: Optional[_Leaf], i: int) -> Iterator[BTreeItem]:
+        """Yields the items before position i of the leaf, backwards."""
+        while leaf is not None:
+            items = leaf.items
+            for j in range(i - 1, -1, -1):
+                yield items[j]
+            leaf = leaf.prev
+            if leaf is not None:
+                i = len(leaf.items)
+
+    def find_closest(self, key: int) -> list[BTreeItem]:
+        """Finds the items with the closest key to the given key.
+
+        Returns:
+            list[BTreeItem]: The item with the key, or else the closest item
+                below or above it, or both if they are equally close.
+        """
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        if i < len(leaf.keys) and leaf.keys[i] == key:
+            return [leaf.items[i]]
+        # only the root leaf can be empty, and then it has no neighbors
+        if i > 0:
+            lesser = leaf.items[i - 1]
+        else:
+            lesser = leaf.prev.items[-1] if leaf.prev is not None else None
+        if i < len(leaf.keys):
+            greater = leaf.items[i]
+        else:
+            greater = leaf.next.items[0] if leaf.next is not None else None
+
+        return Tree._closest(key, lesser, greater)
+
+    def find_k_closest(self, key: int, k: int) -> list[BTreeItem]:
+        """Finds the k items with the closest keys to the given key, walking
+        along the leaves in both directions from the key (the smaller key wins
+        a tie). O(log n + k) time complexity.
+
+        Returns:
+            list[BTreeItem]: The closest items, at most k, in increasing order
+                of key.
+        """
+        if k <= 0:
+            return []
+        leaf = self._find_leaf(key)
+        i = bisect_left(leaf.keys, key)
+        below = self._backward(leaf, i)
+        above = self._forward(leaf, i)
+        lesser = next(below, None)
+        greater = next(above, None)
+
+        lower: list[BTreeItem] = []
+        upper: list[BTreeItem] = []
+        while len(lower) + len(upper) < k:
+            if greater is not None and (
+                lesser is None or greater.key - key < key - lesser.key
+            ):
+                upper.append(greater)
+                greater = next(above, None)
+            elif lesser is not None:
+                lower.append(lesser)
+                lesser = next(below, None)
+            else:
+                break
+        lower.reverse()
+        return lower + upper
+
+    def irange(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[BTreeItem]:
+        """Yields the items whose keys are in the range [start, end]
+        (inclusive) in increasing order of key, walking along the leaves.
+
+        Args:
+            start (int | None): The starting key of the range, or None for no
+                lower bound.
+            end (int | None): The ending key of the range, or None for no upper
+                bound.
+        """
+        if start is None:
+            leaf = self.root
+            while type(leaf) is _Internal:
+                leaf = leaf.children[0]
+            i = 0
+        else:
+            leaf = self._find_leaf(start)
+            i = bisect_left(leaf.keys, start)
+        while leaf is not None:
+            if end is not None and leaf.keys and leaf.keys[-1] > end:
+                yield from leaf.items[i : bisect_right(leaf.keys, end)]
+                return
+            yield from leaf.items[i:]
+            leaf, i = leaf.next, 0
+
+    def __iter__(self) -> Iterator[BTreeItem]:
+        """Yields all the items in increasing order of key."""
+        return self.irange()
+
+    def range_search(self, start: int, end: int) -> list[BTreeItem]:
+        """Returns the items whose keys are in the range [start, end]
+        (inclusive)."""
+        return list(self.irange(start, end))
+
+    def __len__(self) -> int:
+        return self.size
+
+    def rank(self, key: int) -> int:
+        """Returns the number of keys in the tree that are less than the given
+        key. O(fanout log n) time complexity."""
+        ans = 0
+        node = self.root
+        while type(node) is _Internal:
+            i = bisect_right(node.keys, key)
+            ans += sum(node.counts[:i])
+            node = node.children[i]
+        return ans + bisect_left(node.keys, key)
+
+    def select(self, k: int) -> BTreeItem:
+        """Returns the item with the k-th smallest key (0-based).
+
+        Raises:
+            IndexError: If `k` is not in the range [0, len(tree)).
+        """
+        if not 0 <= k < self.size:
+            raise IndexError(f"Tree index out of range: {k}")
+        node = self.root
+        while type(node) is _Internal:
+            for i, count in enumerate(node.counts):
+                if k < count:
+                    break
+                k -= count
+            node = node.children[i]
+        return node.items[k]
+
+    def count_range(self, start: int, end: int) -> int:
+        """Returns the number of keys in the range [start, end] (inclusive)."""
+        if start > end:
+            return 0
+        return self.rank(end + 1) - self.rank(start)
+
+    def height(self) -> int:
+        """Returns the number of levels of the tree, 0 for an empty tree."""
+        if self.size == 0:
+            return 0
+        levels = 1
+        node = self.root
+        while type(node) is _Internal:
+            node = node.children[0]
+            levels += 1
+        return levels
+
+    def validate(self) -> int:
+        """Checks the order of the keys, the separators, the counts, the fill
+        of the nodes, the depth of the leaves and the links between them.
+        Useful for debugging and for stress tests.
+
+        Returns:
+            int: The height of the tree.
+
+        Raises:
+            ValueError: If a property does not hold.
+        """
+        leaves: list[_Leaf] = []
+        leaf_depth = -1
+        # (node, lower bound, upper bound, depth)
+        stack = [(self.root, None, None, 1)]
+        while stack:
+            node, low, high, depth = stack.pop()
+            if any(a >= b for a, b in zip(node.keys, node.keys[1:])):
+                raise ValueError(f"Keys {node.keys} are out of order")
+            if (low is not None and node.keys and node.keys[0] < low) or (
+                high is not None and node.keys and node.keys[-1] >= high
+            ):
+                raise ValueError(f"Keys {node.keys} are out of bounds")
+            if type(node) is _Leaf:
+                entries = len(node.keys)
+                if len(node.items) != entries or any(
+                    item.key != key for item, key in zip(node.items, node.keys)
+                ):
+                    raise ValueError(f"Leaf {node.keys} has wrong items")
+                if leaf_depth == -1:
+                    leaf_depth = depth
+                elif leaf_depth != depth:
+                    raise ValueError(f"Leaf {node.keys} has a wrong depth")
+                leaves.append(node)
+            else:
+                entries = len(node.children)
+                if len(node.keys) != entries - 1 or len(node.counts) != entries:
+                    raise ValueError(f"Node {node.keys} has a wrong shape")
+                bounds = [low, *node.keys, high]
+                for i, child in enumerate(node.children):
+                    if node.counts[i] != self._count(child):
+                        raise ValueError(f"Node {node.keys} has a wrong count")
+                    stack.append((child, bounds[i], bounds[i + 1], depth + 1))
+            if node is not self.root and not self.minimum <= entries <= self.fanout:
+                raise ValueError(f"Node {node.keys} has {entries} entries")
+
+        leaves.sort(key=lambda leaf: leaf.keys[0] if leaf.keys else 0)
+        for previous, leaf in zip([None, *leaves], leaves):
+            if leaf.prev is not previous or (
+                previous is not None and previous.next is not leaf
+            ):
+                raise ValueError(f"Leaf {leaf.keys} has wrong links")
+        if leaves[-1].next is not None:
+            raise ValueError("The last leaf has a next leaf")
+        if sum(len(leaf.keys) for leaf in leaves) != self.size:
+            raise ValueError("The size is wrong")
+        return self.height()
+
+    def _count(self, node: _Leaf | _Internal) -> int:
+        if type(node) is _Leaf:
+            return len(node.keys)
+        return sum(self._count(child) for child in node.children)
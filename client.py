@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""Client of the library server.
+
+Sends the commands of an input file (or the standard input) over one
+connection without waiting for the responses, and prints the responses in
+order, so the output is the same as that of `gatorLibrary.py`.
+
+Usage:
+    python3 client.py [--host 127.0.0.1] [--port 8765] [file]
+"""
+
+from typing import Iterable
+import argparse
+import asyncio
+import sys
+
+
+async def send_commands(
+    lines: Iterable[str], host: str = "127.0.0.1", port: int = 8765
+) -> list[str]:
+    """Sends the commands over one connection and returns the responses.
+
+    Args:
+        lines (Iterable[str]): The command lines.
+        host (str): The server host.
+        port (int): The server port.
+
+    Returns:
+        list[str]: The response of every command, in order.
+    """
+    reader, writer = await asyncio.open_connection(host, port)
+
+    async def send():
+        try:
+            for line in lines:
+                writer.write(line.rstrip("\n").encode() + b"\n")
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain()
+            writer.write_eof()
+            await writer.drain()
+        except OSError:
+            # the server closes the connection after Quit() and after an
+            # overlong line
+            pass
+
+    sender = asyncio.create_task(send())
+    responses = []
+    while header := await reader.readline():
+        responses.append((await reader.readexactly(int(header))).decode())
+    await sender
+    writer.close()
+    return responses
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("file", nargs="?")
+    arguments = parser.parse_args()
+
+    input_file = open(arguments.file) if arguments.file else sys.stdin
+    responses = asyncio.run(
+        send_commands(input_file, arguments.host, arguments.port)
+    )
+    sys.stdout.write("".join(responses))
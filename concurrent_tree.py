@@ -0,0 +1,202 @@
+"""Thread-safe access to a red-black tree.
+
+`ConcurrentTree` is a `Tree` whose operations are guarded by a `ReadWriteLock`:
+any number of threads can search the tree at the same time, while `insert` and
+`delete` run alone, so readers never see the parent pointers halfway through a
+rotation. Writers are preferred: once a writer waits, new readers wait behind
+it, so a steady stream of lookups cannot starve the writer.
+"""
+
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+import threading
+
+from tree import Tree, TreeNode
+
+
+class ReadWriteLock:
+    """A reader-writer lock that prefers writers.
+
+    Both locks are reentrant, and a thread holding the write lock may also take
+    the read lock, so methods that call each other do not deadlock. A read lock
+    cannot be upgraded to the write lock.
+    """
+
+    def __init__(self) -> None:
+        self._condition = threading.Condition()
+        self._readers = 0
+        self._writer: int | None = None
+        self._write_depth = 0
+        self._waiting_writers = 0
+        self._local = threading.local()
+
+    def acquire_read(self):
+        """Blocks until no writer holds or waits for the lock."""
+        depth = getattr(self._local, "depth", 0)
+        if depth or self._writer == threading.get_ident():
+            self._local.depth = depth + 1
+            return
+        with self._condition:
+            while self._writer is not None or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+        self._local.depth = 1
+
+    def release_read(self):
+        self._local.depth -= 1
+        if self._local.depth or self._writer == threading.get_ident():
+            return
+        with self._condition:
+            self._readers -= 1
+            if self._readers == 0:
+                self._condition.notify_all()
+
+    def acquire_write(self):
+        """Blocks until no other thread holds the lock."""
+        if self._writer == threading.get_ident():
+            self._write_depth += 1
+            return
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer is not None or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = threading.get_ident()
+            self._write_depth = 1
+
+    def release_write(self):
+        self._write_depth -= 1
+        if self._write_depth:
+            return
+        with self._condition:
+            self._writer = None
+            self._condition.notify_all()
+
+    @contextmanager
+    def read_locked(self):
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write_locked(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class NoLock:
+    """Stands in for a `ReadWriteLock` or a `threading.Lock` where only one
+    thread uses the data, so that the code taking the locks does not change.
+    Taking it does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+    def read_locked(self):
+        return self
+
+    def write_locked(self):
+        return self
+
+
+NO_LOCK = NoLock()
+
+
+class ConcurrentTree(Tree):
+    """A red-black tree that can be used from many threads.
+
+    The range queries collect their nodes while the read lock is held and
+    return an iterator over the collected nodes, so iterating never holds the
+    lock. `lock` can be used directly to make several operations atomic.
+    A cursor returned by `cursor` may only be stepped while `lock` is held.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.lock = ReadWriteLock()
+
+    def insert(self, key: int, value) -> TreeNode:
+        with self.lock.write_locked():
+            return super().insert(key, value)
+
+    def delete(self, key):
+        with self.lock.write_locked():
+            return super().delete(key)
+
+    def search(self, key: int) -> TreeNode:
+        with self.lock.read_locked():
+            return super().search(key)
+
+    def find_closest(self, key: int) -> list[TreeNode]:
+        with self.lock.read_locked():
+            return super().find_closest(key)
+
+    def find_k_closest(self, key: int, k: int) -> list[TreeNode]:
+        with self.lock.read_locked():
+            return super().find_k_closest(key, k)
+
+    def successor(self, node: TreeNode) -> Optional[TreeNode]:
+        with self.lock.read_locked():
+            return super().successor(node)
+
+    def predecessor(self, node: TreeNode) -> Optional[TreeNode]:
+        with self.lock.read_locked():
+            return super().predecessor(node)
+
+    def search_many(self, keys: Iterable[int]) -> list[Optional[TreeNode]]:
+        with self.lock.read_locked():
+            return super().search_many(keys)
+
+    def find_closest_many(self, keys: Iterable[int]) -> list[list[TreeNode]]:
+        with self.lock.read_locked():
+            return super().find_closest_many(keys)
+
+    def irange(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[TreeNode]:
+        with self.lock.read_locked():
+            return iter(list(super().irange(start, end)))
+
+    def range_search(self, start: int, end: int) -> list[TreeNode]:
+        with self.lock.read_locked():
+            return super().range_search(start, end)
+
+    def __iter__(self) -> Iterator[TreeNode]:
+        with self.lock.read_locked():
+            return iter(list(super().__iter__()))
+
+    def __reversed__(self) -> Iterator[TreeNode]:
+        with self.lock.read_locked():
+            return iter(list(super().__reversed__()))
+
+    def rank(self, key: int) -> int:
+        with self.lock.read_locked():
+            return super().rank(key)
+
+    def select(self, k: int) -> TreeNode:
+        with self.lock.read_locked():
+            return super().select(k)
+
+    def count_range(self, start: int, end: int) -> int:
+        with self.lock.read_locked():
+            return super().count_range(start, end)
+
+    def validate(self) -> int:
+        with self.lock.read_locked():
+            return super().validate()
+
+    def layout(self) -> Iterator[tuple[TreeNode, int]]:
+        with self.lock.read_locked():
+            return iter(list(super().layout()))
+
+    def __len__(self) -> int:
+        with self.lock.read_locked():
+            return super().__len__()
@@ -1,9 +1,24 @@
 #!/usr/bin/env python3
 
 from tree import Tree
+from btree import BTree
+from concurrent_tree import NO_LOCK, ConcurrentTree, NoLock, ReadWriteLock
+from instrumented_tree import InstrumentedTree
+from ordered_index import BACKENDS, OrderedIndex
 from heap import Heap
-import time
+from text_index import TextIndex
+import snapshot
+import tree_export
+import wal
+from collections import OrderedDict
+from typing import Callable, ContextManager, Iterable
+import argparse
+import ast
+import itertools
+import os
+import re
 import sys
+import threading
 
 
 class NodeData:
@@ -15,9 +30,19 @@ class NodeData:
         author_name (str): The name of the author.
         is_available (bool): Indicates if the book is available for borrowing.
         borrowed_by (int | None): The ID of the borrower, or None if not borrowed.
-        reservation_heap (Heap): The heap containing the reservations for the book.
+        reservation_heap (Heap | None): The heap containing the reservations for
+            the book, or None until the first reservation is made.
     """
 
+    __slots__ = (
+        "book_id",
+        "book_name",
+        "author_name",
+        "is_available",
+        "borrowed_by",
+        "reservation_heap",
+    )
+
     def __init__(
         self, book_id: int, book_name: str, author_name: str, is_available: bool
     ) -> None:
@@ -26,25 +51,251 @@ class NodeData:
         self.author_name: str = author_name
         self.is_available: bool = is_available
         self.borrowed_by: int | None = None
-        self.reservation_heap: Heap = Heap()
+        self.reservation_heap: Heap | None = None
 
     def __str__(self) -> str:
         """Returns a string representation of the Book object."""
+        availability = "Yes" if self.is_available else "No"
+        reservations = "[]" if self.reservation_heap is None else self.reservation_heap
+        return (
+            f"BookID = {self.book_id}\n"
+            f'Title = "{self.book_name}"\n'
+            f'Author = "{self.author_name}"\n'
+            f'Availability = "{availability}"\n'
+            f"BorrowedBy = {self.borrowed_by}\n"
+            f"Reservations = {reservations}"
+        )
+
+
+class OutputBuffer:
+    """Collects the output of the commands and writes it to `sys.stdout` in
+    large chunks instead of one small write per line.
+
+    Attributes:
+        size (int): The number of characters collected before they are written.
+    """
+
+    def __init__(self, size: int = 1 << 16) -> None:
+        self.size: int = size
+        self.chunks: list[str] = []
+        self.length: int = 0
+
+    def write(self, text: str):
+        """Adds text to the buffer, and writes the buffer if it is full.
+
+        Args:
+        - text (str): The text to write.
+        """
+        self.chunks.append(text)
+        self.length += len(text)
+        if self.length >= self.size:
+            self.flush()
+
+    def flush(self):
+        """Writes the collected text to `sys.stdout`."""
+        if self.chunks:
+            sys.stdout.write("".join(self.chunks))
+            self.chunks.clear()
+            self.length = 0
+        sys.stdout.flush()
+
+
+class NullOutput(OutputBuffer):
+    """An output buffer that discards everything, used while replaying the
+    operation log."""
+
+    def write(self, text: str):
+        pass
+
+
+class ResponseBuffer(OutputBuffer):
+    """An output buffer that keeps the output of each command, so that it can
+    be sent back to whoever sent the command."""
+
+    def flush(self):
+        pass
+
+    def take(self) -> str:
+        """Returns the collected text and empties the buffer."""
+        text = "".join(self.chunks)
+        self.chunks.clear()
+        self.length = 0
+        return text
+
+
+class PatronData:
+    """Represents the books held by a patron.
+
+    Attributes:
+        patron_id (int): The ID of the patron.
+        borrowed (set[int]): The IDs of the books borrowed by the patron.
+        reserved (set[int]): The IDs of the books reserved by the patron.
+    """
+
+    __slots__ = ("patron_id", "borrowed", "reserved")
+
+    def __init__(self, patron_id: int) -> None:
+        self.patron_id: int = patron_id
+        self.borrowed: set[int] = set()
+        self.reserved: set[int] = set()
+
+    def __str__(self) -> str:
+        """Returns a string representation of the Patron object."""
         ret = []
-        ret.append(f"BookID = {self.book_id}")
-        ret.append(f'Title = "{self.book_name}"')
-        ret.append(f'Author = "{self.author_name}"')
-        if self.is_available:
-            ret.append('Availability = "Yes"')
-        else:
-            ret.append('Availability = "No"')
-        ret.append(f"BorrowedBy = {self.borrowed_by}")
-        ret.append(f"Reservations = {self.reservation_heap.__str__()}")
+        ret.append(f"PatronID = {self.patron_id}")
+        ret.append(f"Borrowed = {sorted(self.borrowed)}")
+        ret.append(f"Reserved = {sorted(self.reserved)}")
 
         return "\n".join(ret)
 
 
-tree = Tree()
+class RenderCache:
+    """A bounded least-recently-used cache of the rendered records of books,
+    used by `PrintBook`.
+
+    Every command that changes a book calls `invalidate` with its ID, so a
+    cached record is never out of date.
+
+    Attributes:
+        capacity (int): The most records kept. 0 turns the cache off.
+        hits (int): The number of lookups that found a record.
+        misses (int): The number of lookups that did not.
+        evictions (int): The number of records dropped to stay within the
+            capacity.
+    """
+
+    def __init__(self, capacity: int = 1024) -> None:
+        self.capacity: int = capacity
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self.records: OrderedDict[int, str] = OrderedDict()
+        # a threading.Lock in the concurrency mode
+        self.lock: ContextManager = NO_LOCK
+
+    def get(self, bookID: int) -> str | None:
+        """Returns the cached record of a book, or None."""
+        with self.lock:
+            record = self.records.get(bookID)
+            if record is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.records.move_to_end(bookID)
+            return record
+
+    def put(self, bookID: int, record: str):
+        """Caches the record of a book, dropping the least recently used
+        record if the cache is full."""
+        if self.capacity <= 0:
+            return
+        with self.lock:
+            self.records[bookID] = record
+            self.records.move_to_end(bookID)
+            while len(self.records) > self.capacity:
+                self.records.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, bookID: int):
+        """Drops the cached record of a book that changed."""
+        with self.lock:
+            self.records.pop(bookID, None)
+
+    def clear(self):
+        """Drops every cached record, e.g. when the whole tree is replaced."""
+        with self.lock:
+            self.records.clear()
+
+    def reset(self):
+        """Drops every cached record and zeroes the statistics."""
+        with self.lock:
+            self.records.clear()
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+
+# the class of `tree`: one of the `BACKENDS`, `InstrumentedTree` once the tree
+# statistics are on, or `ConcurrentTree` in the concurrency mode
+tree_class: type[OrderedIndex] = Tree
+tree: OrderedIndex = tree_class()
+output = OutputBuffer()
+# tie-breaker for reservations with the same priority, in order of arrival
+reservation_sequence = itertools.count()
+# patron ID -> books borrowed and reserved by the patron
+patrons: dict[int, PatronData] = {}
+# maximum number of books a patron can borrow at the same time, or None
+borrow_limit: int | None = None
+# log of the commands that change the library, or None if logging is off
+operation_log: wal.WriteAheadLog | None = None
+# LSN of the last log record replayed by Recover, saved by SaveSnapshot when no
+# log is open so that recovering from the same log does not replay it again
+recovered_position: int = 0
+# renders the tree to tree.png with graphviz on Quit
+visualize_on_quit: bool = False
+# rendered records of recently printed books
+render_cache = RenderCache()
+# words of the titles and author names -> sorted IDs of the books
+title_index = TextIndex()
+author_index = TextIndex()
+
+
+# The locks of the concurrency mode (see `enable_concurrency`). They do nothing
+# until it is turned on. A command takes them in this order:
+# - catalog_lock: held exclusively by the commands that add or remove books or
+#   replace the tree, and shared by the other commands,
+# - the lock of a book: guards its borrower and reservation heap, from the
+#   search for the book to the last change. Books share the lock of their
+#   stripe so that there is no lock object per book,
+# - patrons_lock: guards the patron index, which is shared by all the books,
+#   and `render_cache.lock`.
+BOOK_LOCK_STRIPES = 256
+catalog_lock: ReadWriteLock | NoLock = NO_LOCK
+book_locks: list[ContextManager] = [NO_LOCK] * BOOK_LOCK_STRIPES
+patrons_lock: ContextManager = NO_LOCK
+
+
+def book_lock(bookID: int) -> ContextManager:
+    """Returns the lock guarding the reservations and borrower of a book."""
+    return book_locks[bookID % BOOK_LOCK_STRIPES]
+
+
+def render(book) -> str:
+    """Returns the record of a book, read under the lock of the book."""
+    with book_lock(book.key):
+        return str(book.data)
+
+
+def get_patron(patronID: int) -> PatronData:
+    """Returns the record of a patron, creating it if needed."""
+    with patrons_lock:
+        patron = patrons.get(patronID)
+        if patron is None:
+            patron = patrons[patronID] = PatronData(patronID)
+        return patron
+
+
+def release_patron(patronID: int, bookID: int, reservation: bool = False):
+    """Removes a book from the borrowed (or reserved) books of a patron, and
+    forgets the patron when they hold no more books."""
+    with patrons_lock:
+        patron = patrons.get(patronID)
+        if patron is None:
+            return
+        if reservation:
+            patron.reserved.discard(bookID)
+        else:
+            patron.borrowed.discard(bookID)
+        if not patron.borrowed and not patron.reserved:
+            del patrons[patronID]
+
+
+def can_borrow(patronID: int) -> bool:
+    """Returns whether a patron is below the borrow limit."""
+    if borrow_limit is None:
+        return True
+    patron = patrons.get(patronID)
+    return patron is None or len(patron.borrowed) < borrow_limit
 
 
 def PrintBook(bookId: int):
@@ -54,12 +305,16 @@ def PrintBook(bookId: int):
     Parameters:
     bookId (int): The ID of the book to be printed.
     """
-    book = tree.search(bookId)
-    if book is None:
-        print(f"Book {bookId} not found in the Library")
-    else:
-        print(book.data)
-    print()
+    record = render_cache.get(bookId)
+    if record is None:
+        with catalog_lock.read_locked(), book_lock(bookId):
+            book = tree.search(bookId)
+            if book is None:
+                output.write(f"Book {bookId} not found in the Library\n\n")
+                return
+            record = str(book.data)
+            render_cache.put(bookId, record)
+    output.write(f"{record}\n\n")
 
 
 def BorrowBook(patronID: int, bookID: int, patronPriority: int):
@@ -70,19 +325,80 @@ def BorrowBook(patronID: int, bookID: int, patronPriority: int):
     - bookID (int): The ID of the book being borrowed.
     - patronPriority (int): The priority of the patron.
     """
-    book = tree.search(bookID)
-    assert book is not None
+    with catalog_lock.read_locked(), book_lock(bookID):
+        book = tree.search(bookID)
+        assert book is not None
+        render_cache.invalidate(bookID)
+        bookdata: NodeData = book.data
+        if bookdata.is_available:
+            with patrons_lock:
+                if not can_borrow(patronID):
+                    output.write(
+                        f"Patron {patronID} has reached the limit of {borrow_limit} books\n\n"
+                    )
+                    return
+                get_patron(patronID).borrowed.add(bookID)
+            bookdata.is_available = False
+            bookdata.borrowed_by = patronID
+            output.write(f"Book {book.key} Borrowed by Patron {patronID}\n\n")
+        else:
+            if bookdata.reservation_heap is None:
+                bookdata.reservation_heap = Heap()
+            reservation_heap = bookdata.reservation_heap
+            if patronID in reservation_heap:
+                output.write(
+                    f"Book {book.key} Already Reserved by Patron {patronID}\n\n"
+                )
+            else:
+                sequence = next(reservation_sequence)
+                reservation_heap.push((patronPriority, sequence, patronID))
+                get_patron(patronID).reserved.add(bookID)
+                output.write(f"Book {book.key} Reserved by Patron {patronID}\n\n")
 
-    bookdata: NodeData = book.data
-    if bookdata.is_available:
-        bookdata.is_available = False
-        bookdata.borrowed_by = patronID
-        print(f"Book {book.key} Borrowed by Patron {patronID}")
-    else:
-        reservation_heap = bookdata.reservation_heap
-        reservation_heap.push((patronPriority, time.time(), patronID))
-        print(f"Book {book.key} Reserved by Patron {patronID}")
-    print()
+
+def CancelReservation(patronID: int, bookID: int):
+    """Cancels the reservation made by a patron for a book.
+
+    Args:
+    - patronID (int): The ID of the patron who made the reservation.
+    - bookID (int): The ID of the reserved book.
+    """
+    with catalog_lock.read_locked(), book_lock(bookID):
+        book = tree.search(bookID)
+        assert book is not None
+        render_cache.invalidate(bookID)
+        reservation_heap = book.data.reservation_heap
+        if reservation_heap is None or patronID not in reservation_heap:
+            output.write(f"Patron {patronID} has no reservation for Book {bookID}\n\n")
+        else:
+            reservation_heap.remove(patronID)
+            release_patron(patronID, bookID, reservation=True)
+            output.write(
+                f"Reservation made by Patron {patronID} for Book {bookID} has been cancelled\n\n"
+            )
+
+
+def UpdateReservationPriority(patronID: int, bookID: int, patronPriority: int):
+    """Changes the priority of the reservation made by a patron for a book. The
+    reservation keeps its place among reservations with the same priority.
+
+    Args:
+    - patronID (int): The ID of the patron who made the reservation.
+    - bookID (int): The ID of the reserved book.
+    - patronPriority (int): The new priority of the patron.
+    """
+    with catalog_lock.read_locked(), book_lock(bookID):
+        book = tree.search(bookID)
+        assert book is not None
+        render_cache.invalidate(bookID)
+        reservation_heap = book.data.reservation_heap
+        if reservation_heap is None or patronID not in reservation_heap:
+            output.write(f"Patron {patronID} has no reservation for Book {bookID}\n\n")
+        else:
+            reservation_heap.update_priority(patronID, patronPriority)
+            output.write(
+                f"Reservation made by Patron {patronID} for Book {bookID} updated to priority {patronPriority}\n\n"
+            )
 
 
 def InsertBook(
@@ -101,7 +417,240 @@ def InsertBook(
     """
     is_available: bool = True if availablilityStatus == "Yes" else False
     node_data = NodeData(bookID, bookName, authorName, is_available)
-    tree.insert(bookID, node_data)
+    with catalog_lock.write_locked():
+        if tree.insert(bookID, node_data).data is node_data:
+            title_index.add(bookID, bookName)
+            author_index.add(bookID, authorName)
+        render_cache.invalidate(bookID)
+
+
+def load_books(records: Iterable[tuple[int, str, str, str]], sort: bool = False):
+    """Loads many books into the library at once.
+
+    An empty library is built directly with `from_sorted` of the tree class in
+    O(n) time, which counts no color flips; the color flip count so far is
+    kept. Otherwise the books are inserted one by one. As with `InsertBook`,
+    only the first book with a given bookID is added.
+
+    Parameters:
+    - records (Iterable[tuple[int, str, str, str]]): The (bookID, bookName,
+      authorName, availablilityStatus) of each book, sorted by bookID.
+    - sort (bool): Sorts the records by bookID first.
+    """
+    global tree
+    with catalog_lock.write_locked():
+        if len(tree):
+            for record in records:
+                InsertBook(*record)
+            return
+
+        if sort:
+            # the sort is stable, so the first of the books with the same ID
+            # stays first
+            records = sorted(records, key=lambda record: record[0])
+        items = []
+        for bookID, bookName, authorName, status in records:
+            if items and items[-1][0] == bookID:
+                continue
+            data = NodeData(bookID, bookName, authorName, status == "Yes")
+            items.append((bookID, data))
+        flip_count = tree.flip_count
+        tree = tree_class.from_sorted(items)
+        tree.flip_count = flip_count
+        render_cache.clear()
+        rebuild_text_index()
+
+
+def BulkInsertBooks(fileName: str):
+    """Inserts the books listed in a file into the library.
+
+    The operation log keeps the contents of the file rather than its name, as
+    the file may have changed by the time the log is replayed.
+
+    Parameters:
+    - fileName (str): A file with one `InsertBook(...)` command per line, in any
+      order of book IDs.
+    """
+    with open(fileName, "r") as catalog:
+        text = catalog.read()
+    insert_catalog(text)
+    if operation_log is not None:
+        operation_log.append(insert_catalog.__name__, [text])
+
+
+def insert_catalog(text: str):
+    """Inserts the books listed in the text of a `BulkInsertBooks` file. Replays
+    `BulkInsertBooks` from the operation log."""
+    load_books(parse_catalog(text.splitlines()), sort=True)
+
+
+def read_catalog(fileName: str) -> list[tuple[int, str, str, str]]:
+    """Reads the (bookID, bookName, authorName, availablilityStatus) of every
+    book in a file of `InsertBook(...)` commands.
+
+    Raises:
+    - ValueError: If a line is not an `InsertBook` command.
+    """
+    with open(fileName, "r") as catalog:
+        return parse_catalog(catalog)
+
+
+def parse_catalog(lines: Iterable[str]) -> list[tuple[int, str, str, str]]:
+    """Parses lines of `InsertBook(...)` commands as `read_catalog` does."""
+    records = []
+    for line in lines:
+        command = parse_command(line)
+        if command is None:
+            continue
+        function, args = command
+        if function is not InsertBook:
+            raise ValueError(f"Expected InsertBook: {line.strip()}")
+        records.append(tuple(args))
+    return records
+
+
+def rebuild_patrons():
+    """Rebuilds the patron index from the books in the tree."""
+    patrons.clear()
+    for node in tree:
+        bookdata = node.data
+        if bookdata.borrowed_by is not None:
+            get_patron(bookdata.borrowed_by).borrowed.add(node.key)
+        if bookdata.reservation_heap:
+            for priority, sequence, patronID in bookdata.reservation_heap:
+                get_patron(patronID).reserved.add(node.key)
+
+
+def rebuild_text_index():
+    """Rebuilds the title and author indexes from the books in the tree."""
+    title_index.clear()
+    author_index.clear()
+    for node in tree:
+        title_index.add(node.key, node.data.book_name)
+        author_index.add(node.key, node.data.author_name)
+
+
+def SaveSnapshot(fileName: str):
+    """Saves the books, borrowers and reservations of the library to a binary
+    snapshot file.
+
+    The snapshot records the LSN of the last logged command it includes: the
+    last one in the open log, or else the last one replayed by `Recover`, so
+    that a later recovery only replays the commands logged after it.
+
+    Parameters:
+    - fileName (str): The snapshot file.
+    """
+    # exclusive, so that no book changes while the snapshot is written
+    with catalog_lock.write_locked():
+        if operation_log is not None:
+            log_position = operation_log.last_lsn
+        else:
+            log_position = recovered_position
+        count = snapshot.write_snapshot(
+            fileName, tree, next(reservation_sequence), log_position
+        )
+        # the snapshot includes every logged command, so the log can start over
+        if operation_log is not None:
+            operation_log.truncate()
+    output.write(f"Snapshot Saved: {count} books\n\n")
+
+
+def LoadSnapshot(fileName: str):
+    """Replaces the library with the one saved in a snapshot file.
+
+    If the operation log is open, the snapshot is read into memory and logged
+    as a whole, as the file may have changed by the time the log is replayed.
+    Otherwise it is read through `mmap`.
+
+    Parameters:
+    - fileName (str): The snapshot file.
+    """
+    if operation_log is None:
+        loaded = snapshot.read_snapshot(fileName, NodeData, tree_class)
+    else:
+        with open(fileName, "rb") as f:
+            data = f.read()
+        loaded = snapshot.parse_snapshot(data, NodeData, tree_class, fileName)
+    use_snapshot(*loaded)
+    if operation_log is not None:
+        operation_log.append(restore_snapshot.__name__, [data])
+    output.write(f"Snapshot Loaded: {len(tree)} books\n\n")
+
+
+def restore_snapshot(data: bytes):
+    """Replaces the library with the snapshot in `data`. Replays `LoadSnapshot`
+    from the operation log."""
+    use_snapshot(*snapshot.parse_snapshot(data, NodeData, tree_class))
+
+
+def use_snapshot(new_tree: OrderedIndex, next_sequence: int, log_position: int):
+    """Replaces the library with a tree read from a snapshot."""
+    global tree, reservation_sequence
+    with catalog_lock.write_locked():
+        tree = new_tree
+        reservation_sequence = itertools.count(next_sequence)
+        rebuild_patrons()
+        rebuild_text_index()
+        render_cache.clear()
+
+
+def OpenLog(fileName: str, syncEvery: int, syncMilliseconds: int):
+    """Starts logging the commands that change the library to a log file.
+
+    The log is synced to disk once `syncEvery` commands are pending, or once the
+    oldest pending command has waited `syncMilliseconds`.
+
+    Parameters:
+    - fileName (str): The log file. New commands are appended after the
+      commands already in it.
+    - syncEvery (int): The number of commands synced together.
+    - syncMilliseconds (int): The longest a command waits for its group, or 0.
+    """
+    global operation_log
+    if operation_log is not None:
+        operation_log.close()
+    operation_log = wal.WriteAheadLog(fileName, syncEvery, syncMilliseconds / 1000)
+    output.write(f"Logging to {fileName}\n\n")
+
+
+def Recover(snapshotFileName: str, logFileName: str):
+    """Restores the library after a crash from the latest snapshot and the
+    commands logged after it.
+
+    Parameters:
+    - snapshotFileName (str): The snapshot file. If it does not exist, the
+      library starts empty.
+    - logFileName (str): The log file.
+    """
+    global tree, reservation_sequence, output, recovered_position
+    with catalog_lock.write_locked():
+        log_position = 0
+        if os.path.exists(snapshotFileName):
+            tree, next_sequence, log_position = snapshot.read_snapshot(
+                snapshotFileName, NodeData, tree_class
+            )
+            reservation_sequence = itertools.count(next_sequence)
+        else:
+            tree = tree_class()
+        rebuild_patrons()
+        rebuild_text_index()
+        render_cache.clear()
+
+        replayed = 0
+        visible_output, output = output, NullOutput()
+        try:
+            for lsn, name, args in wal.read_log(logFileName):
+                if lsn > log_position:
+                    REPLAYED_COMMANDS[name](*args)
+                    replayed += 1
+                    log_position = lsn
+        finally:
+            output = visible_output
+        recovered_position = log_position
+        output.write(
+            f"Recovered: {len(tree)} books, {replayed} commands replayed\n\n"
+        )
 
 
 def ReturnBook(patronID: int, bookID: int):
@@ -112,18 +661,53 @@ def ReturnBook(patronID: int, bookID: int):
     - bookID (int): The ID of the book being returned.
 
     """
-    book = tree.search(bookID)
-    assert book is not None
-    bookdata = book.data
-    bookdata.is_available = True
-    bookdata.borrowed_by = None
-    print(f"Book {bookID} Returned by Patron {patronID}", end="\n\n")
+    with catalog_lock.read_locked(), book_lock(bookID):
+        book = tree.search(bookID)
+        assert book is not None
+        render_cache.invalidate(bookID)
+        bookdata = book.data
+        if bookdata.borrowed_by is not None:
+            release_patron(bookdata.borrowed_by, bookID)
+        bookdata.is_available = True
+        bookdata.borrowed_by = None
+        output.write(f"Book {bookID} Returned by Patron {patronID}\n\n")
 
-    if bookdata.reservation_heap:
-        priority, time, patronID = bookdata.reservation_heap.pop()
-        bookdata.is_available = False
-        bookdata.borrowed_by = patronID
-        print(f"Book {bookID} Allotted to Patron {patronID}", end="\n\n")
+        if bookdata.reservation_heap:
+            priority, sequence, patronID = bookdata.reservation_heap.pop()
+            bookdata.is_available = False
+            bookdata.borrowed_by = patronID
+            with patrons_lock:
+                patron = get_patron(patronID)
+                patron.reserved.discard(bookID)
+                patron.borrowed.add(bookID)
+            output.write(f"Book {bookID} Allotted to Patron {patronID}\n\n")
+
+
+def PrintPatron(patronID: int):
+    """Prints the books borrowed and reserved by a patron.
+
+    Parameters:
+    patronID (int): The ID of the patron to be printed.
+    """
+    with patrons_lock:
+        patron = patrons.get(patronID)
+        if patron is None:
+            patron = PatronData(patronID)
+        record = str(patron)
+    output.write(f"{record}\n\n")
+
+
+def SetBorrowLimit(limit: int):
+    """Sets the maximum number of books a patron can borrow at the same time.
+    Books allotted from a reservation are not limited, since the reservation
+    was already accepted.
+
+    Parameters:
+    limit (int): The new limit, or 0 for no limit.
+    """
+    global borrow_limit
+    borrow_limit = limit if limit > 0 else None
+    output.write(f"Borrow Limit: {limit if limit > 0 else 'None'}\n\n")
 
 
 def FindClosestBook(bookID: int):
@@ -132,11 +716,23 @@ def FindClosestBook(bookID: int):
     Parameters:
     - bookID (int): The ID of the book to find the closest books for.
     """
-    books = tree.find_closest(bookID)
+    with catalog_lock.read_locked():
+        for book in tree.find_closest(bookID):
+            output.write(f"{render(book)}\n\n")
+
 
-    for book in books:
-        print(book.data)
-        print()
+def FindClosestBooks(bookID: int, k: int):
+    """Finds the k books with the closest IDs to the given bookID and prints
+    their data in increasing order of ID. Of two books equally far away, the
+    one with the smaller ID is closer.
+
+    Parameters:
+    - bookID (int): The ID of the book to find the closest books for.
+    - k (int): The number of books to print.
+    """
+    with catalog_lock.read_locked():
+        for book in tree.find_k_closest(bookID, k):
+            output.write(f"{render(book)}\n\n")
 
 
 def DeleteBook(bookID: int):
@@ -145,42 +741,226 @@ def DeleteBook(bookID: int):
     Parameters:
     - bookID (int): The ID of the book to be deleted.
     """
-    book = tree.search(bookID)
-    assert book is not None
-    reservation_heap = book.data.reservation_heap
-    tree.delete(bookID)
-    print(f"Book {bookID} is no longer available", end="")
-
-    if reservation_heap:
-        patrons = []
-        while reservation_heap:
-            priority, time, patronID = reservation_heap.pop()
-            patrons.append(patronID)
-        if len(patrons) == 1:
-            print(f". Reservation made by Patron {patrons[0]} has been cancelled!")
+    with catalog_lock.write_locked():
+        book = tree.search(bookID)
+        assert book is not None
+        render_cache.invalidate(bookID)
+        reservation_heap = book.data.reservation_heap
+        if book.data.borrowed_by is not None:
+            release_patron(book.data.borrowed_by, bookID)
+        title_index.remove(bookID, book.data.book_name)
+        author_index.remove(bookID, book.data.author_name)
+        tree.delete(bookID)
+        output.write(f"Book {bookID} is no longer available")
+
+        if reservation_heap:
+            cancelled = []
+            while reservation_heap:
+                priority, sequence, patronID = reservation_heap.pop()
+                release_patron(patronID, bookID, reservation=True)
+                cancelled.append(patronID)
+            if len(cancelled) == 1:
+                output.write(
+                    f". Reservation made by Patron {cancelled[0]} has been cancelled!\n\n"
+                )
+            else:
+                output.write(
+                    f". Reservations made by Patrons {', '.join(map(str, cancelled))} have been cancelled!\n\n"
+                )
         else:
-            print(
-                f". Reservations made by Patrons {', '.join(map(str, patrons))} have been cancelled!"
-            )
-    else:
-        print()
-    print()
+            output.write("\n\n")
 
 
 def Quit():
     """Terminates the program and prints a message."""
-    print("Program Terminated!!")
+    output.write("Program Terminated!!\n")
+    output.flush()
+    if operation_log is not None:
+        operation_log.close()
 
-    tree.visualize_binary_tree("tree")
+    if visualize_on_quit and isinstance(tree, Tree):
+        tree.visualize_binary_tree("tree")
     exit()
 
 
+def ExportTree(
+    fileName: str,
+    levels: int = 0,
+    bookID1: int | None = None,
+    bookID2: int | None = None,
+):
+    """Writes the tree to a DOT file, or to a JSON file if the name ends with
+    `.json`, one node at a time.
+
+    Parameters:
+    - fileName (str): The file to write.
+    - levels (int): The number of levels to write from the root, 0 for all.
+    - bookID1 (int | None): The smallest book ID to write, or None.
+    - bookID2 (int | None): The greatest book ID to write, or None.
+    """
+    if not isinstance(tree, Tree):
+        output.write("Tree export needs the rbtree backend\n\n")
+        return
+    with catalog_lock.read_locked():
+        count = tree_export.export_tree(
+            fileName, tree, start=bookID1, end=bookID2, levels=levels or None
+        )
+    output.write(f"Tree Exported: {count} books\n\n")
+
+
+def ExportSubtree(fileName: str, bookID: int, levels: int = 0):
+    """Writes the subtree of a book to a DOT or JSON file, like `ExportTree`.
+
+    Parameters:
+    - fileName (str): The file to write.
+    - bookID (int): The ID of the book at the root of the subtree.
+    - levels (int): The number of levels to write from the book, 0 for all.
+    """
+    if not isinstance(tree, Tree):
+        output.write("Tree export needs the rbtree backend\n\n")
+        return
+    with catalog_lock.read_locked():
+        if tree.search(bookID) is None:
+            output.write(f"Book {bookID} not found in the Library\n\n")
+            return
+        count = tree_export.export_tree(
+            fileName, tree, root=bookID, levels=levels or None
+        )
+    output.write(f"Tree Exported: {count} books\n\n")
+
+
 def ColorFlipCount():
     """Prints the color flip count of the tree.
 
     This function prints the color flip count of the tree.
     """
-    print(f"Color Flip Count: {tree.flip_count}\n")
+    output.write(f"Color Flip Count: {tree.flip_count}\n\n")
+
+
+def TreeStats():
+    """Prints the height of the tree, and its black height for a red-black
+    tree. When the tree statistics are on, also prints the counts of
+    rotations, fixup cases and visited nodes.
+    """
+    with catalog_lock.read_locked():
+        if isinstance(tree, Tree):
+            output.write(
+                f"Height: {tree.height()}, Black Height: {tree.black_height()}\n"
+            )
+        else:
+            output.write(f"Height: {tree.height()}\n")
+    if not isinstance(tree, InstrumentedTree):
+        output.write("Tree statistics are off\n\n")
+        return
+
+    counters = tree.counters
+    insert_cases = ", ".join(
+        f"Case {case} = {count}"
+        for case, count in enumerate(counters.insert_cases, start=1)
+    )
+    delete_cases = ", ".join(
+        f"Case {case} = {count}"
+        for case, count in enumerate(counters.delete_cases, start=1)
+    )
+    output.write(
+        f"Rotations: Left = {counters.left_rotations}, "
+        f"Right = {counters.right_rotations}\n"
+        f"Insert Fixup: {insert_cases}\n"
+        f"Delete Fixup: {delete_cases}\n"
+        f"Search: Calls = {counters.searches}, "
+        f"Nodes Visited = {counters.search_visits}\n"
+        f"FindClosest: Calls = {counters.closest_searches}, "
+        f"Nodes Visited = {counters.closest_visits}\n"
+        f"RangeSearch: Calls = {counters.range_searches}, "
+        f"Nodes Visited = {counters.range_visits}\n\n"
+    )
+
+
+def enable_tree_stats():
+    """Turns the tree statistics on by moving the books to an
+    `InstrumentedTree` with the same shape, so that `TreeStats` prints the
+    counts of the tree operations from then on."""
+    global tree_class
+    if isinstance(tree, ConcurrentTree):
+        raise ValueError("The tree statistics do not support the concurrency mode")
+    tree_class = InstrumentedTree
+    if not isinstance(tree, InstrumentedTree):
+        move_books(InstrumentedTree)
+
+
+def enable_concurrency():
+    """Turns the concurrency mode on, so that the commands can be run from many
+    threads at the same time. The books move to a `ConcurrentTree` with the
+    same shape, and the locks (see `catalog_lock`) start guarding the library:
+    the commands that add or remove books run alone, the others run together
+    but one at a time for each book. The mode needs the rbtree backend without
+    the tree statistics, and cannot be turned off.
+
+    Raises:
+    - ValueError: If another backend or the tree statistics are in use.
+    """
+    global tree_class, catalog_lock, book_locks, patrons_lock
+    if tree_class is ConcurrentTree:
+        return
+    if tree_class is not Tree:
+        raise ValueError("The concurrency mode needs the rbtree backend")
+    tree_class = ConcurrentTree
+    move_books(ConcurrentTree)
+    catalog_lock = ReadWriteLock()
+    book_locks = [threading.Lock() for _ in range(BOOK_LOCK_STRIPES)]
+    patrons_lock = threading.RLock()
+    render_cache.lock = threading.Lock()
+
+
+def move_books(new_class: type[Tree]):
+    """Moves the books to a new red-black tree of another class with the same
+    shape and color flip count."""
+    global tree
+    flip_count = tree.flip_count
+    tree = new_class.from_layout(
+        (node.key, node.data, node.color, depth) for node, depth in tree.layout()
+    )
+    tree.flip_count = flip_count
+
+
+def use_backend(name: str):
+    """Moves the books to a new tree of one of the `BACKENDS`, e.g. "btree".
+    The color flip count starts over."""
+    global tree, tree_class
+    if isinstance(tree, ConcurrentTree):
+        raise ValueError("The concurrency mode needs the rbtree backend")
+    tree_class = BACKENDS[name]
+    tree = tree_class.from_sorted((node.key, node.data) for node in tree)
+
+
+def reset():
+    """Empties the library: the books, patrons, borrow limit, reservation
+    order, text indexes and `PrintBook` cache start over, and the operation log
+    is closed. The settings chosen at startup are kept: the tree class (backend,
+    tree statistics or concurrency mode), `output` and `visualize_on_quit`."""
+    global tree, reservation_sequence, borrow_limit, operation_log
+    global recovered_position
+    with catalog_lock.write_locked():
+        if operation_log is not None:
+            operation_log.close()
+            operation_log = None
+        tree = tree_class()
+        with patrons_lock:
+            patrons.clear()
+        borrow_limit = None
+        reservation_sequence = itertools.count()
+        recovered_position = 0
+        title_index.clear()
+        author_index.clear()
+        render_cache.reset()
+
+
+def CacheStats():
+    """Prints the hits, misses and evictions of the `PrintBook` cache."""
+    output.write(
+        f"Cache Hits: {render_cache.hits}, Misses: {render_cache.misses}, "
+        f"Evictions: {render_cache.evictions}, Size: {len(render_cache.records)}\n\n"
+    )
 
 
 def PrintBooks(bookID1: int, bookID2: int):
@@ -190,21 +970,244 @@ def PrintBooks(bookID1: int, bookID2: int):
     bookID1 (int): The starting book ID of the range.
     bookID2 (int): The ending book ID of the range.
     """
-    nodes = tree.range_search(bookID1, bookID2)
-    for node in nodes:
-        PrintBook(node.key)
+    with catalog_lock.read_locked():
+        for node in tree.irange(bookID1, bookID2):
+            output.write(f"{render(node)}\n\n")
+
+
+def print_books(bookIDs: Iterable[int]):
+    """Prints the books with the given IDs."""
+    for bookID in bookIDs:
+        output.write(f"{render(tree.search(bookID))}\n\n")
+
+
+def FindBooksByAuthor(authorName: str):
+    """Prints the books whose author name contains every word of the given
+    name, in order of book ID.
+
+    Parameters:
+    authorName (str): The name, or some words of it, in any case.
+    """
+    with catalog_lock.read_locked():
+        bookIDs = author_index.search(authorName)
+        if not bookIDs:
+            output.write(f'No books by author "{authorName}"\n\n')
+        print_books(bookIDs)
+
+
+def SearchTitle(query: str):
+    """Prints the books whose title contains every word of the query, in order
+    of book ID. The last word also matches longer words that start with it.
+
+    Parameters:
+    query (str): The words to look for, in any case.
+    """
+    with catalog_lock.read_locked():
+        bookIDs = title_index.search(query, prefix=True)
+        if not bookIDs:
+            output.write(f'No books match "{query}"\n\n')
+        print_books(bookIDs)
+
+
+def CountBooks(bookID1: int, bookID2: int):
+    """Prints the number of books within the range of book IDs specified.
+
+    Parameters:
+    bookID1 (int): The starting book ID of the range.
+    bookID2 (int): The ending book ID of the range.
+    """
+    output.write(f"Book Count: {tree.count_range(bookID1, bookID2)}\n\n")
 
 
-if len(sys.argv) > 1:
-    filename = sys.argv[1]
-    input_file = open(filename, "r")
+def PrintBooksPage(pageNumber: int, pageSize: int):
+    """Prints one page of the catalog in order of book ID.
 
-    # output_filename: str = str(filename.split(".")[0] + "_output_file.txt")
-    output_filename = str(filename).split(".")[0] + "_output_file.txt"
-    sys.stdout = open(output_filename, "w")
-else:
-    input_file = sys.stdin
+    Parameters:
+    pageNumber (int): The page to print, starting from 1.
+    pageSize (int): The number of books on each page.
+    """
+    first = (pageNumber - 1) * pageSize
+    with catalog_lock.read_locked():
+        if pageNumber < 1 or pageSize < 1 or first >= len(tree):
+            output.write(f"Page {pageNumber} is empty\n\n")
+            return
+
+        last = min(first + pageSize, len(tree)) - 1
+        for node in tree.irange(tree.select(first).key, tree.select(last).key):
+            output.write(f"{render(node)}\n\n")
+
+
+COMMANDS: dict[str, Callable] = {
+    "PrintBook": PrintBook,
+    "PrintBooks": PrintBooks,
+    "PrintBooksPage": PrintBooksPage,
+    "CountBooks": CountBooks,
+    "FindBooksByAuthor": FindBooksByAuthor,
+    "SearchTitle": SearchTitle,
+    "InsertBook": InsertBook,
+    "BulkInsertBooks": BulkInsertBooks,
+    "SaveSnapshot": SaveSnapshot,
+    "LoadSnapshot": LoadSnapshot,
+    "BorrowBook": BorrowBook,
+    "ReturnBook": ReturnBook,
+    "CancelReservation": CancelReservation,
+    "UpdateReservationPriority": UpdateReservationPriority,
+    "DeleteBook": DeleteBook,
+    "FindClosestBook": FindClosestBook,
+    "FindClosestBooks": FindClosestBooks,
+    "ColorFlipCount": ColorFlipCount,
+    "CacheStats": CacheStats,
+    "TreeStats": TreeStats,
+    "ExportTree": ExportTree,
+    "ExportSubtree": ExportSubtree,
+    "PrintPatron": PrintPatron,
+    "SetBorrowLimit": SetBorrowLimit,
+    "Quit": Quit,
+    "OpenLog": OpenLog,
+    "Recover": Recover,
+}
+
+# commands that change the library and are written to the operation log
+LOGGED_COMMANDS = {
+    InsertBook,
+    DeleteBook,
+    BorrowBook,
+    ReturnBook,
+    CancelReservation,
+    UpdateReservationPriority,
+    SetBorrowLimit,
+}
+
+# commands that change the library from a file; they write the contents of the
+# file to the operation log themselves
+LOADING_COMMANDS = {
+    BulkInsertBooks,
+    LoadSnapshot,
+}
+
+# the commands of the operation log records, by name
+REPLAYED_COMMANDS: dict[str, Callable] = {
+    **COMMANDS,
+    insert_catalog.__name__: insert_catalog,
+    restore_snapshot.__name__: restore_snapshot,
+}
+
+# a string argument in double or single quotes, as in Python
+_STRING = r'"(?:[^"\\\n]|\\.)*"' + r"|'(?:[^'\\\n]|\\.)*'"
+# the arguments may contain parentheses and `#` only inside strings, and the
+# command may be followed by a `;` and a `# comment`
+_COMMAND_RE = re.compile(
+    rf"""\s*(\w+)\s*\(((?:{_STRING}|[^"'()#])*)\)\s*;?\s*(?:#.*)?$"""
+)
+_ARGUMENT_RE = re.compile(rf"\s*(?:({_STRING})|(-?\d+))\s*(,|$)")
+
+
+def parse_command(
+    line: str, commands: dict[str, Callable] | None = None
+) -> tuple[Callable, list] | None:
+    """Parses one line of the input file into a command and its arguments.
+
+    Parameters:
+    - line (str): A line such as `InsertBook(1, "Title", "Author", "Yes")`.
+      Strings may be in single or double quotes, and the line may end with a
+      `# comment`.
+    - commands (dict[str, Callable] | None): The commands to look the name up
+      in, `COMMANDS` by default.
+
+    Returns:
+    - tuple[Callable, list] | None: The function to call and its arguments, or
+      None if the line is blank or only a comment.
+    """
+    if not line or line.isspace() or line.lstrip().startswith("#"):
+        return None
+
+    if commands is None:
+        commands = COMMANDS
+    match = _COMMAND_RE.match(line)
+    if match is None or match.group(1) not in commands:
+        raise ValueError(f"Invalid command: {line.strip()}")
+
+    args = []
+    text = match.group(2)
+    pos = 0
+    if not text.isspace():
+        while pos < len(text):
+            arg = _ARGUMENT_RE.match(text, pos)
+            if arg is None:
+                raise ValueError(f"Invalid arguments: {line.strip()}")
+            string, number, comma = arg.groups()
+            if number is not None:
+                args.append(int(number))
+            elif "\\" in string:
+                args.append(ast.literal_eval(string))
+            else:
+                args.append(string[1:-1])
+            pos = arg.end()
+            if not comma:
+                break
+        if pos < len(text):
+            raise ValueError(f"Invalid arguments: {line.strip()}")
+
+    return commands[match.group(1)], args
+
+
+def run(lines: Iterable[str]):
+    """Executes the commands one line at a time. The output is flushed when
+    the commands end, even if a command fails. If the operation log is open,
+    every command that changes the library is logged once it succeeds.
+
+    Parameters:
+    - lines (Iterable[str]): The input lines, e.g. an open file.
+    """
+    try:
+        for line in lines:
+            command = parse_command(line)
+            if command is not None:
+                function, args = command
+                function(*args)
+                if operation_log is not None and function in LOGGED_COMMANDS:
+                    operation_log.append(function.__name__, args)
+    finally:
+        output.flush()
+        if operation_log is not None:
+            operation_log.sync()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Library management system")
+    parser.add_argument(
+        "--tree-stats",
+        action="store_true",
+        help="count rotations, fixup cases and visited nodes for TreeStats()",
+    )
+    parser.add_argument(
+        "--visualize",
+        action="store_true",
+        help="render the tree to tree.png with graphviz on Quit()",
+    )
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="rbtree")
+    parser.add_argument(
+        "--fanout", type=int, default=BTree.fanout, help="fanout of the btree backend"
+    )
+    parser.add_argument("file", nargs="?")
+    arguments = parser.parse_args()
+    if arguments.tree_stats and arguments.backend != "rbtree":
+        parser.error("--tree-stats needs the rbtree backend")
+    BTree.fanout = arguments.fanout
+    use_backend(arguments.backend)
+    if arguments.tree_stats:
+        enable_tree_stats()
+    visualize_on_quit = arguments.visualize
+
+    if arguments.file:
+        filename = arguments.file
+        input_file = open(filename, "r")
+
+        # output_filename: str = str(filename.split(".")[0] + "_output_file.txt")
+        output_filename = str(filename).split(".")[0] + "_output_file.txt"
+        sys.stdout = open(output_filename, "w")
+    else:
+        input_file = sys.stdin
 
-for command in input_file.readlines():
-    exec(command)
-sys.stdout.close()
+    run(input_file)
+    sys.stdout.close()
@@ -1,122 +1,250 @@
 import heapq
+from typing import Iterable, Iterator
+import warnings
 
 
 class Heap:
-    """Class implementing a min-heap of tuples (priority, value, index)"""
+    """Class implementing an indexed min-heap of tuples (priority, sequence, value)
+
+    The heap is stored as a list and maintained with the C implementation in
+    `heapq`. Ties on priority are broken by the sequence number, which the
+    caller takes from a monotonically increasing counter so that equal
+    priorities are served first-in, first-out; every push takes a new one.
+    Every value may be in the heap only once.
+
+    The tuple of each value in the heap is kept in a dictionary. A removed
+    tuple is not taken out of the list, which would need its position: it is
+    dropped from the dictionary and skipped when it reaches the top. Changing
+    a priority removes the tuple and pushes a new one. When the removed tuples
+    outnumber the others, the list is rebuilt without them.
+    """
 
     def __init__(self):
-        self.heap: list[tuple[int, float, int]] = []
+        self.heap: list[tuple[int, int, int]] = []
+        self.entries: dict[int, tuple[int, int, int]] = {}
+        self.removed = 0
+
+    @classmethod
+    def from_items(cls, items: Iterable[tuple[int, int, int]]) -> "Heap":
+        """Builds a heap from the given items in O(n).
+
+        Items that already satisfy the heap property keep their order, so a
+        heap can be restored exactly from its items.
+
+        Args:
+        - items (Iterable[tuple[int, int, int]]): The items of the heap.
+
+        Raises:
+        - ValueError: If a value appears more than once.
+        """
+        heap = cls()
+        heap.heap = list(items)
+        for item in heap.heap:
+            if item[2] in heap.entries:
+                raise ValueError(f"{item[2]} is already in the heap")
+            heap.entries[item[2]] = item
+        heapq.heapify(heap.heap)
+        return heap
 
     def __str__(self) -> str:
-        return str([c for a, b, c in self.heap])
+        return str([c for a, b, c in self])
+
+    # The index helpers of the hand-written heap, kept for callers of the old
+    # API. The heap no longer uses them.
 
     def left(self, i: int) -> int:
         """Returns the index of the left child of the node at index i.
 
+        Deprecated: the list is maintained with `heapq`.
+
         Parameters:
         - i (int): The index of the node.
 
         Returns:
         - int: The index of the left child.
         """
+        warnings.warn("Heap.left is deprecated", DeprecationWarning, stacklevel=2)
         return 2 * i + 1
 
     def right(self, i: int) -> int:
         """Returns the index of the right child of the node at index i.
 
+        Deprecated: the list is maintained with `heapq`.
+
         Parameters:
         - i (int): The index of the node.
 
         Returns:
         - int: The index of the right child.
         """
+        warnings.warn("Heap.right is deprecated", DeprecationWarning, stacklevel=2)
         return 2 * i + 2
 
     def parent(self, i: int) -> int:
         """Returns the index of the parent node for the given index.
 
+        Deprecated: the list is maintained with `heapq`.
+
         Args:
         - i (int): The index of the node.
 
         Returns:
         - int: The index of the parent node.
         """
+        warnings.warn("Heap.parent is deprecated", DeprecationWarning, stacklevel=2)
         return (i - 1) // 2
 
     def min_heapify(self, i: int):
-        """Rearranges the elements in the heap to maintain the min-heap property.
+        """Moves the element at index i down the list until the min-heap
+        property holds below it.
+
+        Deprecated: every method of the heap keeps the property already.
 
         Args:
             i (int): Index of the element to start heapify from.
         """
-        left = self.left(i)
-        right = self.right(i)
-
-        largest = i
-        if left < len(self.heap) and self.heap[left] < self.heap[i]:
-            largest = left
-        if right < len(self.heap) and self.heap[right] < self.heap[largest]:
-            largest = right
-        if largest != i:
-            self.heap[i], self.heap[largest] = self.heap[largest], self.heap[i]
-            self.min_heapify(largest)
-
-    def push(self, item: tuple[int, float, int]):
+        warnings.warn(
+            "Heap.min_heapify is deprecated", DeprecationWarning, stacklevel=2
+        )
+        heap = self.heap
+        while True:
+            smallest = i
+            for child in (2 * i + 1, 2 * i + 2):
+                if child < len(heap) and heap[child] < heap[smallest]:
+                    smallest = child
+            if smallest == i:
+                return
+            heap[i], heap[smallest] = heap[smallest], heap[i]
+            i = smallest
+
+    def push(self, item: tuple[int, int, int]):
         """Pushes an item into the heap.
 
         Args:
-        - item (tuple[int, float, int]): The item to be pushed into the heap.
-          The tuple should contain three elements: an integer, a float, and an
-          integer.
+        - item (tuple[int, int, int]): The item to be pushed into the heap.
+          The tuple should contain three integers: the priority, the sequence
+          number and the value.
+
+        Raises:
+        - ValueError: If the value is already in the heap.
         """
-        self.heap.append(item)
-        i = len(self.heap) - 1
+        entries = self.entries
+        value = item[2]
+        if value in entries:
+            raise ValueError(f"{value} is already in the heap")
+        entries[value] = item
+        heapq.heappush(self.heap, item)
+
+    def pop(self) -> tuple[int, int, int]:
+        """Removes and returns the minimum element from the heap.
+
+        Returns:
+            A tuple containing the minimum element's attributes: (priority, sequence, value).
 
-        while self.parent(i) >= 0 and self.heap[i] < self.heap[self.parent(i)]:
-            self.heap[i], self.heap[self.parent(i)] = (
-                self.heap[self.parent(i)],
-                self.heap[i],
-            )
-            i = self.parent(i)
+        Raises:
+            IndexError: If the heap is empty.
+        """
+        heap = self.heap
+        entries = self.entries
+        while True:
+            item = heapq.heappop(heap)
+            if entries.get(item[2]) is item:
+                del entries[item[2]]
+                return item
+            self.removed -= 1
+
+    def _discard(self, value: int) -> tuple[int, int, int]:
+        """Drops the tuple of the value from the dictionary and returns it.
+        The tuple stays in the list until it reaches the top or the list is
+        rebuilt."""
+        item = self.entries.pop(value)
+        self.removed += 1
+        return item
+
+    def _compact(self):
+        """Rebuilds the list without the removed tuples once they are the
+        majority, so that removing and updating does not grow the list."""
+        if self.removed > len(self.entries):
+            self.heap = list(self)
+            heapq.heapify(self.heap)
+            self.removed = 0
+
+    def remove(self, value: int) -> tuple[int, int, int]:
+        """Removes the element with the given value from the heap.
 
-    def pop(self) -> tuple[int, float, int]:
-        """Removes and returns the minimum element from the heap.
+        Args:
+        - value (int): The value to remove.
 
         Returns:
-            A tuple containing the minimum element's attributes: (id, value, priority).
+        - tuple[int, int, int]: The removed element.
+
+        Raises:
+        - KeyError: If the value is not in the heap.
+        """
+        item = self._discard(value)
+        self._compact()
+        return item
+
+    def update_priority(self, value: int, priority: int):
+        """Changes the priority of the element with the given value. The
+        element keeps its sequence number.
+
+        Args:
+        - value (int): The value whose priority is changed.
+        - priority (int): The new priority.
+
+        Raises:
+        - KeyError: If the value is not in the heap.
+        """
+        item = (priority, self._discard(value)[1], value)
+        self.entries[value] = item
+        heapq.heappush(self.heap, item)
+        self._compact()
+
+    def contains(self, value: int) -> bool:
+        """Returns whether the given value is in the heap.
+
+        Args:
+        - value (int): The value to look for.
         """
-        ret = self.heap[0]
-        if len(self.heap) == 1:
-            self.heap.pop()
-            return ret
-        self.heap[0] = self.heap.pop(-1)
-        self.min_heapify(0)
-        return ret
-
-    def peek(self) -> tuple[int, float, int]:
+        return value in self.entries
+
+    def __contains__(self, value: int) -> bool:
+        return value in self.entries
+
+    def peek(self) -> tuple[int, int, int]:
         """Returns the top element of the heap without removing it.
 
         Returns:
-            tuple[int, float, int]: The top element of the heap.
+            tuple[int, int, int]: The top element of the heap.
         """
-        return self.heap[0]
+        heap = self.heap
+        while self.entries.get(heap[0][2]) is not heap[0]:
+            heapq.heappop(heap)
+            self.removed -= 1
+        return heap[0]
 
     def __len__(self):
         """Returns the number of elements in the heap."""
-        return len(self.heap)
+        return len(self.entries)
 
-    def __iter__(self):
-        return iter(self.heap)
+    def __iter__(self) -> Iterator[tuple[int, int, int]]:
+        """Yields the elements in the order of the list, which starts with
+        the minimum."""
+        entries = self.entries
+        return (item for item in self.heap if entries.get(item[2]) is item)
 
 
 # TUI for testing
 if __name__ == "__main__":
     heap = Heap()
+    sequence = 0
     while True:
         command = input("Enter command: ")
         if command.startswith("push"):
             key = int(command.split()[-1])
-            heap.push((key, 0, 0))
+            heap.push((key, sequence, sequence))
+            sequence += 1
         elif command.startswith("pop"):
             print(heap.pop())
 
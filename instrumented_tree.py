@@ -0,0 +1,104 @@
+"""Red-black tree that counts what its operations do.
+
+`InstrumentedTree` is a `Tree` that counts the left and right rotations, the
+iterations of `_insert_fixup` and `_delete_fixup` by case, and the nodes
+visited by `search`, `find_closest` and the range searches (`irange` and
+`range_search`).
+
+`Tree` calls hooks (`_on_rotate`, `_on_fixup_case` and `_on_lookup`) from its
+operations, which do nothing there. This subclass only overrides the hooks to
+count, so the operations themselves exist once, in `Tree`.
+
+The cases are numbered as in CLRS. Insert: 1 the uncle is red, 2 the node is
+an inner grandchild, 3 the node is an outer grandchild (case 2 is always
+followed by case 3). Delete: 1 the sibling is red, 2 both children of the
+sibling are black, 3 only the far child of the sibling is black, 4 the far
+child of the sibling is red (case 3 is always followed by case 4).
+"""
+
+from tree import Tree
+
+
+class TreeCounters:
+    """Counts of the work done by the operations of an `InstrumentedTree`.
+
+    Attributes:
+        left_rotations (int): The number of left rotations.
+        right_rotations (int): The number of right rotations.
+        insert_cases (list[int]): The iterations of `_insert_fixup` in cases
+            1 to 3.
+        delete_cases (list[int]): The iterations of `_delete_fixup` in cases
+            1 to 4.
+        searches (int): The calls to `search`, including the lookup done by
+            `delete`.
+        search_visits (int): The nodes visited by `search`.
+        closest_searches (int): The calls to `find_closest`.
+        closest_visits (int): The nodes visited by `find_closest`.
+        range_searches (int): The calls to `irange` and `range_search`.
+        range_visits (int): The nodes visited by the range searches.
+    """
+
+    __slots__ = (
+        "left_rotations",
+        "right_rotations",
+        "insert_cases",
+        "delete_cases",
+        "searches",
+        "search_visits",
+        "closest_searches",
+        "closest_visits",
+        "range_searches",
+        "range_visits",
+    )
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self):
+        self.left_rotations = 0
+        self.right_rotations = 0
+        self.insert_cases = [0, 0, 0]
+        self.delete_cases = [0, 0, 0, 0]
+        self.searches = 0
+        self.search_visits = 0
+        self.closest_searches = 0
+        self.closest_visits = 0
+        self.range_searches = 0
+        self.range_visits = 0
+
+
+class InstrumentedTree(Tree):
+    """A red-black tree that keeps `TreeCounters` of its operations.
+
+    Attributes:
+        counters (TreeCounters): The counts since the tree was created or the
+            counters were reset.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.counters = TreeCounters()
+
+    def _on_rotate(self, direction: str) -> None:
+        if direction == "left":
+            self.counters.left_rotations += 1
+        else:
+            self.counters.right_rotations += 1
+
+    def _on_fixup_case(self, kind: str, case: int) -> None:
+        if kind == "insert":
+            self.counters.insert_cases[case - 1] += 1
+        else:
+            self.counters.delete_cases[case - 1] += 1
+
+    def _on_lookup(self, kind: str, visits: int) -> None:
+        counters = self.counters
+        if kind == "search":
+            counters.searches += 1
+            counters.search_visits += visits
+        elif kind == "closest":
+            counters.closest_searches += 1
+            counters.closest_visits += visits
+        else:
+            counters.range_searches += 1
+            counters.range_visits += visits
@@ -0,0 +1,79 @@
+"""The ordered map of books that `gatorLibrary.py` is written against.
+
+`gatorLibrary.py` only uses the operations of `OrderedIndex` on its `tree`,
+so any class that has them can hold the books. `BACKENDS` names the ones that
+can be chosen with `--backend`:
+
+- `rbtree`: the red-black `Tree`, the default,
+- `btree`: the B+ tree `BTree`, whose fanout is set with `--fanout`.
+
+The lookups return objects with the attributes `key` and `data`: the
+`TreeNode` of a `Tree`, the `BTreeItem` of a `BTree`.
+"""
+
+from typing import Any, Iterable, Iterator, Optional, Protocol
+
+from btree import BTree
+from tree import Tree
+
+
+class Entry(Protocol):
+    key: int
+    data: Any
+
+
+class OrderedIndex(Protocol):
+    """An ordered map of int keys, as used by `gatorLibrary.py`.
+
+    Attributes:
+        flip_count (int): The color flips of a red-black tree, 0 for the
+            other backends.
+    """
+
+    flip_count: int
+
+    @classmethod
+    def from_sorted(
+        cls, items: Iterable[tuple[int, Any]], sort: bool = False
+    ) -> "OrderedIndex": ...
+
+    @classmethod
+    def from_layout(
+        cls, items: Iterable[tuple[int, Any, int, int]]
+    ) -> "OrderedIndex": ...
+
+    def layout(self) -> Iterator[tuple[Any, int]]: ...
+
+    def insert(self, key: int, value) -> Entry: ...
+
+    def delete(self, key: int): ...
+
+    def search(self, key: int) -> Optional[Entry]: ...
+
+    def find_closest(self, key: int) -> list[Entry]: ...
+
+    def find_k_closest(self, key: int, k: int) -> list[Entry]: ...
+
+    def range_search(self, start: int, end: int) -> list[Entry]: ...
+
+    def irange(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[Entry]: ...
+
+    def __iter__(self) -> Iterator[Entry]: ...
+
+    def __len__(self) -> int: ...
+
+    def rank(self, key: int) -> int: ...
+
+    def select(self, k: int) -> Entry: ...
+
+    def count_range(self, start: int, end: int) -> int: ...
+
+    def height(self) -> int: ...
+
+
+BACKENDS: dict[str, type[OrderedIndex]] = {
+    "rbtree": Tree,
+    "btree": BTree,
+}
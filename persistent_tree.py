@@ -0,0 +1,407 @@
+"""Persistent (immutable) red-black tree with cheap point-in-time versions.
+
+Nodes are never changed after they are created. An insert or delete copies
+only the nodes on the path from the root to the changed node, O(log n) new
+nodes, and shares every other subtree with the previous version. Every version
+stays valid, so it can be read by any number of threads without locks.
+
+The balancing follows Kahrs, "Red-black trees with types" (2001), which extends
+Okasaki's functional insertion with deletion.
+"""
+
+from typing import Any, Iterator, Optional
+
+from tree import Color, Tree
+
+RED = Color.RED
+BLACK = Color.BLACK
+
+
+class PersistentNode:
+    """Represents an immutable node of a persistent tree.
+
+    Attributes:
+        key (int): The key value of the node.
+        data: The data stored in the node.
+        color (int): The color of the node, `Color.RED` or `Color.BLACK`.
+        left (PersistentNode | None): The left child of the node.
+        right (PersistentNode | None): The right child of the node.
+        size (int): The number of nodes in the subtree rooted at the node.
+    """
+
+    __slots__ = ("key", "data", "color", "left", "right", "size")
+
+    def __init__(
+        self,
+        color: int,
+        left: Optional["PersistentNode"],
+        key: int,
+        data,
+        right: Optional["PersistentNode"],
+    ) -> None:
+        self.color: int = color
+        self.left: Optional["PersistentNode"] = left
+        self.key: int = key
+        self.data = data
+        self.right: Optional["PersistentNode"] = right
+        self.size: int = (left.size if left else 0) + (right.size if right else 0) + 1
+
+
+Node = Optional[PersistentNode]
+
+
+def _is_red(node: Node) -> bool:
+    return node is not None and node.color == RED
+
+
+def _recolor(node: PersistentNode, color: int) -> PersistentNode:
+    if node.color == color:
+        return node
+    return PersistentNode(color, node.left, node.key, node.data, node.right)
+
+
+def _balance(left: Node, key: int, data, right: Node) -> PersistentNode:
+    """Builds a node from its children, removing a red node with a red child
+    directly below the new node."""
+    if _is_red(left) and _is_red(right):
+        return PersistentNode(
+            RED, _recolor(left, BLACK), key, data, _recolor(right, BLACK)
+        )
+    if _is_red(left):
+        if _is_red(left.left):
+            a = left.left
+            return PersistentNode(
+                RED,
+                _recolor(a, BLACK),
+                left.key,
+                left.data,
+                PersistentNode(BLACK, left.right, key, data, right),
+            )
+        if _is_red(left.right):
+            b = left.right
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left.left, left.key, left.data, b.left),
+                b.key,
+                b.data,
+                PersistentNode(BLACK, b.right, key, data, right),
+            )
+    if _is_red(right):
+        if _is_red(right.right):
+            c = right.right
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left, key, data, right.left),
+                right.key,
+                right.data,
+                _recolor(c, BLACK),
+            )
+        if _is_red(right.left):
+            b = right.left
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left, key, data, b.left),
+                b.key,
+                b.data,
+                PersistentNode(BLACK, b.right, right.key, right.data, right.right),
+            )
+    return PersistentNode(BLACK, left, key, data, right)
+
+
+def _insert(node: Node, key: int, data) -> PersistentNode:
+    if node is None:
+        return PersistentNode(RED, None, key, data, None)
+    if key < node.key:
+        if node.color == BLACK:
+            left = _insert(node.left, key, data)
+            return _balance(left, node.key, node.data, node.right)
+        return PersistentNode(
+            RED, _insert(node.left, key, data), node.key, node.data, node.right
+        )
+    if key > node.key:
+        if node.color == BLACK:
+            right = _insert(node.right, key, data)
+            return _balance(node.left, node.key, node.data, right)
+        return PersistentNode(
+            RED, node.left, node.key, node.data, _insert(node.right, key, data)
+        )
+    # the key is already in the tree, which `PersistentTree.insert` checks first
+    return node
+
+
+def _balance_left(
+    left: Node, key: int, data, right: PersistentNode
+) -> PersistentNode:
+    """Rebalances after the black height of the left subtree shrank by one."""
+    if _is_red(left):
+        return PersistentNode(RED, _recolor(left, BLACK), key, data, right)
+    if right.color == BLACK:
+        return _balance(left, key, data, _recolor(right, RED))
+    # right is red with a black left child
+    b = right.left
+    return PersistentNode(
+        RED,
+        PersistentNode(BLACK, left, key, data, b.left),
+        b.key,
+        b.data,
+        _balance(b.right, right.key, right.data, _recolor(right.right, RED)),
+    )
+
+
+def _balance_right(
+    left: PersistentNode, key: int, data, right: Node
+) -> PersistentNode:
+    """Rebalances after the black height of the right subtree shrank by one."""
+    if _is_red(right):
+        return PersistentNode(RED, left, key, data, _recolor(right, BLACK))
+    if left.color == BLACK:
+        return _balance(_recolor(left, RED), key, data, right)
+    # left is red with a black right child
+    b = left.right
+    return PersistentNode(
+        RED,
+        _balance(_recolor(left.left, RED), left.key, left.data, b.left),
+        b.key,
+        b.data,
+        PersistentNode(BLACK, b.right, key, data, right),
+    )
+
+
+def _append(left: Node, right: Node) -> Node:
+    """Joins the two children of a deleted node."""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.color == RED and right.color == RED:
+        middle = _append(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(
+                RED,
+                PersistentNode(RED, left.left, left.key, left.data, middle.left),
+                middle.key,
+                middle.data,
+                PersistentNode(RED, middle.right, right.key, right.data, right.right),
+            )
+        return PersistentNode(
+            RED,
+            left.left,
+            left.key,
+            left.data,
+            PersistentNode(RED, middle, right.key, right.data, right.right),
+        )
+    if left.color == BLACK and right.color == BLACK:
+        middle = _append(left.right, right.left)
+        if _is_red(middle):
+            return PersistentNode(
+                RED,
+                PersistentNode(BLACK, left.left, left.key, left.data, middle.left),
+                middle.key,
+                middle.data,
+                PersistentNode(BLACK, middle.right, right.key, right.data, right.right),
+            )
+        return _balance_left(
+            left.left,
+            left.key,
+            left.data,
+            PersistentNode(BLACK, middle, right.key, right.data, right.right),
+        )
+    if right.color == RED:
+        return PersistentNode(
+            RED, _append(left, right.left), right.key, right.data, right.right
+        )
+    return PersistentNode(
+        RED, left.left, left.key, left.data, _append(left.right, right)
+    )
+
+
+def _delete(node: Node, key: int) -> Node:
+    if node is None:
+        return None
+    if key < node.key:
+        if node.left is not None and node.left.color == BLACK:
+            left = _delete(node.left, key)
+            return _balance_left(left, node.key, node.data, node.right)
+        return PersistentNode(
+            RED, _delete(node.left, key), node.key, node.data, node.right
+        )
+    if key > node.key:
+        if node.right is not None and node.right.color == BLACK:
+            right = _delete(node.right, key)
+            return _balance_right(node.left, node.key, node.data, right)
+        return PersistentNode(
+            RED, node.left, node.key, node.data, _delete(node.right, key)
+        )
+    return _append(node.left, node.right)
+
+
+class TreeVersion:
+    """A read-only version of a persistent tree.
+
+    The lookups have the same names and results as those of `Tree`. A version
+    never changes, so it needs no locking.
+
+    Attributes:
+        root_node (PersistentNode | None): The root of the version.
+        number (int): The number of writes that led to the version.
+    """
+
+    __slots__ = ("root_node", "number")
+
+    def __init__(self, root_node: Node, number: int) -> None:
+        self.root_node: Node = root_node
+        self.number: int = number
+
+    def search(self, key: int) -> Optional[PersistentNode]:
+        """Returns the node with the given key, or None if not found."""
+        node = self.root_node
+        while node is not None:
+            if node.key == key:
+                return node
+            node = node.right if node.key < key else node.left
+        return None
+
+    def find_closest(self, key: int) -> list[PersistentNode]:
+        """Returns the nodes with the closest key to the given key, like
+        `Tree.find_closest`."""
+        lesser = greater = None
+        node = self.root_node
+        while node is not None:
+            if node.key == key:
+                return [node]
+            if node.key < key:
+                lesser = node
+                node = node.right
+            else:
+                greater = node
+                node = node.left
+
+        return Tree._closest(key, lesser, greater)
+
+    def irange(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[PersistentNode]:
+        """Yields the nodes whose keys are in the range [start, end] in
+        increasing order of key."""
+        stack: list[PersistentNode] = []
+        node = self.root_node
+        while True:
+            while node is not None:
+                if start is not None and node.key < start:
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            if end is not None and node.key > end:
+                return
+            yield node
+            node = node.right
+
+    def range_search(self, start: int, end: int) -> list[PersistentNode]:
+        """Returns a list of nodes whose keys are in the range [start, end]."""
+        return list(self.irange(start, end))
+
+    def __iter__(self) -> Iterator[PersistentNode]:
+        return self.irange()
+
+    def __len__(self) -> int:
+        return self.root_node.size if self.root_node is not None else 0
+
+    def validate(self) -> int:
+        """Checks the red-black tree properties and returns the black height.
+
+        Raises:
+            ValueError: If a property does not hold.
+        """
+
+        def check(node: Node, low, high) -> int:
+            if node is None:
+                return 0
+            if (low is not None and node.key <= low) or (
+                high is not None and node.key >= high
+            ):
+                raise ValueError(f"Node {node.key} is out of order")
+            if node.color == RED and (_is_red(node.left) or _is_red(node.right)):
+                raise ValueError(f"Red node {node.key} has a red child")
+            left = check(node.left, low, node.key)
+            if left != check(node.right, node.key, high):
+                raise ValueError(f"Node {node.key} has a wrong black height")
+            return left + (node.color == BLACK)
+
+        if _is_red(self.root_node):
+            raise ValueError("The root is red")
+        return check(self.root_node, None, None)
+
+
+class PersistentTree:
+    """A red-black tree that keeps every version.
+
+    `insert` (of a new key) and `delete` create a new version that shares all unchanged
+    subtrees with the previous one, and `version(n)` returns the tree as it
+    was after `n` writes. The values are shared between versions too, so they
+    should not be changed in place if old versions must show old values.
+    """
+
+    def __init__(self) -> None:
+        self.versions: list[TreeVersion] = [TreeVersion(None, 0)]
+
+    @property
+    def current(self) -> TreeVersion:
+        """The latest version."""
+        return self.versions[-1]
+
+    def version(self, number: int) -> TreeVersion:
+        """Returns the version after the given number of writes.
+
+        Raises:
+            IndexError: If there were fewer writes.
+        """
+        if not 0 <= number < len(self.versions):
+            raise IndexError(f"No version {number}")
+        return self.versions[number]
+
+    def _commit(self, root_node: Node) -> TreeVersion:
+        if root_node is not None:
+            root_node = _recolor(root_node, BLACK)
+        version = TreeVersion(root_node, len(self.versions))
+        self.versions.append(version)
+        return version
+
+    def insert(self, key: int, value: Any) -> TreeVersion:
+        """Inserts a key, creating a new version. As with `Tree.insert`, a key
+        that is already in the tree keeps its value, and no version is created.
+
+        Returns:
+            TreeVersion: The new version, or the current one if the key exists.
+        """
+        if self.current.search(key) is not None:
+            return self.current
+        return self._commit(_insert(self.current.root_node, key, value))
+
+    def delete(self, key: int) -> TreeVersion:
+        """Deletes a key, creating a new version.
+
+        Returns:
+            TreeVersion: The new version.
+
+        Raises:
+            KeyError: If the key is not in the tree.
+        """
+        if self.current.search(key) is None:
+            raise KeyError(key)
+        return self._commit(_delete(self.current.root_node, key))
+
+    def search(self, key: int) -> Optional[PersistentNode]:
+        return self.current.search(key)
+
+    def find_closest(self, key: int) -> list[PersistentNode]:
+        return self.current.find_closest(key)
+
+    def range_search(self, start: int, end: int) -> list[PersistentNode]:
+        return self.current.range_search(start, end)
+
+    def __len__(self) -> int:
+        return len(self.current)
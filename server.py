@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Asyncio TCP front end of the library.
+
+Clients send commands in the grammar of the input files, one per line, and may
+send many lines without waiting for the responses. Every response is the text
+the command prints, preceded by a line with its length in bytes, e.g.
+`InsertBook(1, "Title", "Author", "Yes")` gets `0\\n` and `ColorFlipCount()`
+gets `22\\nColor Flip Count: 0\\n\\n`. `Quit()` closes the connection instead of
+stopping the server.
+
+Commands that change the library are queued to a single writer task. It runs
+all the queued commands, syncs the operation log once for the whole batch and
+then sends the responses. Lookups run as soon as they are read, unless the
+same connection is still waiting for one of its changes, so every connection
+sees its own commands in order.
+
+The commands that read or write files on the server (`BulkInsertBooks`, the
+snapshots, the operation log and the tree export) are refused unless the
+server is started with `--allow-files`, since any client could otherwise name
+any path. A line longer than `LINE_LIMIT` bytes gets an error and closes the
+connection.
+
+Usage:
+    python3 server.py [--host 127.0.0.1] [--port 8765] [--batch-size 256]
+        [--allow-files]
+"""
+
+from typing import Callable
+import argparse
+import asyncio
+
+import gatorLibrary
+
+# commands that go through the writer task
+WRITE_COMMANDS = gatorLibrary.LOGGED_COMMANDS | gatorLibrary.LOADING_COMMANDS | {
+    gatorLibrary.OpenLog,
+    gatorLibrary.Recover,
+}
+# commands that take the path of a file on the server
+FILE_COMMANDS = {
+    gatorLibrary.BulkInsertBooks,
+    gatorLibrary.SaveSnapshot,
+    gatorLibrary.LoadSnapshot,
+    gatorLibrary.OpenLog,
+    gatorLibrary.Recover,
+    gatorLibrary.ExportTree,
+    gatorLibrary.ExportSubtree,
+}
+# the longest command line in bytes, the default limit of asyncio streams
+LINE_LIMIT = 1 << 16
+
+
+class LibraryServer:
+    """Serves the commands of `gatorLibrary` to many connections.
+
+    Attributes:
+        batch_size (int): The most commands the writer task runs per batch.
+        allow_files (bool): Whether clients may run the `FILE_COMMANDS`.
+        batches (int): The number of batches run so far.
+        writes (int): The number of commands run by the writer task so far.
+    """
+
+    def __init__(self, batch_size: int = 256, allow_files: bool = False) -> None:
+        self.batch_size: int = batch_size
+        self.allow_files: bool = allow_files
+        self.batches: int = 0
+        self.writes: int = 0
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.response = gatorLibrary.ResponseBuffer()
+        gatorLibrary.output = self.response
+
+    def execute(self, function: Callable, args: list) -> str:
+        """Runs a command and returns its output. An error is returned as
+        text instead of stopping the server."""
+        try:
+            function(*args)
+        except Exception as error:
+            self.response.write(f"Error: {error}\n\n")
+            return self.response.take()
+        if (
+            gatorLibrary.operation_log is not None
+            and function in gatorLibrary.LOGGED_COMMANDS
+        ):
+            gatorLibrary.operation_log.append(function.__name__, args)
+        return self.response.take()
+
+    async def write_batches(self):
+        """Runs the queued commands in batches, forever."""
+        while True:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            results = [self.execute(function, args) for function, args, _ in batch]
+            # the responses are sent only once the batch is on disk
+            if gatorLibrary.operation_log is not None and any(
+                function in WRITE_COMMANDS for function, _, _ in batch
+            ):
+                gatorLibrary.operation_log.sync()
+            for (_, _, future), result in zip(batch, results):
+                if not future.cancelled():
+                    future.set_result(result)
+            self.batches += 1
+            self.writes += len(batch)
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Reads the commands of one connection and queues their responses."""
+        loop = asyncio.get_running_loop()
+        responses: asyncio.Queue = asyncio.Queue(maxsize=1024)
+        sender = asyncio.create_task(self.send(responses, writer))
+        last_write: asyncio.Future | None = None
+
+        def done(text: str) -> asyncio.Future:
+            future = loop.create_future()
+            future.set_result(text)
+            return future
+
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:
+                    # the stream drops what it read of an overlong line, so the
+                    # rest of it could not be told apart from the next command
+                    await responses.put(
+                        done(f"Error: Line longer than {LINE_LIMIT} bytes\n\n")
+                    )
+                    break
+                if not line:
+                    break
+                try:
+                    command = gatorLibrary.parse_command(line.decode())
+                except ValueError as error:
+                    await responses.put(done(f"Error: {error}\n\n"))
+                    continue
+                if command is None:
+                    continue
+
+                function, args = command
+                if function is gatorLibrary.Quit:
+                    await responses.put(done("Program Terminated!!\n"))
+                    break
+                if function in FILE_COMMANDS and not self.allow_files:
+                    await responses.put(
+                        done(
+                            f"Error: {function.__name__} is disabled, "
+                            "start the server with --allow-files\n\n"
+                        )
+                    )
+                    continue
+                if function in WRITE_COMMANDS or (
+                    last_write is not None and not last_write.done()
+                ):
+                    future = loop.create_future()
+                    self.queue.put_nowait((function, args, future))
+                    if function in WRITE_COMMANDS:
+                        last_write = future
+                else:
+                    future = done(self.execute(function, args))
+                await responses.put(future)
+        except ConnectionError:
+            pass
+        finally:
+            await responses.put(None)
+            await sender
+            writer.close()
+
+    async def send(self, responses: asyncio.Queue, writer: asyncio.StreamWriter):
+        """Sends the responses of one connection in the order of its commands."""
+        failed = False
+        while (future := await responses.get()) is not None:
+            data = (await future).encode()
+            if failed:
+                continue
+            writer.write(b"%d\n" % len(data))
+            writer.write(data)
+            if responses.empty():
+                try:
+                    await writer.drain()
+                except ConnectionError:
+                    failed = True
+
+
+async def serve(host: str, port: int, batch_size: int, allow_files: bool = False):
+    library = LibraryServer(batch_size, allow_files)
+    writer_task = asyncio.create_task(library.write_batches())
+    server = await asyncio.start_server(
+        library.handle, host, port, limit=LINE_LIMIT
+    )
+    host, port = server.sockets[0].getsockname()[:2]
+    print(f"Listening on {host}:{port}", flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        writer_task.cancel()
+        if gatorLibrary.operation_log is not None:
+            gatorLibrary.operation_log.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765, help="0 picks a free port")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument(
+        "--allow-files",
+        action="store_true",
+        help="let clients read and write files on the server by path",
+    )
+    parser.add_argument(
+        "--tree-stats",
+        action="store_true",
+        help="count rotations, fixup cases and visited nodes for TreeStats()",
+    )
+    parser.add_argument(
+        "--backend", choices=sorted(gatorLibrary.BACKENDS), default="rbtree"
+    )
+    parser.add_argument("--fanout", type=int, default=gatorLibrary.BTree.fanout)
+    arguments = parser.parse_args()
+    if arguments.tree_stats and arguments.backend != "rbtree":
+        parser.error("--tree-stats needs the rbtree backend")
+    gatorLibrary.BTree.fanout = arguments.fanout
+    gatorLibrary.use_backend(arguments.backend)
+    if arguments.tree_stats:
+        gatorLibrary.enable_tree_stats()
+    try:
+        asyncio.run(
+            serve(
+                arguments.host,
+                arguments.port,
+                arguments.batch_size,
+                arguments.allow_files,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
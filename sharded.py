@@ -0,0 +1,587 @@
+#!/usr/bin/env python3
+"""Library sharded by book ID across worker processes.
+
+The book IDs are split into ranges by sorted split points: shard `i` owns the
+IDs from `splits[i - 1]` (inclusive) up to `splits[i]` (exclusive). Every shard
+is a worker process with its own `gatorLibrary` state, i.e. its own `Tree`,
+reservation heaps and patron index, so the shards run in parallel instead of
+sharing one interpreter lock.
+
+`ShardedLibrary` is the coordinator. It reads the same commands as
+`gatorLibrary.py`:
+
+- commands on one book (`PrintBook`, `InsertBook`, `BorrowBook`, `ReturnBook`,
+  `CancelReservation`, `UpdateReservationPriority`, `DeleteBook`) are routed to
+  the shard of the book. Up to `window` of them are sent to the shards in one
+  batch per shard and run in parallel; the output stays in input order.
+- `PrintBooks`, `CountBooks`, `PrintBooksPage`, `PrintPatron`,
+  `FindBooksByAuthor`, `SearchTitle`, `ColorFlipCount` and `CacheStats` gather
+  the results of the shards, and `TreeStats` prints the statistics of every
+  shard. `FindClosestBook` asks the shard of the ID for its nearest books on
+  both sides, and the neighboring shards when one side of that shard is empty.
+  `FindClosestBooks` takes the k closest books of every shard and keeps the k
+  closest of them.
+- `Rebalance()` moves books between the shards so that every shard has about
+  the same number of books.
+
+`ColorFlipCount` prints the sum of the flips of the shards, which is not the
+count of a single tree. Snapshots, the operation log and the tree export are
+not supported.
+
+Usage:
+    python3 sharded.py [--shards 4] [--max-book-id 1000000] [--tree-stats]
+        [--backend rbtree|btree] [--fanout 64] [file]
+"""
+
+from bisect import bisect_right
+from functools import partial
+from typing import Callable, Iterable, NamedTuple, Optional
+import argparse
+import itertools
+import multiprocessing
+import sys
+
+import gatorLibrary
+from tree import Tree
+
+# argument index of the book ID of the commands on one book
+POINT_COMMANDS = {
+    "PrintBook": 0,
+    "InsertBook": 0,
+    "DeleteBook": 0,
+    "BorrowBook": 1,
+    "ReturnBook": 1,
+    "CancelReservation": 1,
+    "UpdateReservationPriority": 1,
+}
+
+
+class Neighbor(NamedTuple):
+    """A book next to a book ID, as sent by a shard."""
+
+    key: int
+    text: str
+
+
+class Shard:
+    """The books of one shard, kept in the `gatorLibrary` module of a worker
+    process. Every method is an operation the coordinator can call."""
+
+    def __init__(
+        self, tree_stats: bool = False, backend: str = "rbtree", fanout: int = 64
+    ) -> None:
+        self.response = gatorLibrary.ResponseBuffer()
+        gatorLibrary.output = self.response
+        gatorLibrary.BTree.fanout = fanout
+        gatorLibrary.use_backend(backend)
+        if tree_stats:
+            gatorLibrary.enable_tree_stats()
+
+    def run(self, commands: list[tuple[str, list]]) -> list:
+        """Runs commands and returns the output of each. The first command
+        that fails ends the batch, and its exception is returned instead."""
+        results: list = []
+        for name, args in commands:
+            try:
+                if name == "BorrowBook":
+                    self.borrow(*args)
+                else:
+                    gatorLibrary.COMMANDS[name](*args)
+            except Exception as error:
+                self.response.take()
+                results.append(error)
+                break
+            results.append(self.response.take())
+        return results
+
+    def borrow(self, patronID: int, bookID: int, priority: int, elsewhere: int = 0):
+        """`BorrowBook`, counting the books the patron borrowed from the other
+        shards towards the borrow limit."""
+        limit = gatorLibrary.borrow_limit
+        book = gatorLibrary.tree.search(bookID)
+        if elsewhere and limit is not None and book is not None:
+            if book.data.is_available and self.borrowed(patronID) + elsewhere >= limit:
+                self.response.write(
+                    f"Patron {patronID} has reached the limit of {limit} books\n\n"
+                )
+                return
+        gatorLibrary.BorrowBook(patronID, bookID, priority)
+
+    def borrowed(self, patronID: int) -> int:
+        patron = gatorLibrary.patrons.get(patronID)
+        return len(patron.borrowed) if patron is not None else 0
+
+    def patron(self, patronID: int) -> tuple[set[int], set[int]]:
+        patron = gatorLibrary.patrons.get(patronID)
+        if patron is None:
+            return set(), set()
+        return patron.borrowed, patron.reserved
+
+    def neighbors(self, key: int) -> tuple[Optional[Neighbor], Optional[Neighbor]]:
+        """Returns the greatest book below the key and the least book at or
+        above it, or None."""
+        tree = gatorLibrary.tree
+        rank = tree.rank(key)
+        lesser = greater = None
+        if rank > 0:
+            node = tree.select(rank - 1)
+            lesser = Neighbor(node.key, str(node.data))
+        if rank < len(tree):
+            node = tree.select(rank)
+            greater = Neighbor(node.key, str(node.data))
+        return lesser, greater
+
+    def k_closest(self, key: int, k: int) -> list[tuple[int, str]]:
+        """Returns the (key, text) of the k closest books to the key."""
+        return [
+            (node.key, str(node.data))
+            for node in gatorLibrary.tree.find_k_closest(key, k)
+        ]
+
+    def find_books(self, author: bool, query: str) -> list[str]:
+        """Returns the records of the books matching an author or title query,
+        like `FindBooksByAuthor` and `SearchTitle`."""
+        if author:
+            bookIDs = gatorLibrary.author_index.search(query)
+        else:
+            bookIDs = gatorLibrary.title_index.search(query, prefix=True)
+        return [str(gatorLibrary.tree.search(bookID).data) for bookID in bookIDs]
+
+    def size(self) -> int:
+        return len(gatorLibrary.tree)
+
+    def count_range(self, start: int, end: int) -> int:
+        return gatorLibrary.tree.count_range(start, end)
+
+    def flip_count(self) -> int:
+        return gatorLibrary.tree.flip_count
+
+    def cache_stats(self) -> tuple[int, int, int, int]:
+        cache = gatorLibrary.render_cache
+        return cache.hits, cache.misses, cache.evictions, len(cache.records)
+
+    def key_at(self, index: int) -> int:
+        return gatorLibrary.tree.select(index).key
+
+    def page(self, offset: int, limit: int) -> str:
+        """Renders up to `limit` books starting with the one at `offset`."""
+        tree = gatorLibrary.tree
+        start = tree.select(offset).key
+        for node in itertools.islice(tree.irange(start), limit):
+            self.response.write(f"{node.data}\n\n")
+        return self.response.take()
+
+    def load(self, records: list[tuple[int, str, str, str]]):
+        gatorLibrary.load_books(records, sort=True)
+
+    def extract(self, low: Optional[int], high: Optional[int]) -> list[tuple]:
+        """Removes and returns the (key, data) of the books outside
+        [low, high)."""
+        tree = gatorLibrary.tree
+        items = []
+        if low is not None:
+            items += [(node.key, node.data) for node in tree.irange(None, low - 1)]
+        if high is not None:
+            items += [(node.key, node.data) for node in tree.irange(high)]
+        for key, data in items:
+            tree.delete(key)
+            gatorLibrary.render_cache.invalidate(key)
+            gatorLibrary.title_index.remove(key, data.book_name)
+            gatorLibrary.author_index.remove(key, data.author_name)
+        if items:
+            gatorLibrary.rebuild_patrons()
+        return items
+
+    def absorb(self, items: list[tuple]):
+        """Adds books removed from other shards, with their reservations."""
+        last = next(gatorLibrary.reservation_sequence)
+        for key, data in items:
+            gatorLibrary.tree.insert(key, data)
+            gatorLibrary.render_cache.invalidate(key)
+            gatorLibrary.title_index.add(key, data.book_name)
+            gatorLibrary.author_index.add(key, data.author_name)
+            if data.reservation_heap:
+                for priority, sequence, patronID in data.reservation_heap:
+                    last = max(last, sequence + 1)
+        # later reservations must come after the ones that moved here
+        gatorLibrary.reservation_sequence = itertools.count(last)
+        gatorLibrary.rebuild_patrons()
+
+
+def serve_shard(connection, *options):
+    """Runs the operations sent by the coordinator until it sends None. The
+    options are passed to `Shard`."""
+    shard = Shard(*options)
+    while (message := connection.recv()) is not None:
+        operation, args = message
+        try:
+            result = getattr(shard, operation)(*args)
+        except Exception as error:
+            result = error
+        connection.send(result)
+    connection.close()
+
+
+class ShardedLibrary:
+    """Routes the library commands to the shards.
+
+    Attributes:
+        splits (list[int]): The sorted split points between the shards.
+        window (int): The most commands on single books sent to the shards
+            before their output is collected.
+        output (OutputBuffer): Where the output of the commands is written.
+    """
+
+    def __init__(
+        self,
+        shards: int = 4,
+        max_book_id: int = 1_000_000,
+        splits: Optional[list[int]] = None,
+        window: int = 1024,
+        tree_stats: bool = False,
+        backend: str = "rbtree",
+        fanout: int = 64,
+    ) -> None:
+        if splits is None:
+            splits = [max_book_id * i // shards for i in range(1, shards)]
+        self.splits: list[int] = list(splits)
+        self.window: int = window
+        self.output: gatorLibrary.OutputBuffer = gatorLibrary.OutputBuffer()
+        self.borrow_limit: int | None = None
+        self.pending: list[tuple[int, str, list]] = []
+        self.closed: bool = False
+
+        self.connections = []
+        self.processes = []
+        for _ in range(len(self.splits) + 1):
+            parent, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=serve_shard,
+                args=(child, tree_stats, backend, fanout),
+                daemon=True,
+            )
+            process.start()
+            child.close()
+            self.connections.append(parent)
+            self.processes.append(process)
+
+        self.commands: dict[str, Callable] = {
+            name: partial(self.route, name) for name in POINT_COMMANDS
+        }
+        for name in (
+            "PrintBooks",
+            "PrintBooksPage",
+            "CountBooks",
+            "FindClosestBook",
+            "FindClosestBooks",
+            "FindBooksByAuthor",
+            "SearchTitle",
+            "PrintPatron",
+            "ColorFlipCount",
+            "CacheStats",
+            "TreeStats",
+            "SetBorrowLimit",
+            "BulkInsertBooks",
+            "Rebalance",
+            "Quit",
+        ):
+            self.commands[name] = getattr(self, name)
+
+    def shard_of(self, bookID: int) -> int:
+        return bisect_right(self.splits, bookID)
+
+    def call(self, shard: int, operation: str, *args):
+        """Runs an operation on one shard and returns its result."""
+        self.connections[shard].send((operation, args))
+        return self.receive(shard)
+
+    def receive(self, shard: int):
+        result = self.connections[shard].recv()
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    def scatter(self, operation: str, shards: Iterable[int], *args) -> list:
+        """Runs an operation on many shards in parallel and returns the results
+        in the order of the shards."""
+        shards = list(shards)
+        for shard in shards:
+            self.connections[shard].send((operation, args))
+        return [self.receive(shard) for shard in shards]
+
+    def route(self, name: str, *args):
+        """Queues a command on one book for the shard of the book."""
+        shard = self.shard_of(args[POINT_COMMANDS[name]])
+        if name == "BorrowBook" and self.borrow_limit is not None:
+            self.flush()
+            others = [i for i in range(len(self.connections)) if i != shard]
+            elsewhere = sum(self.scatter("borrowed", others, args[0]))
+            args = (*args, elsewhere)
+        self.pending.append((shard, name, list(args)))
+        if len(self.pending) >= self.window:
+            self.flush()
+
+    def flush(self):
+        """Runs the queued commands, one batch per shard, and writes their
+        output in the order of the commands."""
+        if not self.pending:
+            return
+        pending, self.pending = self.pending, []
+        batches: dict[int, list] = {}
+        for shard, name, args in pending:
+            batches.setdefault(shard, []).append((name, args))
+        for shard, commands in batches.items():
+            self.connections[shard].send(("run", (commands,)))
+        results = {shard: iter(self.receive(shard)) for shard in batches}
+        for shard, name, args in pending:
+            result = next(results[shard])
+            if isinstance(result, Exception):
+                raise result
+            self.output.write(result)
+
+    def rebalance(self, splits: Optional[list[int]] = None) -> list[int]:
+        """Moves books between the shards to new split points.
+
+        Parameters:
+        - splits (list[int] | None): The new sorted split points, one fewer
+          than the shards. By default they are chosen so that every shard
+          gets the same number of books.
+
+        Returns:
+        - list[int]: The new split points.
+        """
+        self.flush()
+        count = len(self.connections)
+        if splits is None:
+            sizes = self.scatter("size", range(count))
+            total = sum(sizes)
+            if total == 0:
+                return self.splits
+            splits = []
+            for i in range(1, count):
+                index = total * i // count
+                shard = 0
+                while index >= sizes[shard]:
+                    index -= sizes[shard]
+                    shard += 1
+                splits.append(self.call(shard, "key_at", index))
+        if len(splits) != count - 1 or splits != sorted(splits):
+            raise ValueError(f"Expected {count - 1} sorted split points")
+
+        self.splits = list(splits)
+        bounds = [None, *self.splits, None]
+        for shard in range(count):
+            owned = (bounds[shard], bounds[shard + 1])
+            self.connections[shard].send(("extract", owned))
+        moved: dict[int, list] = {}
+        for shard in range(count):
+            for key, data in self.receive(shard):
+                moved.setdefault(self.shard_of(key), []).append((key, data))
+        for shard, items in moved.items():
+            self.connections[shard].send(("absorb", (items,)))
+        for shard in moved:
+            self.receive(shard)
+        return self.splits
+
+    def close(self):
+        """Stops the worker processes."""
+        self.closed = True
+        for connection in self.connections:
+            connection.send(None)
+            connection.close()
+        for process in self.processes:
+            process.join()
+
+    def run(self, lines: Iterable[str]):
+        """Executes the commands one line at a time, like `gatorLibrary.run`."""
+        try:
+            for line in lines:
+                command = gatorLibrary.parse_command(line, self.commands)
+                if command is not None:
+                    function, args = command
+                    function(*args)
+                    if self.closed:
+                        return
+            self.flush()
+        finally:
+            self.output.flush()
+
+    def PrintBooks(self, bookID1: int, bookID2: int):
+        self.flush()
+        if bookID1 > bookID2:
+            return
+        shards = range(self.shard_of(bookID1), self.shard_of(bookID2) + 1)
+        for results in self.scatter(
+            "run", shards, [("PrintBooks", [bookID1, bookID2])]
+        ):
+            # a shard returns the exception of a failed command, as in `flush`
+            if isinstance(results[0], Exception):
+                raise results[0]
+            self.output.write(results[0])
+
+    def CountBooks(self, bookID1: int, bookID2: int):
+        self.flush()
+        count = 0
+        if bookID1 <= bookID2:
+            shards = range(self.shard_of(bookID1), self.shard_of(bookID2) + 1)
+            count = sum(self.scatter("count_range", shards, bookID1, bookID2))
+        self.output.write(f"Book Count: {count}\n\n")
+
+    def PrintBooksPage(self, pageNumber: int, pageSize: int):
+        self.flush()
+        sizes = self.scatter("size", range(len(self.connections)))
+        first = (pageNumber - 1) * pageSize
+        if pageNumber < 1 or pageSize < 1 or first >= sum(sizes):
+            self.output.write(f"Page {pageNumber} is empty\n\n")
+            return
+
+        remaining = pageSize
+        for shard, size in enumerate(sizes):
+            if first >= size:
+                first -= size
+                continue
+            limit = min(remaining, size - first)
+            self.output.write(self.call(shard, "page", first, limit))
+            remaining -= limit
+            first = 0
+            if remaining == 0:
+                break
+
+    def FindClosestBook(self, bookID: int):
+        self.flush()
+        shard = self.shard_of(bookID)
+        lesser, greater = self.call(shard, "neighbors", bookID)
+        # the shards to the left hold smaller IDs only, and vice versa
+        left = right = shard
+        while lesser is None and left > 0:
+            left -= 1
+            lesser = self.call(left, "neighbors", bookID)[0]
+        while greater is None and right < len(self.connections) - 1:
+            right += 1
+            greater = self.call(right, "neighbors", bookID)[1]
+
+        for key, text in Tree._closest(bookID, lesser, greater):
+            self.output.write(f"{text}\n\n")
+
+    def FindClosestBooks(self, bookID: int, k: int):
+        self.flush()
+        books = [
+            book
+            for books in self.scatter(
+                "k_closest", range(len(self.connections)), bookID, k
+            )
+            for book in books
+        ]
+        books.sort(key=lambda book: (abs(book[0] - bookID), book[0]))
+        for key, text in sorted(books[: max(k, 0)]):
+            self.output.write(f"{text}\n\n")
+
+    def find_books(self, author: bool, query: str) -> list[str]:
+        self.flush()
+        shards = range(len(self.connections))
+        return [
+            record
+            for records in self.scatter("find_books", shards, author, query)
+            for record in records
+        ]
+
+    def FindBooksByAuthor(self, authorName: str):
+        records = self.find_books(True, authorName)
+        if not records:
+            self.output.write(f'No books by author "{authorName}"\n\n')
+        for record in records:
+            self.output.write(f"{record}\n\n")
+
+    def SearchTitle(self, query: str):
+        records = self.find_books(False, query)
+        if not records:
+            self.output.write(f'No books match "{query}"\n\n')
+        for record in records:
+            self.output.write(f"{record}\n\n")
+
+    def PrintPatron(self, patronID: int):
+        self.flush()
+        patron = gatorLibrary.PatronData(patronID)
+        for borrowed, reserved in self.scatter(
+            "patron", range(len(self.connections)), patronID
+        ):
+            patron.borrowed |= borrowed
+            patron.reserved |= reserved
+        self.output.write(f"{patron}\n\n")
+
+    def ColorFlipCount(self):
+        self.flush()
+        flips = sum(self.scatter("flip_count", range(len(self.connections))))
+        self.output.write(f"Color Flip Count: {flips}\n\n")
+
+    def CacheStats(self):
+        self.flush()
+        stats = self.scatter("cache_stats", range(len(self.connections)))
+        hits, misses, evictions, size = (sum(column) for column in zip(*stats))
+        self.output.write(
+            f"Cache Hits: {hits}, Misses: {misses}, "
+            f"Evictions: {evictions}, Size: {size}\n\n"
+        )
+
+    def TreeStats(self):
+        self.flush()
+        shards = range(len(self.connections))
+        outputs = self.scatter("run", shards, [("TreeStats", [])])
+        for shard, results in zip(shards, outputs):
+            self.output.write(f"Shard {shard}\n{results[0]}")
+
+    def SetBorrowLimit(self, limit: int):
+        self.flush()
+        self.borrow_limit = limit if limit > 0 else None
+        results = self.scatter(
+            "run", range(len(self.connections)), [("SetBorrowLimit", [limit])]
+        )
+        self.output.write(results[0][0])
+
+    def BulkInsertBooks(self, fileName: str):
+        self.flush()
+        records: dict[int, list] = {}
+        for record in gatorLibrary.read_catalog(fileName):
+            records.setdefault(self.shard_of(record[0]), []).append(record)
+        for shard, shard_records in records.items():
+            self.connections[shard].send(("load", (shard_records,)))
+        for shard in records:
+            self.receive(shard)
+
+    def Rebalance(self):
+        """Gives every shard about the same number of books and prints the new
+        split points."""
+        self.output.write(f"Split Points: {self.rebalance()}\n\n")
+
+    def Quit(self):
+        self.flush()
+        self.output.write("Program Terminated!!\n")
+        self.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shards", type=int, default=4)
+    parser.add_argument("--max-book-id", type=int, default=1_000_000)
+    parser.add_argument("--tree-stats", action="store_true")
+    parser.add_argument(
+        "--backend", choices=sorted(gatorLibrary.BACKENDS), default="rbtree"
+    )
+    parser.add_argument("--fanout", type=int, default=gatorLibrary.BTree.fanout)
+    parser.add_argument("file", nargs="?")
+    arguments = parser.parse_args()
+    if arguments.tree_stats and arguments.backend != "rbtree":
+        parser.error("--tree-stats needs the rbtree backend")
+
+    library = ShardedLibrary(
+        arguments.shards,
+        arguments.max_book_id,
+        tree_stats=arguments.tree_stats,
+        backend=arguments.backend,
+        fanout=arguments.fanout,
+    )
+    try:
+        library.run(open(arguments.file) if arguments.file else sys.stdin)
+    finally:
+        if not library.closed:
+            library.close()
@@ -0,0 +1,216 @@
+"""Compact binary snapshots of the library.
+
+A snapshot file has the following layout, all integers little-endian:
+
+- header: magic `GLSNAP1\\0`, number of books, number of reservations, size of
+  the string table, color flip count, the next reservation sequence number and
+  the LSN of the last operation log record included in the snapshot.
+- book records in increasing order of book ID: book ID, offset and length of
+  the title and of the author in the string table, borrower, flags
+  (available, borrowed, red), depth of the node, index of the first
+  reservation and number of reservations.
+- reservation records (priority, sequence, patron ID), in the order of the
+  `heap` list of each book so that the heaps are restored exactly.
+- string table: the UTF-8 encoded titles and author names, each distinct
+  string stored once.
+
+The depth and color of every node are stored so that `Tree.from_layout`
+rebuilds the tree in O(n) with exactly the same shape. The color flip count
+then continues as if the program had never been restarted.
+
+The file is read through `mmap`, so the records are unpacked directly from the
+page cache without copying the file into memory first. `parse_snapshot` reads
+a snapshot that is already in memory, e.g. one kept in the operation log.
+"""
+
+from typing import Callable
+import mmap
+import os
+import struct
+
+from heap import Heap
+from tree import Color, Tree
+
+MAGIC = b"GLSNAP1\0"
+HEADER = struct.Struct("<8sQQQQQQ")
+BOOK = struct.Struct("<qIIIIqBB2xII")
+RESERVATION = struct.Struct("<qqq")
+
+AVAILABLE = 1
+BORROWED = 2
+RED = 4
+
+
+def write_snapshot(
+    path: str, tree: Tree, next_sequence: int, log_position: int = 0
+) -> int:
+    """Writes the books of the tree to a snapshot file.
+
+    The values of the tree must have the attributes of `gatorLibrary.NodeData`.
+    The file is written to a temporary file first and then renamed, so a
+    failed write never leaves a partial snapshot behind.
+
+    Args:
+        path (str): The snapshot file.
+        tree (Tree): The tree of books.
+        next_sequence (int): The next reservation sequence number.
+        log_position (int): The LSN of the last operation log record included
+            in the snapshot.
+
+    Returns:
+        int: The number of books written.
+    """
+    strings: dict[str, tuple[int, int]] = {}
+    string_table = bytearray()
+
+    def intern(text: str) -> tuple[int, int]:
+        location = strings.get(text)
+        if location is None:
+            encoded = text.encode()
+            location = strings[text] = (len(string_table), len(encoded))
+            string_table.extend(encoded)
+        return location
+
+    books = bytearray()
+    reservations = bytearray()
+    count = 0
+    reservation_count = 0
+    for node, depth in tree.layout():
+        data = node.data
+        title_offset, title_length = intern(data.book_name)
+        author_offset, author_length = intern(data.author_name)
+        flags = AVAILABLE if data.is_available else 0
+        if data.borrowed_by is not None:
+            flags |= BORROWED
+        if node.color == Color.RED:
+            flags |= RED
+        heap = list(data.reservation_heap) if data.reservation_heap else []
+        books += BOOK.pack(
+            node.key,
+            title_offset,
+            title_length,
+            author_offset,
+            author_length,
+            data.borrowed_by if data.borrowed_by is not None else 0,
+            flags,
+            depth,
+            reservation_count,
+            len(heap),
+        )
+        for item in heap:
+            reservations += RESERVATION.pack(*item)
+        reservation_count += len(heap)
+        count += 1
+
+    header = HEADER.pack(
+        MAGIC,
+        count,
+        reservation_count,
+        len(string_table),
+        tree.flip_count,
+        next_sequence,
+        log_position,
+    )
+    temporary = path + ".tmp"
+    with open(temporary, "wb") as f:
+        f.write(header)
+        f.write(books)
+        f.write(reservations)
+        f.write(string_table)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporary, path)
+    return count
+
+
+def read_snapshot(
+    path: str, make_data: Callable, tree_class: type[Tree] = Tree
+) -> tuple[Tree, int, int]:
+    """Reads a snapshot file into a new tree with `Tree.from_layout` in O(n).
+
+    Args:
+        path (str): The snapshot file.
+        make_data (Callable): Creates the value of a node from (book ID, title,
+            author, is available), e.g. `gatorLibrary.NodeData`.
+        tree_class (type[Tree]): The class of the new tree, `Tree` or a
+            subclass such as `InstrumentedTree`.
+
+    Returns:
+        tuple[Tree, int, int]: The tree, the next reservation sequence number
+            and the LSN of the last operation log record in the snapshot.
+
+    Raises:
+        ValueError: If the file is not a snapshot.
+    """
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+        return parse_snapshot(m, make_data, tree_class, path)
+
+
+def parse_snapshot(
+    m, make_data: Callable, tree_class: type[Tree] = Tree, path: str = "snapshot"
+) -> tuple[Tree, int, int]:
+    """Reads a snapshot from a buffer, e.g. `bytes` or an `mmap`, as
+    `read_snapshot` does. `path` names the snapshot in error messages."""
+    if len(m) < HEADER.size:
+        raise ValueError(f"{path} is not a library snapshot")
+    (
+        magic,
+        count,
+        reservation_count,
+        strings_size,
+        flip_count,
+        next_sequence,
+        log_position,
+    ) = HEADER.unpack_from(m, 0)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a library snapshot")
+
+    books_start = HEADER.size
+    reservations_start = books_start + count * BOOK.size
+    strings_start = reservations_start + reservation_count * RESERVATION.size
+    if len(m) != strings_start + strings_size:
+        raise ValueError(f"{path} is truncated")
+
+    strings: dict[tuple[int, int], str] = {}
+
+    def string(offset: int, length: int) -> str:
+        text = strings.get((offset, length))
+        if text is None:
+            start = strings_start + offset
+            text = strings[(offset, length)] = m[start : start + length].decode()
+        return text
+
+    def items():
+        for i in range(count):
+            (
+                book_id,
+                title_offset,
+                title_length,
+                author_offset,
+                author_length,
+                borrowed_by,
+                flags,
+                depth,
+                first_reservation,
+                reservations,
+            ) = BOOK.unpack_from(m, books_start + i * BOOK.size)
+            data = make_data(
+                book_id,
+                string(title_offset, title_length),
+                string(author_offset, author_length),
+                bool(flags & AVAILABLE),
+            )
+            if flags & BORROWED:
+                data.borrowed_by = borrowed_by
+            if reservations:
+                start = reservations_start + first_reservation * RESERVATION.size
+                data.reservation_heap = Heap.from_items(
+                    RESERVATION.unpack_from(m, start + j * RESERVATION.size)
+                    for j in range(reservations)
+                )
+            color = Color.RED if flags & RED else Color.BLACK
+            yield book_id, data, color, depth
+
+    tree = tree_class.from_layout(items())
+    tree.flip_count = flip_count
+    return tree, next_sequence, log_position
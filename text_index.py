@@ -0,0 +1,115 @@
+"""Inverted index of words to the sorted IDs of the books that contain them.
+
+Texts are split into lowercase words. Every word has a postings list, the
+sorted list of the IDs of the books whose text contains the word, and all the
+words are kept in a sorted term dictionary, so the words with a given prefix
+are one contiguous slice of it.
+
+A query with several words intersects their postings lists, starting with the
+shortest one and finding its IDs in the others by binary search, so its cost
+depends on the size of the postings and of the result, not on the number of
+books.
+"""
+
+from bisect import bisect_left, insort
+from heapq import merge
+import re
+
+_WORD_RE = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    """Returns the distinct lowercase words of a text, in order."""
+    return list(dict.fromkeys(_WORD_RE.findall(text.casefold())))
+
+
+class TextIndex:
+    """An inverted index of one text field of the books.
+
+    Attributes:
+        postings (dict[str, list[int]]): The sorted book IDs of every word.
+        terms (list[str]): All the words, sorted.
+    """
+
+    def __init__(self) -> None:
+        self.postings: dict[str, list[int]] = {}
+        self.terms: list[str] = []
+
+    def add(self, bookID: int, text: str):
+        """Adds the words of the text of a book. Adding a book again does not
+        change the index."""
+        for word in tokenize(text):
+            postings = self.postings.get(word)
+            if postings is None:
+                self.postings[word] = [bookID]
+                insort(self.terms, word)
+            elif postings[-1] < bookID:
+                postings.append(bookID)
+            else:
+                i = bisect_left(postings, bookID)
+                if postings[i] != bookID:
+                    postings.insert(i, bookID)
+
+    def remove(self, bookID: int, text: str):
+        """Removes the words of the text of a book."""
+        for word in tokenize(text):
+            postings = self.postings.get(word)
+            if postings is None:
+                continue
+            i = bisect_left(postings, bookID)
+            if i < len(postings) and postings[i] == bookID:
+                del postings[i]
+            if not postings:
+                del self.postings[word]
+                del self.terms[bisect_left(self.terms, word)]
+
+    def clear(self):
+        self.postings.clear()
+        self.terms.clear()
+
+    def prefix(self, prefix: str) -> list[int]:
+        """Returns the sorted IDs of the books with a word that starts with
+        the prefix."""
+        start = bisect_left(self.terms, prefix)
+        end = start
+        while end < len(self.terms) and self.terms[end].startswith(prefix):
+            end += 1
+        if end - start == 1:
+            return self.postings[self.terms[start]]
+        lists = [self.postings[word] for word in self.terms[start:end]]
+        ids: list[int] = []
+        for bookID in merge(*lists):
+            if not ids or ids[-1] != bookID:
+                ids.append(bookID)
+        return ids
+
+    def search(self, query: str, prefix: bool = False) -> list[int]:
+        """Returns the sorted IDs of the books that contain every word of the
+        query.
+
+        Args:
+            query (str): The words to look for.
+            prefix (bool): Matches the last word of the query as a prefix, as
+                in search-as-you-type.
+        """
+        words = tokenize(query)
+        if not words:
+            return []
+        lists = [self.postings.get(word, []) for word in words[:-1]]
+        lists.append(
+            self.prefix(words[-1]) if prefix else self.postings.get(words[-1], [])
+        )
+        lists.sort(key=len)
+
+        ids = lists[0]
+        for other in lists[1:]:
+            found = []
+            low = 0
+            for bookID in ids:
+                low = bisect_left(other, bookID, low)
+                if low == len(other):
+                    break
+                if other[low] == bookID:
+                    found.append(bookID)
+            ids = found
+        return list(ids)
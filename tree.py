@@ -1,10 +1,10 @@
-from typing import Optional
-from enum import Enum
+from typing import Any, Iterable, Iterator, Optional
 import importlib.util
 
 
-class Color(Enum):
-    """Enum representing the color of a node in a tree."""
+class Color:
+    """Colors of a node in a tree, stored as small ints so that nodes stay
+    compact and comparisons are cheap."""
 
     RED = 1
     BLACK = 2
@@ -16,19 +16,23 @@ class TreeNode:
     Attributes:
         key (int): The key value of the node.
         data: The data stored in the node.
-        color (Color): The color of the node.
+        color (int): The color of the node, `Color.RED` or `Color.BLACK`.
         left (TreeNode): The left child of the node.
         right (TreeNode): The right child of the node.
         p (TreeNode | None): The parent of the node.
+        size (int): The number of nodes in the subtree rooted at the node.
     """
 
-    def __init__(self, key: int, data, color: Color) -> None:
+    __slots__ = ("key", "data", "color", "left", "right", "p", "size")
+
+    def __init__(self, key: int, data, color: int) -> None:
         self.left: "TreeNode"
         self.right: "TreeNode"
         self.key: int = key
         self.data = data
-        self.color: Color = color
+        self.color: int = color
         self.p: "TreeNode" | None = None
+        self.size: int = 1
 
 
 class SentinelNode(TreeNode):
@@ -39,8 +43,60 @@ class SentinelNode(TreeNode):
     of various tree operations.
     """
 
+    __slots__ = ()
+
     def __init__(self) -> None:
         super().__init__(-1, None, Color.BLACK)
+        self.size = 0
+
+
+class TreeCursor:
+    """A position in a tree that can be moved to the next or previous node.
+
+    A step follows the child and parent pointers, so walking over m nodes
+    takes O(m + log n) time, O(1) amortized per step. The cursor must not be
+    used after the tree is changed.
+
+    Attributes:
+        tree (Tree): The tree of the cursor.
+        node (TreeNode | None): The node at the cursor, or None before the
+            first or after the last node.
+        after_end (bool): Whether a None node is after the last node rather
+            than before the first one.
+    """
+
+    __slots__ = ("tree", "node", "after_end")
+
+    def __init__(
+        self, tree: "Tree", node: Optional[TreeNode], after_end: bool = False
+    ) -> None:
+        self.tree: "Tree" = tree
+        self.node: Optional[TreeNode] = node
+        self.after_end: bool = after_end
+
+    def copy(self) -> "TreeCursor":
+        return TreeCursor(self.tree, self.node, self.after_end)
+
+    def next(self) -> Optional[TreeNode]:
+        """Moves to the next node and returns it, or None after the last."""
+        tree = self.tree
+        if self.node is not None:
+            self.node = tree.successor(self.node)
+        elif not self.after_end and tree.root_node is not tree.sentinel:
+            self.node = tree._minimum(tree.root_node)
+        self.after_end = self.node is None
+        return self.node
+
+    def prev(self) -> Optional[TreeNode]:
+        """Moves to the previous node and returns it, or None before the
+        first."""
+        tree = self.tree
+        if self.node is not None:
+            self.node = tree.predecessor(self.node)
+        elif self.after_end and tree.root_node is not tree.sentinel:
+            self.node = tree._maximum(tree.root_node)
+        self.after_end = False
+        return self.node
 
 
 class Tree:
@@ -48,43 +104,166 @@ class Tree:
         self.sentinel = SentinelNode()
         self.root_node: TreeNode = self.sentinel
         self.flip_count = 0
+        # colors of the nodes recolored by the ongoing insert/delete, as they
+        # were before the operation started
+        self._original_colors: dict[TreeNode, int] = {}
+
+    # Hooks called by the operations below. They do nothing here;
+    # `InstrumentedTree` overrides them to count what the operations do.
+
+    def _on_rotate(self, direction: str) -> None:
+        """Called by every rotation, with "left" or "right"."""
+
+    def _on_fixup_case(self, kind: str, case: int) -> None:
+        """Called by every iteration of a fixup with "insert" or "delete" and
+        the case it handles, numbered as in CLRS."""
+
+    def _on_lookup(self, kind: str, visits: int) -> None:
+        """Called once by every "search", "closest" (`find_closest`) and
+        "range" (`irange`) lookup, with the number of nodes it visited."""
+
+    @classmethod
+    def from_sorted(
+        cls, items: Iterable[tuple[int, Any]], sort: bool = False
+    ) -> "Tree":
+        """Builds a red-black tree from (key, value) pairs sorted by key in O(n)
+        time, without any rotations or fixups.
+
+        The tree is built by recursively making the middle item the root of each
+        subtree, so all leaves are on the last two levels. The nodes on the
+        deepest level are red if that level is not full, every other node is
+        black. The nodes are created with their final color, so a bulk load
+        does not count any color flips, just as the color given to a newly
+        inserted node is not a flip. `flip_count` of the new tree is 0.
 
-    def get_colors(self) -> dict[int, Color]:
-        """Returns a dictionary mapping each node's key to its color.
+        Args:
+            items (Iterable[tuple[int, Any]]): The (key, value) pairs in
+                increasing order of key.
+            sort (bool): Sorts the items first. O(n log n) time complexity.
 
         Returns:
-            dict[int, Color]: A dictionary where the keys are node keys and the values are node colors.
+            Tree: The new tree.
+
+        Raises:
+            ValueError: If the keys are not strictly increasing.
         """
-        ret = {}
+        items = sorted(items, key=lambda item: item[0]) if sort else list(items)
+        for i in range(1, len(items)):
+            if items[i - 1][0] >= items[i][0]:
+                raise ValueError(
+                    f"Keys must be strictly increasing: {items[i - 1][0]}, {items[i][0]}"
+                )
 
-        def helper(node: TreeNode):
-            if node is None or node is self.sentinel:
+        tree = cls()
+        # depth of the deepest level; its nodes are red unless the level is full
+        max_depth = len(items).bit_length() - 1
+        full = len(items) == (1 << (max_depth + 1)) - 1
+
+        def build(lo: int, hi: int, depth: int) -> TreeNode:
+            if lo > hi:
+                return tree.sentinel
+            mid = (lo + hi) // 2
+            key, value = items[mid]
+            color = Color.RED if depth == max_depth and not full else Color.BLACK
+            node = TreeNode(key, value, color)
+            node.size = hi - lo + 1
+            node.left = build(lo, mid - 1, depth + 1)
+            node.right = build(mid + 1, hi, depth + 1)
+            if node.left is not tree.sentinel:
+                node.left.p = node
+            if node.right is not tree.sentinel:
+                node.right.p = node
+            return node
+
+        tree.root_node = build(0, len(items) - 1, 0)
+        return tree
+
+    def layout(self) -> Iterator[tuple[TreeNode, int]]:
+        """Yields every node with its depth in increasing order of key. The
+        result can be passed to `from_layout` to rebuild the same tree.
+
+        Yields:
+            tuple[TreeNode, int]: A node and its depth, the root being at depth 0.
+        """
+        stack: list[tuple[TreeNode, int]] = []
+        node = self.root_node
+        depth = 0
+        while True:
+            while node is not self.sentinel:
+                stack.append((node, depth))
+                node = node.left
+                depth += 1
+            if not stack:
                 return
-            ret[node.key] = node.color
-            helper(node.left)
-            helper(node.right)
-
-        helper(self.root_node)
+            node, depth = stack.pop()
+            yield node, depth
+            node = node.right
+            depth += 1
 
-        return ret
+    @classmethod
+    def from_layout(cls, items: Iterable[tuple[int, Any, int, int]]) -> "Tree":
+        """Rebuilds a tree with exactly the shape and colors returned by
+        `layout` in O(n) time.
 
-    def update_color_flips(
-        self, before: dict[int, Color], after: dict[int, Color]
-    ) -> int:
-        """Updates the color flips count based on the changes between the 'before' and 'after' dictionaries.
+        The keys in increasing order together with the depth of every node
+        determine the shape of a binary search tree, so the tree is rebuilt
+        with a stack holding the rightmost path built so far. `flip_count` of
+        the new tree is 0.
 
         Args:
-            before (dict[int, Color]): The dictionary representing the colors before the update.
-            after (dict[int, Color]): The dictionary representing the colors after the update.
+            items (Iterable[tuple[int, Any, int, int]]): The (key, value,
+                color, depth) of every node in increasing order of key.
 
         Returns:
-            int: The number of color flips that occurred.
+            Tree: The new tree.
+        """
+        tree = cls()
+        # rightmost path of the tree built so far, as (node, depth) pairs
+        stack: list[tuple[TreeNode, int]] = []
+
+        def finish(node: TreeNode):
+            node.size = node.left.size + node.right.size + 1
+
+        for key, value, color, depth in items:
+            node = TreeNode(key, value, color)
+            node.left = tree.sentinel
+            node.right = tree.sentinel
+            # the deeper nodes of the rightmost path are complete now, and the
+            # shallowest of them is the left child of the new node
+            child = None
+            while stack and stack[-1][1] > depth:
+                child = stack.pop()[0]
+                finish(child)
+            if child is not None:
+                node.left = child
+                child.p = node
+            if stack:
+                stack[-1][0].right = node
+                node.p = stack[-1][0]
+            stack.append((node, depth))
+
+        if stack:
+            tree.root_node = stack[0][0]
+        while stack:
+            finish(stack.pop()[0])
+        return tree
+
+    def _commit_color_flips(self) -> int:
+        """Adds the color flips of the current operation to the flip count.
+
+        Only nodes that were recolored through `_flip_color` are examined, so
+        this is O(log n) per operation. A node that ends the operation with its
+        original color is not counted, no matter how many times it was flipped
+        in between.
 
+        Returns:
+            int: The number of color flips that occurred.
         """
         ans = 0
-        for key in before.keys():
-            if key in after.keys() and before[key] != after[key]:
+        for node, color in self._original_colors.items():
+            if node.color != color:
                 ans += 1
+        self._original_colors.clear()
         self.flip_count += ans
         return ans
 
@@ -99,6 +278,7 @@ class Tree:
         if y is self.sentinel:
             return x
         assert y is not None
+        self._on_rotate("left")
 
         beta = y.left
         if beta is not self.sentinel:
@@ -121,6 +301,9 @@ class Tree:
         x.p = y
         y.left = x
 
+        y.size = x.size
+        x.size = x.left.size + x.right.size + 1
+
     def right_rotate(self, y: TreeNode):
         """Performs a right rotation on the given node 'y' in the tree.
 
@@ -131,6 +314,7 @@ class Tree:
         if x is self.sentinel:
             return y
         assert x is not None
+        self._on_rotate("right")
 
         beta = x.right
         if beta is not self.sentinel:
@@ -153,6 +337,9 @@ class Tree:
         y.p = x
         x.right = y
 
+        x.size = y.size
+        y.size = y.left.size + y.right.size + 1
+
     def insert(self, key: int, value) -> TreeNode:
         """Inserts a new node with the given key and value into the tree.
 
@@ -163,7 +350,6 @@ class Tree:
         Returns:
             TreeNode: The newly inserted node.
         """
-        colors_before = self.get_colors()
         # binary search
         parent: None | TreeNode = None
         current: None | TreeNode = self.root_node
@@ -189,11 +375,17 @@ class Tree:
         elif parent.key > key:
             parent.left = new_node
 
+        ancestor = parent
+        while ancestor is not None:
+            ancestor.size += 1
+            ancestor = ancestor.p
+
         # fix the tree to satisfy red-black tree properties
         self._insert_fixup(new_node)
 
-        colors_after = self.get_colors()
-        self.update_color_flips(colors_before, colors_after)
+        # the new node did not exist before the insert, so its color is not a flip
+        self._original_colors.pop(new_node, None)
+        self._commit_color_flips()
 
         return new_node
 
@@ -210,6 +402,7 @@ class Tree:
             if node.p == node.p.p.left:
                 y = node.p.p.right  # uncle
                 if y.color == Color.RED:
+                    self._on_fixup_case("insert", 1)
                     self._flip_color(node.p, Color.BLACK)
                     self._flip_color(y, Color.BLACK)
                     self._flip_color(node.p.p, Color.RED)
@@ -217,14 +410,17 @@ class Tree:
                     node = node.p.p
                 else:
                     if node == node.p.right:
+                        self._on_fixup_case("insert", 2)
                         node = node.p
                         self.left_rotate(node)
+                    self._on_fixup_case("insert", 3)
                     self._flip_color(node.p, Color.BLACK)
                     self._flip_color(node.p.p, Color.RED)
                     self.right_rotate(node.p.p)
             else:
                 y = node.p.p.left
                 if y.color == Color.RED:
+                    self._on_fixup_case("insert", 1)
                     self._flip_color(node.p, Color.BLACK)
                     self._flip_color(y, Color.BLACK)
                     self._flip_color(node.p.p, Color.RED)
@@ -232,14 +428,16 @@ class Tree:
                     node = node.p.p
                 else:
                     if node == node.p.left:
+                        self._on_fixup_case("insert", 2)
                         node = node.p
                         self.right_rotate(node)
+                    self._on_fixup_case("insert", 3)
                     self._flip_color(node.p, Color.BLACK)
                     self._flip_color(node.p.p, Color.RED)
                     self.left_rotate(node.p.p)
 
         assert self.root_node is not None
-        self.root_node.color = Color.BLACK
+        self._flip_color(self.root_node, Color.BLACK)
 
     def transplant(self, u: TreeNode, v: TreeNode) -> None:
         """Replaces the subtree rooted at node u with the subtree rooted at node v.
@@ -260,18 +458,20 @@ class Tree:
 
         v.p = u.p
 
-    def _flip_color(self, node: TreeNode, color: Color) -> None:
+    def _flip_color(self, node: TreeNode, color: int) -> None:
         """Flips the color of the given node to the specified color.
 
         Args:
             node (TreeNode): The node whose color needs to be flipped.
-            color (Color): The color to which the node's color needs to be flipped.
+            color (int): The color to which the node's color needs to be flipped.
 
         Returns:
             None
         """
         if not node or node is self.sentinel or node.color == color:
             return
+        if node not in self._original_colors:
+            self._original_colors[node] = node.color
         node.color = color
 
     def delete(self, key):
@@ -283,13 +483,22 @@ class Tree:
         Returns:
             None
         """
-        colors_before = self.get_colors()
         z: TreeNode | None = self.search(key)
         assert z and z is not self.sentinel
 
         y = z
         y_original_color = y.color
 
+        # the node that is removed from its position is z itself, or the
+        # successor of z which then takes the place of z
+        removed = z
+        if z.left is not self.sentinel and z.right is not self.sentinel:
+            removed = self._minimum(z.right)
+        ancestor = removed.p
+        while ancestor is not None:
+            ancestor.size -= 1
+            ancestor = ancestor.p
+
         if z.left is self.sentinel:
             x = z.right
             self.transplant(z, z.right)
@@ -311,13 +520,13 @@ class Tree:
             self.transplant(z, y)
             y.left = z.left
             y.left.p = y
+            y.size = z.size
             self._flip_color(y, z.color)
 
         if y_original_color == Color.BLACK:
             self._delete_fixup(x)
 
-        colors_after = self.get_colors()
-        self.update_color_flips(colors_before, colors_after)
+        self._commit_color_flips()
 
     def _delete_fixup(self, node: TreeNode):
         """Performs the fixup process after deleting a node in the red-black tree.
@@ -335,21 +544,25 @@ class Tree:
                 w: TreeNode = node.p.right  # sibling
 
                 if w.color == Color.RED:
+                    self._on_fixup_case("delete", 1)
                     self._flip_color(w, Color.BLACK)
                     self._flip_color(node.p, Color.RED)
                     self.left_rotate(node.p)
                     w = node.p.right
 
                 if w.left.color == Color.BLACK and w.right.color == Color.BLACK:
+                    self._on_fixup_case("delete", 2)
                     self._flip_color(w, Color.RED)
                     node = node.p
                 else:
                     if w.right.color == Color.BLACK:
+                        self._on_fixup_case("delete", 3)
                         self._flip_color(w.left, Color.BLACK)
                         self._flip_color(w, Color.RED)
                         self.right_rotate(w)
                         w = node.p.right
 
+                    self._on_fixup_case("delete", 4)
                     self._flip_color(w, node.p.color)
                     self._flip_color(node.p, Color.BLACK)
                     self._flip_color(w.right, Color.BLACK)
@@ -359,21 +572,25 @@ class Tree:
                 w = node.p.left
 
                 if w.color == Color.RED:
+                    self._on_fixup_case("delete", 1)
                     self._flip_color(w, Color.BLACK)
                     self._flip_color(node.p, Color.RED)
                     self.right_rotate(node.p)
                     w = node.p.left
 
                 if w.right.color == Color.BLACK and w.left.color == Color.BLACK:
+                    self._on_fixup_case("delete", 2)
                     self._flip_color(w, Color.RED)
                     node = node.p
                 else:
                     if w.left.color == Color.BLACK:
+                        self._on_fixup_case("delete", 3)
                         self._flip_color(w.right, Color.BLACK)
                         self._flip_color(w, Color.RED)
                         self.left_rotate(w)
                         w = node.p.left
 
+                    self._on_fixup_case("delete", 4)
                     self._flip_color(w, node.p.color)
                     self._flip_color(node.p, Color.BLACK)
                     self._flip_color(w.left, Color.BLACK)
@@ -391,78 +608,330 @@ class Tree:
         Returns:
             TreeNode: The node with the given key, or None if not found.
         """
+        visits = 0
         node = self.root_node
         while node is not self.sentinel:
+            visits += 1
             if node.key == key:
-                return node
+                break
             elif node.key < key:
                 node = node.right
             else:
                 node = node.left
+        else:
+            node = None
 
-        return None
+        self._on_lookup("search", visits)
+        return node
 
     def _minimum(self, node: TreeNode) -> TreeNode:
         while node.left is not self.sentinel:
             node = node.left
         return node
 
+    def _maximum(self, node: TreeNode) -> TreeNode:
+        while node.right is not self.sentinel:
+            node = node.right
+        return node
+
+    def successor(self, node: TreeNode) -> Optional[TreeNode]:
+        """Returns the node with the next greater key, or None if the node has
+        the greatest key. O(1) amortized over a walk through the tree.
+
+        Args:
+            node (TreeNode): A node of the tree.
+        """
+        if node.right is not self.sentinel:
+            return self._minimum(node.right)
+        parent = node.p
+        while parent is not None and node is parent.right:
+            node = parent
+            parent = parent.p
+        return parent
+
+    def predecessor(self, node: TreeNode) -> Optional[TreeNode]:
+        """Returns the node with the next smaller key, or None if the node has
+        the smallest key. O(1) amortized over a walk through the tree.
+
+        Args:
+            node (TreeNode): A node of the tree.
+        """
+        if node.left is not self.sentinel:
+            return self._maximum(node.left)
+        parent = node.p
+        while parent is not None and node is parent.left:
+            node = parent
+            parent = parent.p
+        return parent
+
+    def cursor(self, key: int) -> "TreeCursor":
+        """Returns a cursor at the node with the smallest key greater than or
+        equal to the given key, found with one descent.
+
+        Args:
+            key (int): The key to position the cursor at.
+        """
+        greater = None
+        node = self.root_node
+        while node is not self.sentinel:
+            if node.key >= key:
+                greater = node
+                node = node.left
+            else:
+                node = node.right
+        return TreeCursor(self, greater, after_end=greater is None)
+
     def find_closest(self, key: int) -> list[TreeNode]:
         """Finds the closest nodes to the given key in the tree.
 
+        The closest smaller and greater nodes are both found in one descent.
+
         Args:
             key (int): The key to find the closest nodes for.
 
         Returns:
-            list[TreeNode]: A list of TreeNode objects representing the closest nodes.
+            list[TreeNode]: The node with the key, or else the closest node
+                below or above it, or both if they are equally close.
         """
+        lesser = greater = None
+        visits = 0
+        node = self.root_node
+        while node is not self.sentinel:
+            visits += 1
+            if node.key == key:
+                self._on_lookup("closest", visits)
+                return [node]
+            elif node.key < key:
+                lesser = node
+                node = node.right
+            else:
+                greater = node
+                node = node.left
 
-        def find_lesser(node: TreeNode) -> TreeNode:
-            """Finds the node with the greatest key that is less than the given node's key."""
-            ans = self.sentinel
-            while node and node is not self.sentinel:
-                if node.key == key:
-                    return node
-                elif node.key < key:
-                    ans = node
-                    node = node.right
-                else:
-                    node = node.left
-
-            return ans
-
-        def find_greater(node: TreeNode) -> TreeNode:
-            """Finds the first node in the tree that has a key greater than the given node's key."""
-            ans = self.sentinel
-            while node and node is not self.sentinel:
-                if node.key == key:
-                    return node
-                elif node.key > key:
-                    ans = node
-                    node = node.left
-                else:
-                    node = node.right
+        self._on_lookup("closest", visits)
+        return self._closest(key, lesser, greater)
 
-            return ans
+    @staticmethod
+    def _closest(key: int, lesser, greater) -> list:
+        """Chooses the closest nodes to a key among its neighbors.
 
-        lesser = find_lesser(self.root_node)
-        greater = find_greater(self.root_node)
+        Args:
+            key (int): The key.
+            lesser: The node with the greatest key less than the key, or None.
+            greater: The node with the least key greater than or equal to the
+                key, or None. Anything with a `key` works, not only a node.
 
-        if lesser is self.sentinel and greater is self.sentinel:
+        Returns:
+            list: The neighbor with the key, or else the closer neighbor, or
+                both if they are equally close.
+        """
+        if greater is not None and greater.key == key:
+            return [greater]
+        elif lesser is None and greater is None:
             return []
-        elif lesser is self.sentinel:
+        elif lesser is None:
             return [greater]
-        elif greater is self.sentinel:
+        elif greater is None:
             return [lesser]
         elif key - lesser.key < greater.key - key:
             return [lesser]
         elif key - lesser.key > greater.key - key:
             return [greater]
-        elif lesser.key == greater.key:
-            return [lesser]
         else:
             return [lesser, greater]
 
+    def find_k_closest(self, key: int, k: int) -> list[TreeNode]:
+        """Finds the k nodes with the closest keys to the given key.
+
+        A cursor is positioned at the key with one descent, and then walks
+        outward in both directions, taking the closer node each time (the
+        smaller one on a tie). O(log n + k) time.
+
+        Args:
+            key (int): The key to find the closest nodes for.
+            k (int): The number of nodes to find.
+
+        Returns:
+            list[TreeNode]: The closest nodes, at most k, in increasing order
+                of key.
+        """
+        if k <= 0:
+            return []
+        above = self.cursor(key)
+        below = above.copy()
+        lesser = below.prev()
+        greater = above.node
+
+        lower: list[TreeNode] = []
+        upper: list[TreeNode] = []
+        while len(lower) + len(upper) < k:
+            if greater is not None and (
+                lesser is None or greater.key - key < key - lesser.key
+            ):
+                upper.append(greater)
+                greater = above.next()
+            elif lesser is not None:
+                lower.append(lesser)
+                lesser = below.prev()
+            else:
+                break
+        lower.reverse()
+        return lower + upper
+
+    def _neighbors_many(
+        self, keys: Iterable[int]
+    ) -> tuple[list[int], list[Optional[TreeNode]], list[Optional[TreeNode]]]:
+        """Finds, for many keys at once, the node with the greatest key less
+        than the key and the node with the least key greater than or equal to
+        it.
+
+        The keys are sorted and resolved in one in-order walk: the stack of
+        the walk is kept from one key to the next, and only the part of the
+        tree between two consecutive keys is visited (finger search), instead
+        of a descent from the root for every key.
+
+        Args:
+            keys (Iterable[int]): The keys, e.g. a list or a NumPy array.
+
+        Returns:
+            tuple: The keys as a list of ints, and the lesser and greater
+                nodes (or None) of every key, in input order.
+        """
+        # NumPy arrays are converted to Python ints, which compare faster
+        keys = keys.tolist() if hasattr(keys, "tolist") else list(keys)
+        lesser_nodes: list[Optional[TreeNode]] = [None] * len(keys)
+        greater_nodes: list[Optional[TreeNode]] = [None] * len(keys)
+
+        sentinel = self.sentinel
+        stack: list[TreeNode] = []
+        lesser = None
+        node = self.root_node
+        for i in sorted(range(len(keys)), key=keys.__getitem__):
+            key = keys[i]
+            # the nodes on the stack are increasing from the top, and the
+            # right subtree of a popped node is below the next node on it
+            passed = None
+            while stack and stack[-1].key < key:
+                passed = stack.pop()
+            if passed is not None:
+                lesser = passed
+                node = passed.right
+            while node is not sentinel:
+                if node.key < key:
+                    lesser = node
+                    node = node.right
+                else:
+                    stack.append(node)
+                    node = node.left
+            lesser_nodes[i] = lesser
+            if stack:
+                greater_nodes[i] = stack[-1]
+
+        return keys, lesser_nodes, greater_nodes
+
+    def search_many(self, keys: Iterable[int]) -> list[Optional[TreeNode]]:
+        """Searches for many keys at once.
+
+        Args:
+            keys (Iterable[int]): The keys to search for, e.g. a list or a
+                NumPy array.
+
+        Returns:
+            list[TreeNode | None]: The node of every key, or None if not found,
+                in the order of the keys.
+        """
+        keys, lesser_nodes, greater_nodes = self._neighbors_many(keys)
+        return [
+            greater if greater is not None and greater.key == key else None
+            for key, greater in zip(keys, greater_nodes)
+        ]
+
+    def find_closest_many(self, keys: Iterable[int]) -> list[list[TreeNode]]:
+        """Finds the closest nodes to many keys at once, with the same results
+        as `find_closest`.
+
+        Args:
+            keys (Iterable[int]): The keys, e.g. a list or a NumPy array.
+
+        Returns:
+            list[list[TreeNode]]: The closest nodes of every key, in the order
+                of the keys.
+        """
+        keys, lesser_nodes, greater_nodes = self._neighbors_many(keys)
+        return [
+            self._closest(key, lesser, greater)
+            for key, lesser, greater in zip(keys, lesser_nodes, greater_nodes)
+        ]
+
+    def irange(
+        self, start: Optional[int] = None, end: Optional[int] = None
+    ) -> Iterator[TreeNode]:
+        """Yields the nodes whose keys are in the range [start, end]
+        (inclusive) in increasing order of key.
+
+        The traversal is iterative and lazy, so only the O(log n) stack of
+        ancestors is kept in memory.
+
+        Args:
+            start (int | None): The starting key of the range, or None for no
+                lower bound.
+            end (int | None): The ending key of the range, or None for no upper
+                bound.
+
+        Yields:
+            TreeNode: The nodes in the range.
+        """
+        stack: list[TreeNode] = []
+        visits = 0
+        node = self.root_node
+        try:
+            while True:
+                while node is not self.sentinel:
+                    visits += 1
+                    if start is not None and node.key < start:
+                        node = node.right
+                    else:
+                        stack.append(node)
+                        node = node.left
+                if not stack:
+                    return
+                node = stack.pop()
+                if end is not None and node.key > end:
+                    return
+                yield node
+                node = node.right
+        finally:
+            # also when the caller stops iterating early
+            self._on_lookup("range", visits)
+
+    def __iter__(self) -> Iterator[TreeNode]:
+        """Yields all the nodes in increasing order of key."""
+        stack: list[TreeNode] = []
+        node = self.root_node
+        while True:
+            while node is not self.sentinel:
+                stack.append(node)
+                node = node.left
+            if not stack:
+                return
+            node = stack.pop()
+            yield node
+            node = node.right
+
+    def __reversed__(self) -> Iterator[TreeNode]:
+        """Yields all the nodes in decreasing order of key."""
+        stack: list[TreeNode] = []
+        node = self.root_node
+        while True:
+            while node is not self.sentinel:
+                stack.append(node)
+                node = node.right
+            if not stack:
+                return
+            node = stack.pop()
+            yield node
+            node = node.left
+
     def range_search(self, start: int, end: int) -> list[TreeNode]:
         """Returns a list of nodes whose keys are in the range [start, end]
         (inclusive)
@@ -474,18 +943,146 @@ class Tree:
         Returns:
             list[TreeNode]: A list of nodes whose keys are in the specified range.
         """
+        return list(self.irange(start, end))
+
+    def validate(self) -> int:
+        """Checks the binary search tree and red-black tree properties, the
+        parent pointers and the subtree sizes. Useful for debugging and for
+        stress tests.
+
+        Returns:
+            int: The black height of the tree.
+
+        Raises:
+            ValueError: If a property does not hold.
+        """
+        if self.root_node is self.sentinel:
+            return 0
+        if self.root_node.color != Color.BLACK:
+            raise ValueError("The root is red")
+        if self.root_node.p is not None:
+            raise ValueError("The root has a parent")
+
+        black_height = -1
+        # (node, lower bound, upper bound, black nodes above the node)
+        stack = [(self.root_node, None, None, 0)]
+        while stack:
+            node, low, high, blacks = stack.pop()
+            if (low is not None and node.key <= low) or (
+                high is not None and node.key >= high
+            ):
+                raise ValueError(f"Node {node.key} is out of order")
+            if node.size != node.left.size + node.right.size + 1:
+                raise ValueError(f"Node {node.key} has a wrong size")
+            if node.color == Color.BLACK:
+                blacks += 1
+            elif node.left.color == Color.RED or node.right.color == Color.RED:
+                raise ValueError(f"Red node {node.key} has a red child")
+
+            for child, child_low, child_high in (
+                (node.left, low, node.key),
+                (node.right, node.key, high),
+            ):
+                if child is self.sentinel:
+                    if black_height == -1:
+                        black_height = blacks
+                    elif black_height != blacks:
+                        raise ValueError(f"Node {node.key} has a wrong black height")
+                else:
+                    if child.p is not node:
+                        raise ValueError(f"Node {child.key} has a wrong parent")
+                    stack.append((child, child_low, child_high, blacks))
+
+        return black_height
+
+    def __len__(self) -> int:
+        """Returns the number of nodes in the tree."""
+        return self.root_node.size
+
+    def height(self) -> int:
+        """Returns the number of nodes on the longest path from the root to a
+        leaf, 0 for an empty tree. O(n) time complexity."""
+        return max((depth + 1 for _, depth in self.layout()), default=0)
 
-        def helper(node) -> list[TreeNode]:
-            if node is self.sentinel:
-                return []
-            elif node.key < start:
-                return helper(node.right)
-            elif node.key > end:
-                return helper(node.left)
+    def black_height(self) -> int:
+        """Returns the number of black nodes on every path from the root to a
+        leaf. O(log n) time complexity."""
+        blacks = 0
+        node = self.root_node
+        while node is not self.sentinel:
+            if node.color == Color.BLACK:
+                blacks += 1
+            node = node.left
+        return blacks
+
+    def rank(self, key: int) -> int:
+        """Returns the number of keys in the tree that are less than the given
+        key, i.e. the 0-based position of the key in sorted order.
+
+        Args:
+            key (int): The key to rank. It does not have to be in the tree.
+
+        Returns:
+            int: The number of keys less than `key`.
+        """
+        ans = 0
+        node = self.root_node
+        while node is not self.sentinel:
+            if node.key < key:
+                ans += node.left.size + 1
+                node = node.right
+            else:
+                node = node.left
+        return ans
+
+    def select(self, k: int) -> TreeNode:
+        """Returns the node with the k-th smallest key (0-based).
+
+        Args:
+            k (int): The position of the node in sorted order.
+
+        Returns:
+            TreeNode: The node with exactly `k` smaller keys.
+
+        Raises:
+            IndexError: If `k` is not in the range [0, len(tree)).
+        """
+        if not 0 <= k < self.root_node.size:
+            raise IndexError(f"Tree index out of range: {k}")
+
+        node = self.root_node
+        while True:
+            left_size = node.left.size
+            if k < left_size:
+                node = node.left
+            elif k == left_size:
+                return node
             else:
-                return helper(node.left) + [node] + helper(node.right)
+                k -= left_size + 1
+                node = node.right
+
+    def count_range(self, start: int, end: int) -> int:
+        """Returns the number of keys in the range [start, end] (inclusive).
+
+        Args:
+            start (int): The starting key of the range.
+            end (int): The ending key of the range.
 
-        return helper(self.root_node)
+        Returns:
+            int: The number of keys in the range.
+        """
+        if start > end:
+            return 0
+        # number of keys that are at most end
+        at_most_end = 0
+        node = self.root_node
+        while node is not self.sentinel:
+            if node.key <= end:
+                at_most_end += node.left.size + 1
+                node = node.right
+            else:
+                node = node.left
+        return at_most_end - self.rank(start)
 
     def visualize_binary_tree(self, file_name):
         """Visualizes the binary tree and saves the visualization as an image file
@@ -0,0 +1,132 @@
+"""Streaming export of a red-black tree to Graphviz DOT or JSON.
+
+The tree is walked in preorder with an explicit stack and every node is
+written to the file as soon as it is reached, so exporting takes O(log n)
+memory besides the file buffer, however large the tree is. Only part of the
+tree can be exported:
+
+- `root`: the subtree of the node with this key,
+- `start` and `end`: the nodes with keys in [start, end]. The subtrees that
+  are entirely out of the range are not visited. A node whose parent is out of
+  the range has no parent in the export, so the export may be a forest,
+- `levels`: the nodes less than `levels` levels below the root of the export.
+
+The nil leaves are not written. In DOT, every node is a circle labeled with
+its key and drawn in its color, with an edge from its parent. In JSON, the
+file is an object with the `flip_count` of the tree and its `nodes`, a list of
+`{"key", "color", "depth", "parent"}` objects in preorder, where `depth` is
+counted from the root of the export and `parent` is the key of the parent, or
+null if the parent is not exported.
+"""
+
+from typing import Iterator, Optional, TextIO
+
+from tree import Color, Tree, TreeNode
+
+
+def walk(
+    tree: Tree,
+    root: Optional[int] = None,
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    levels: Optional[int] = None,
+) -> Iterator[tuple[TreeNode, int, Optional[TreeNode]]]:
+    """Yields the nodes to export in preorder.
+
+    Args:
+        tree (Tree): The tree.
+        root (int | None): The key of the root of the subtree to export, or
+            None for the whole tree.
+        start (int | None): The smallest key to export, or None.
+        end (int | None): The greatest key to export, or None.
+        levels (int | None): The number of levels to export, or None for all.
+
+    Yields:
+        tuple[TreeNode, int, TreeNode | None]: A node, its depth below the
+            root of the export and its parent if the parent is exported.
+
+    Raises:
+        KeyError: If there is no node with the key `root`.
+    """
+    node = tree.root_node
+    if root is not None:
+        node = tree.search(root)
+        if node is None:
+            raise KeyError(root)
+    if node is tree.sentinel:
+        return
+
+    def in_range(node: TreeNode) -> bool:
+        return (start is None or node.key >= start) and (
+            end is None or node.key <= end
+        )
+
+    # (node, depth, parent if it is exported)
+    stack: list[tuple[TreeNode, int, Optional[TreeNode]]] = [(node, 0, None)]
+    while stack:
+        node, depth, parent = stack.pop()
+        exported = in_range(node)
+        if exported:
+            yield node, depth, parent
+        if levels is not None and depth + 1 >= levels:
+            continue
+        parent = node if exported else None
+        # the right child is pushed first so that the left one is written first
+        if node.right is not tree.sentinel and (end is None or node.key < end):
+            stack.append((node.right, depth + 1, parent))
+        if node.left is not tree.sentinel and (start is None or node.key > start):
+            stack.append((node.left, depth + 1, parent))
+
+
+def write_dot(file: TextIO, tree: Tree, **options) -> int:
+    """Writes the nodes chosen by `options` (see `walk`) to a DOT file.
+
+    Returns:
+        int: The number of nodes written.
+    """
+    file.write(f'digraph {{\n\tlabel="Color flip count: {tree.flip_count}"\n')
+    count = 0
+    for node, _, parent in walk(tree, **options):
+        color = "red" if node.color == Color.RED else "black"
+        file.write(f"\t{node.key} [color={color} penwidth=3 shape=circle]\n")
+        if parent is not None:
+            file.write(f"\t{parent.key} -> {node.key}\n")
+        count += 1
+    file.write("}\n")
+    return count
+
+
+def write_json(file: TextIO, tree: Tree, **options) -> int:
+    """Writes the nodes chosen by `options` (see `walk`) to a JSON file.
+
+    Returns:
+        int: The number of nodes written.
+    """
+    file.write(f'{{"flip_count": {tree.flip_count}, "nodes": [')
+    count = 0
+    separator = "\n"
+    for node, depth, parent in walk(tree, **options):
+        # the keys are ints, so the records are formatted directly instead of
+        # going through json.dumps for every node
+        color = "red" if node.color == Color.RED else "black"
+        parent_key = parent.key if parent is not None else "null"
+        file.write(
+            f'{separator}{{"key": {node.key}, "color": "{color}", '
+            f'"depth": {depth}, "parent": {parent_key}}}'
+        )
+        separator = ",\n"
+        count += 1
+    file.write("\n]}\n")
+    return count
+
+
+def export_tree(path: str, tree: Tree, **options) -> int:
+    """Exports the nodes chosen by `options` (see `walk`) to a file, as JSON
+    if the path ends with `.json` and as DOT otherwise.
+
+    Returns:
+        int: The number of nodes written.
+    """
+    write = write_json if path.endswith(".json") else write_dot
+    with open(path, "w") as file:
+        return write(file, tree, **options)
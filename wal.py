@@ -0,0 +1,229 @@
+"""Append-only operation log of the library commands.
+
+Every record is length-prefixed and binary:
+
+- record header: payload length, CRC-32 of the payload and the log sequence
+  number (LSN) of the record.
+- payload: the command name and its arguments, each argument tagged as an
+  integer (8 bytes), a string (length and UTF-8 bytes) or bytes (length and
+  the bytes). A record with an
+  empty command name is a checkpoint that only carries the LSN.
+
+Records are collected in memory and written with one `write` and one `fsync`
+per group: when `sync_every` records are pending, or when the oldest pending
+record is older than `sync_interval` seconds. The interval is kept by a
+background thread, so a group is synced in time even if no record follows it.
+A record that was cut short by a crash fails its length or CRC check, so
+reading stops at the last complete record.
+"""
+
+from typing import Iterator
+import os
+import struct
+import threading
+import time
+import zlib
+
+HEADER = struct.Struct("<IIQ")
+INTEGER = struct.Struct("<q")
+LENGTH = struct.Struct("<I")
+INTEGER_TAG = 0
+STRING_TAG = 1
+BYTES_TAG = 2
+
+
+def encode(command: str, args: list) -> bytes:
+    """Returns the payload of a record."""
+    name = command.encode()
+    payload = bytearray((len(name),))
+    payload += name
+    payload.append(len(args))
+    for arg in args:
+        if isinstance(arg, int):
+            payload.append(INTEGER_TAG)
+            payload += INTEGER.pack(arg)
+        elif isinstance(arg, bytes):
+            payload.append(BYTES_TAG)
+            payload += LENGTH.pack(len(arg))
+            payload += arg
+        else:
+            text = arg.encode()
+            payload.append(STRING_TAG)
+            payload += LENGTH.pack(len(text))
+            payload += text
+    return bytes(payload)
+
+
+def decode(payload: bytes) -> tuple[str, list]:
+    """Returns the command name and the arguments of a payload."""
+    name_length = payload[0]
+    command = payload[1 : 1 + name_length].decode()
+    pos = 1 + name_length
+    count = payload[pos]
+    pos += 1
+    args: list = []
+    for _ in range(count):
+        tag = payload[pos]
+        pos += 1
+        if tag == INTEGER_TAG:
+            args.append(INTEGER.unpack_from(payload, pos)[0])
+            pos += INTEGER.size
+        else:
+            (length,) = LENGTH.unpack_from(payload, pos)
+            pos += LENGTH.size
+            data = payload[pos : pos + length]
+            args.append(data.decode() if tag == STRING_TAG else data)
+            pos += length
+    return command, args
+
+
+def scan_log(path: str) -> Iterator[tuple[int, int, str, list]]:
+    """Yields (end offset, LSN, command, arguments) of every complete record of
+    a log file, and stops at the first incomplete or corrupt record."""
+    if not os.path.exists(path):
+        return
+    with open(path, "rb") as f:
+        data = f.read()
+    pos = 0
+    while pos + HEADER.size <= len(data):
+        length, checksum, lsn = HEADER.unpack_from(data, pos)
+        start = pos + HEADER.size
+        payload = data[start : start + length]
+        if len(payload) < length or zlib.crc32(payload) != checksum:
+            return
+        pos = start + length
+        command, args = decode(payload)
+        yield pos, lsn, command, args
+
+
+def read_log(path: str) -> Iterator[tuple[int, str, list]]:
+    """Yields (LSN, command, arguments) of every complete record of a log file.
+
+    Args:
+        path (str): The log file. A missing file is an empty log.
+    """
+    for end, lsn, command, args in scan_log(path):
+        if command:
+            yield lsn, command, args
+
+
+class WriteAheadLog:
+    """Appends command records to a log file with group commit.
+
+    Attributes:
+        path (str): The log file.
+        sync_every (int): The number of records written and synced together.
+        sync_interval (float): The maximum time in seconds a record waits for
+            its group. 0 means no limit.
+        last_lsn (int): The LSN of the last record appended.
+
+    The methods may be called from any thread.
+    """
+
+    def __init__(self, path: str, sync_every: int = 1, sync_interval: float = 0.0):
+        self.path: str = path
+        self.sync_every: int = max(1, sync_every)
+        self.sync_interval: float = sync_interval
+        self.last_lsn: int = 0
+        self.pending = bytearray()
+        self.pending_count: int = 0
+        self.pending_since: float = 0.0
+        # guards the pending records and the file, and wakes the sync thread
+        self.condition = threading.Condition()
+        self.closed: bool = False
+
+        # continue after the last complete record, dropping a torn tail
+        end = 0
+        for end, lsn, command, args in scan_log(path):
+            self.last_lsn = lsn
+        self.file = open(path, "ab")
+        self.file.truncate(end)
+
+        self.sync_thread: threading.Thread | None = None
+        if sync_interval:
+            self.sync_thread = threading.Thread(target=self._sync_when_due, daemon=True)
+            self.sync_thread.start()
+
+    def _sync_when_due(self):
+        """Syncs the pending records once the oldest one has waited
+        `sync_interval` seconds, until the log is closed."""
+        with self.condition:
+            while not self.closed:
+                if not self.pending_count:
+                    self.condition.wait()
+                    continue
+                remaining = self.pending_since + self.sync_interval - time.monotonic()
+                if remaining > 0:
+                    self.condition.wait(remaining)
+                else:
+                    self._sync()
+
+    def append(self, command: str, args: list) -> int:
+        """Adds a record to the log, and syncs the group if it is complete.
+
+        Args:
+            command (str): The command name.
+            args (list): The int, str and bytes arguments of the command.
+
+        Returns:
+            int: The LSN of the record.
+        """
+        payload = encode(command, args)
+        with self.condition:
+            self.last_lsn += 1
+            self.pending += HEADER.pack(
+                len(payload), zlib.crc32(payload), self.last_lsn
+            )
+            self.pending += payload
+            if self.pending_count == 0:
+                self.pending_since = time.monotonic()
+                self.condition.notify()
+            self.pending_count += 1
+
+            if self.pending_count >= self.sync_every:
+                self._sync()
+            return self.last_lsn
+
+    def sync(self):
+        """Writes the pending records and waits until they are on disk."""
+        with self.condition:
+            self._sync()
+
+    def _sync(self):
+        # every write is followed by an fsync, so there is nothing to do when
+        # no record is pending
+        if self.pending:
+            self.file.write(self.pending)
+            self.pending.clear()
+            self.pending_count = 0
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def truncate(self):
+        """Removes all the records from the log file, e.g. after a snapshot.
+
+        An empty checkpoint record with the last LSN is written, so that LSNs
+        keep increasing when the log is opened again and records written later
+        are newer than the snapshot.
+        """
+        with self.condition:
+            self.pending.clear()
+            self.pending_count = 0
+            self.file.truncate(0)
+            payload = encode("", [])
+            self.file.write(
+                HEADER.pack(len(payload), zlib.crc32(payload), self.last_lsn)
+            )
+            self.file.write(payload)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+
+    def close(self):
+        """Syncs the pending records and closes the log file."""
+        with self.condition:
+            self._sync()
+            self.closed = True
+            self.condition.notify()
+        if self.sync_thread is not None:
+            self.sync_thread.join()
+        self.file.close()